@@ -2,16 +2,20 @@ from modules.log_manager import LogManager
 from modules.hydrus_manager import HydrusManager
 from modules.telegram_manager import TelegramManager
 from modules.schedule_manager import ScheduleManager
-from modules.queue_manager import QueueManager
+from modules.channel_manager import ChannelManager
+from modules.pipeline_manager import PipelineManager
 from modules.config_manager import ConfigManager
+from modules.webhook_manager import WebhookManager
+from modules.breaker_manager import BreakerManager
+from modules.backfill_manager import BackfillManager
+from modules.verify_manager import VerifyManager
 import signal
 import time
 import sys
 import os
 import logging
 import logging.handlers
-from typing import Optional, Callable
-import functools
+from typing import Optional
 import threading
 import subprocess
 import json as _json
@@ -139,9 +143,14 @@ class HydrusTelegramBot:
     HydrusTelegramBot manages the connection between Hydrus Network and a Telegram bot.
 
     Methods:
-        on_scheduler(): Processes scheduled updates, looping indefinitely.
+        start_channels(): Starts the ingest and post jobs of every channel.
+        post_now(name): Runs a channel's next post now.
+        start_backfill(name): Starts or resumes a channel's backfill.
+        start_verify(): Starts an integrity check of the stored files.
+        report_breakers(): Sends the state of the circuit breakers to the admins.
+        start_update_listener(): Starts receiving admin messages by webhook or long polling.
+        request_shutdown(signum): Handles SIGINT and SIGTERM by stopping the scheduler.
         graceful_shutdown(): Handles graceful shutdown of the bot.
-        retry_with_backoff(): Decorator for retrying operations with exponential backoff.
     """
 
     def __init__(self):
@@ -151,62 +160,63 @@ class HydrusTelegramBot:
         # Set up logging
         self.logger = LogManager.setup_logger('BOT')
         self.is_shutting_down = False
+        self.shutdown_signal = None
 
-        # Initialize our modules.
+        # Initialize our modules. Every channel has its own queue; the first one is
+        # also available as self.queue.
         self.config = ConfigManager('config.json')        
-        self.queue = QueueManager(self.config, 'queue.json')
+        self.channels = ChannelManager(self.config)
+        self.queue = self.channels.default.queue
         self.hydrus = HydrusManager(self.config, self.queue)
         self.telegram = TelegramManager(self.config)
         self.telegram.send_message("Bot is starting.")
         self.scheduler = ScheduleManager(self.config.config_data.timezone, self.config.config_data.delay)
+        self.webhook = WebhookManager(self.config, self.telegram) if self.config.config_data.webhook_url else None
+        self.backfill = BackfillManager(self.config, self.hydrus)
+        self.verifier = VerifyManager(self.config, self.channels.blobs, self.hydrus)
+        self.pipeline = PipelineManager(self.config, self.channels, self.hydrus, self.scheduler, self.backfill,
+                                        self.verifier)
 
         # Queue Manager needs Hydrus and Telegram modules, but they need the Queue Manager too.
-        # We pass the references to the Queue Manager now that they are initialized.
-        self.queue.set_hydrus(self.hydrus)
-        self.queue.set_telegram(self.telegram)
+        # We pass the references to the channel queues now that they are initialized.
+        self.channels.set_hydrus(self.hydrus)
+        self.channels.set_telegram(self.telegram)
+        # Count the channel queues' references to the stored files.
+        self.channels.load()
+        self.breakers = BreakerManager([self.hydrus.breaker, self.telegram.breaker])
+        self.telegram.register_command('/post', self.post_now)
+        self.telegram.register_command('/breakers', self.report_breakers)
+        self.telegram.register_command('/backfill', self.start_backfill)
+        self.telegram.register_command('/verify', self.start_verify)
 
         # Set up signal handlers for graceful shutdown
-        signal.signal(signal.SIGINT, self.graceful_shutdown)
-        signal.signal(signal.SIGTERM, self.graceful_shutdown)
+        signal.signal(signal.SIGINT, self.request_shutdown)
+        signal.signal(signal.SIGTERM, self.request_shutdown)
 
         self.logger.debug('HydrusTelegramBot initialized.')
 
         # Set user configured log level preference.
         LogManager.set_level(self.config.config_data.log_level)
 
-    @staticmethod
-    def retry_with_backoff(max_retries: int = 3, initial_delay: float = 1.0, max_delay: float = 60.0):
+    def request_shutdown(self, signum: int, frame: Optional[object] = None):
         """
-        Decorator for retrying operations with exponential backoff.
+        Handles SIGINT and SIGTERM: stops the scheduler, so the main thread shuts
+        the bot down once the job it is running is done.
 
         Args:
-            max_retries (int): Maximum number of retry attempts.
-            initial_delay (float): Initial delay between retries in seconds.
-            max_delay (float): Maximum delay between retries in seconds.
+            signum (int): Signal number.
+            frame (object, optional): Current stack frame.
 
-        Returns:
-            Callable: Decorated function with retry logic.
+        Note:
+            The handler runs on the main thread, in whatever it interrupted. It only
+            sets a flag and wakes the scheduler, whose lock is reentrant. Saving the
+            queues takes locks the interrupted code may hold, so graceful_shutdown()
+            runs from the main loop instead.
         """
-        def decorator(func: Callable) -> Callable:
-            @functools.wraps(func)
-            def wrapper(*args, **kwargs):
-                # Attempt to retrieve the logger from the instance (args[0])
-                logger = getattr(args[0], 'logger', None) if args else logging.getLogger('BOT')
-
-                delay = initial_delay
-                for attempt in range(max_retries):
-                    try:
-                        return func(*args, **kwargs)
-                    except Exception as e:
-                        if attempt == max_retries - 1:
-                            if logger: logger.error(f"Operation failed after {max_retries} attempts: {e}")
-                            raise
-                        if logger: logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
-                        time.sleep(delay)
-                        delay = min(delay * 2, max_delay)
-                return None
-            return wrapper
-        return decorator
+        if self.shutdown_signal is not None:
+            return
+        self.shutdown_signal = signum
+        self.scheduler.stop()
 
     def graceful_shutdown(self, signum: Optional[int] = None, frame: Optional[object] = None):
         """
@@ -223,13 +233,27 @@ class HydrusTelegramBot:
         self.logger.info(f"Received shutdown signal {signum}. Initiating graceful shutdown...")
         
         try:
-            # Save any pending queue data
-            if hasattr(self, 'queue') and self.queue.queue_loaded:
-                self.queue.save_queue()
+            # Wake and stop the scheduler and the pipeline stages
+            if hasattr(self, 'scheduler'):
+                self.scheduler.stop()
+            if hasattr(self, 'pipeline'):
+                self.pipeline.stop()
+
+            # Kill running media tools, then save any pending queue data once the
+            # changes in progress are done
+            if hasattr(self, 'channels'):
+                self.channels.processes.stop()
+                self.channels.flush()
             
+            # Stop receiving updates by webhook
+            if getattr(self, 'webhook', None):
+                self.webhook.deregister()
+                self.webhook.stop()
+
             # Notify admins about shutdown
             if hasattr(self, 'telegram'):
                 self.telegram.send_message("Bot is shutting down gracefully.")
+                self.telegram.close()
             
             # Clean up PID file
             if os.path.exists('bot.pid'):
@@ -244,34 +268,88 @@ class HydrusTelegramBot:
             self.logger.error(f"Error during shutdown: {e}")
             sys.exit(1)
 
-    @retry_with_backoff(max_retries=3, initial_delay=1.0, max_delay=60.0)
-    def _run_update(self):
-        """ Runs a single update cycle with retry logic. """
-        if self.is_shutting_down:
+    def start_update_listener(self):
+        """
+        Starts receiving admin messages from Telegram.
+
+        Uses the webhook server when webhook_url is configured, falling back to
+        the long-polling thread otherwise, or if the server cannot start or
+        Telegram does not accept the webhook.
+        """
+        if self.webhook:
+            try:
+                self.webhook.start()
+            except OSError as e:
+                # e.g. the port is in use.
+                self.logger.warning(f"Could not start the webhook server: {e}. Falling back to long polling.")
+                self.webhook = None
+            else:
+                if self.webhook.register():
+                    return
+                self.logger.warning("Could not register webhook. Falling back to long polling.")
+                self.webhook.stop()
+                self.webhook = None
+
+        if self.telegram.engine:
+            # Poll on the asyncio engine's event loop
+            self.telegram.engine.start_polling(lambda: self.is_shutting_down)
             return
-        self.queue.load_queue()
-        self.hydrus.get_new_hydrus_files()
-        self.queue.process_queue()
 
-    def on_scheduler(self):
+        # Start Telegram polling in a background thread
+        polling_thread = threading.Thread(target=self.telegram.poll_telegram_updates, args=(lambda: self.is_shutting_down,), daemon=True)
+        polling_thread.start()
+
+    def post_now(self, name: str = ''):
         """
-        Processes scheduled updates, looping indefinitely.
+        Runs a channel's next post now rather than at its scheduled time.
 
-        Raises:
-            Exception: An error occurred during the update process
+        Args:
+            name (str): The channel's name. Defaults to the first channel.
         """
-        if self.is_shutting_down:
-            return
+        if not self.pipeline.post_now(name):
+            self.telegram.send_message(f"No scheduled post for {name or 'the default channel'}.")
 
-        try:
-            self._run_update()
-        except Exception as e:
-            self.logger.error(f"An error occurred during the update process: {e}")
-        finally:
-            if not self.is_shutting_down:
-                # Always schedule the next run, even after failures.
-                self.scheduler.schedule_update(self.on_scheduler)
+    def start_backfill(self, name: str = ''):
+        """
+        Starts or resumes a channel's backfill, or reports its progress if it is running.
 
+        Args:
+            name (str): The channel's name. Defaults to the first channel.
+        """
+        channel = self.channels.get(name) if name else self.channels.default
+        if channel is None:
+            self.telegram.send_message(f"No channel named {name}.")
+        elif channel.name in self.backfill.progress:
+            self.telegram.send_message(self.backfill.format_progress(channel.name))
+        elif self.pipeline.start_backfill(channel.name):
+            self.telegram.send_message(f"Backfill for {channel.name} started.")
+        else:
+            self.telegram.send_message(f"A backfill for {channel.name} is waiting to run.")
+
+    def start_verify(self, _argument: str = ''):
+        """
+        Starts an integrity check of the next slice of stored files, or reports its
+        progress if it is running. The results are sent to the admins when it finishes.
+        """
+        if self.verifier.running:
+            self.telegram.send_message(self.verifier.format_report())
+        elif self.pipeline.verify_now(lambda report: self.telegram.send_message(self.verifier.format_report(report))):
+            self.telegram.send_message("Verifying the stored files.")
+        else:
+            self.telegram.send_message("A verification is waiting to run.")
+
+    def report_breakers(self, _argument: str = ''):
+        """
+        Sends the state of the Hydrus and Telegram circuit breakers to the admins.
+        """
+        self.telegram.send_message(self.breakers.format_status())
+
+    def start_channels(self):
+        """
+        Starts the ingest and post jobs of every channel. Each job then reschedules
+        itself at its own cadence.
+        """
+        self.pipeline.start()
 
 if __name__ == '__main__':
     # Ensure single instance and unlock files if necessary
@@ -279,8 +357,9 @@ if __name__ == '__main__':
 
     # Main program loop.
     app = HydrusTelegramBot()
-    # Start Telegram polling in a background thread
-    polling_thread = threading.Thread(target=app.telegram.poll_telegram_updates, args=(lambda: app.is_shutting_down,), daemon=True)
-    polling_thread.start()
-    app.on_scheduler()
+    # Receive admin messages by webhook or long polling
+    app.start_update_listener()
+    app.start_channels()
     app.scheduler.run()
+    # Stopped by a signal, or the scheduler was interrupted.
+    app.graceful_shutdown(app.shutdown_signal)
@@ -0,0 +1,374 @@
+from modules.log_manager import LogManager
+import aiohttp
+import asyncio
+import concurrent.futures
+import contextlib
+import os
+import threading
+import time
+import typing as t
+import urllib.parse
+
+class AsyncTelegramManager:
+    """
+    Asyncio implementation of the Telegram network surface.
+
+    All Telegram I/O (messages, uploads, admin fan-out, link checks and polling) runs
+    on a single event loop in a dedicated thread, so concurrent operations overlap
+    instead of queueing behind each other. TelegramManager keeps its synchronous API
+    and hands calls to this class through run().
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        telegram (TelegramManager): The Telegram manager this engine serves.
+        config (ConfigModel): The bot's configuration settings.
+        loop (AbstractEventLoop): The event loop, once started.
+        thread (Thread): The thread running the event loop, once started.
+        session (aiohttp.ClientSession): The shared HTTP session, created on first use.
+
+    Example:
+        >>> engine = AsyncTelegramManager(telegram)
+        >>> engine.start()
+        >>> engine.run(engine.send_message("Hello admins"))
+        >>> engine.stop()
+    """
+
+    dead_link_marker = "The submission you are trying to find is not in our database."
+
+    def __init__(self, telegram):
+        """
+        Initializes the AsyncTelegramManager.
+
+        Args:
+            telegram (TelegramManager): The Telegram manager this engine serves. Used for
+                                        URL building, token redaction and message handling.
+        """
+        self.logger = LogManager.setup_logger('ATG')
+        self.telegram = telegram
+        self.config = telegram.config
+        self.loop = None
+        self.thread = None
+        self.session = None
+        self.logger.debug('Async Telegram Module initialized.')
+
+    def start(self):
+        """
+        Starts the event loop in a background thread.
+        """
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name='telegram-async', daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        """
+        Runs the event loop until stop() is called.
+        """
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """
+        Schedules a coroutine on the event loop without waiting for it.
+
+        Args:
+            coro (coroutine): The coroutine to run.
+
+        Returns:
+            concurrent.futures.Future: The future for the coroutine's result.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: t.Optional[float] = None):
+        """
+        Runs a coroutine on the event loop and waits for its result.
+
+        This is the synchronous facade used by TelegramManager.
+
+        Args:
+            coro (coroutine): The coroutine to run.
+            timeout (float, optional): The maximum time to wait in seconds.
+
+        Returns:
+            Any: The coroutine's result.
+
+        Raises:
+            RuntimeError: If called from the event loop thread, which would deadlock.
+        """
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError("AsyncTelegramManager.run() cannot be called from the event loop thread.")
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        """
+        Closes the HTTP session and stops the event loop.
+        """
+        if self.loop is None:
+            return
+        try:
+            self.run(self._close_session(), timeout=5)
+        except Exception as e:
+            self.logger.warning(f"Could not close the Telegram session cleanly: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.loop.close()
+        self.loop = None
+        self.thread = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared HTTP session, creating it on the event loop if needed.
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def _close_session(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def api_request(self, api_call: str, payload: dict) -> t.Optional[dict]:
+        """
+        Send messages or other simple requests to Telegram bot.
+
+        Args:
+            api_call (str): The API call to make.
+            payload (dict): The payload to send to the API.
+
+        Returns:
+            dict: The decoded Telegram response, or None if Telegram could not be reached.
+        """
+        url = self.telegram.build_telegram_api_url(api_call, "?" + urllib.parse.urlencode(payload))
+        try:
+            session = await self._get_session()
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                response_json = await response.json(content_type=None)
+            if not response_json.get("ok", False):
+                self.logger.error(f"Telegram {api_call} request failed: {response_json}")
+            return response_json
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.logger.error(f"Could not communicate with Telegram: {self.telegram._redact_token(e)}")
+            return None
+
+    async def send_message(self, message: str):
+        """
+        Sends a message to all admin users concurrently.
+
+        Args:
+            message (str): The message to send.
+        """
+        if not message:
+            return
+        await asyncio.gather(*(
+            self.api_request('sendMessage', {'chat_id': str(admin), 'text': message, 'parse_mode': 'Markdown'})
+            for admin in self.config.admins
+        ))
+
+    async def send_image(self, api_call: str, image: dict, path: str, data: t.Optional[dict] = None):
+        """
+        Sends an image to a Telegram bot with retry logic.
+
+        Args:
+            api_call (str): The API call to make.
+            image (dict): The open files to upload, keyed by form field. Files on disk are
+                opened again by name for each attempt.
+            path (str): The path to the image file, used for logging.
+            data (dict, optional): Form fields to send alongside the files.
+
+        Returns:
+            dict: The sent Telegram message on success (empty if Telegram omitted it), None otherwise.
+                  sendMediaGroup returns a list of messages instead.
+        """
+        max_retries = 3
+        timeouts = [10, 20, 30]
+
+        # aiohttp closes an uploaded file once it is sent, so a retry cannot reuse it.
+        # Files on disk are opened again by name each attempt; anything else is read once.
+        uploads = {}
+        for key, file_obj in image.items():
+            name = getattr(file_obj, 'name', None)
+            if isinstance(name, str) and os.path.isfile(name):
+                uploads[key] = (os.path.basename(name), name)
+            else:
+                if hasattr(file_obj, 'seek'):
+                    file_obj.seek(0)
+                content = file_obj.read() if hasattr(file_obj, 'read') else file_obj
+                uploads[key] = (key, content)
+
+        for attempt in range(max_retries):
+            timeout = timeouts[attempt]
+            try:
+                with contextlib.ExitStack() as files:
+                    # Build a fresh form each attempt, so every upload is complete.
+                    form = aiohttp.FormData()
+                    for key, value in (data or {}).items():
+                        form.add_field(key, str(value))
+                    for key, (filename, source) in uploads.items():
+                        if isinstance(source, str):
+                            source = files.enter_context(open(source, 'rb'))
+                        form.add_field(key, source, filename=filename)
+
+                    self.logger.debug(f"Attempting to send {path} (attempt {attempt + 1}/{max_retries}, timeout={timeout}s)")
+                    session = await self._get_session()
+                    async with session.post(api_call, data=form, timeout=aiohttp.ClientTimeout(total=timeout)) as sent_file:
+                        status = sent_file.status
+                        text = await sent_file.text()
+                        is_json = 'application/json' in sent_file.headers.get('Content-Type', '')
+                        response_json = await sent_file.json(content_type=None) if is_json else {}
+
+                if status != 200:
+                    self.logger.error(f"{path} failed to send. Telegram API returned {status} - {text}")
+                    if 400 <= status < 500:
+                        self.telegram.record_outcome(True)
+                        await self.send_message(f"❌ Image failed to send (Client Error): `{path}`\nStatus: {status}")
+                        return None
+
+                    if self.telegram.record_outcome(False):
+                        return None
+
+                    if attempt == max_retries - 1:
+                        await self.send_message(f"❌ Image failed to send after {max_retries} attempts: `{path}`\nStatus: {status}")
+                        return None
+                    continue
+
+                self.telegram.record_outcome(True)
+                if response_json.get("ok"):
+                    self.logger.debug("Image sent successfully.")
+                    return response_json.get("result") or {}
+                else:
+                    self.logger.error(f"{path} failed to send. Response: {response_json}")
+                    if attempt == max_retries - 1:
+                        await self.send_message(f"❌ Image failed to send after {max_retries} attempts: `{path}`\nResponse: {response_json.get('description', 'Unknown error')}")
+                        return None
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.error(f"Could not communicate with the Telegram bot (attempt {attempt + 1}/{max_retries}): {self.telegram._redact_token(e)}")
+                if self.telegram.record_outcome(False):
+                    return None
+                if attempt == max_retries - 1:
+                    await self.send_message(f"❌ Network error sending image after {max_retries} attempts: `{path}`\nError: {type(e).__name__}")
+                    return None
+                # Wait before retrying (exponential backoff)
+                await asyncio.sleep(2 ** attempt)
+
+        return None
+
+    async def _is_dead_link(self, url: str) -> bool:
+        """
+        Checks whether a Furaffinity submission has been removed.
+
+        Args:
+            url (str): The submission URL.
+
+        Returns:
+            bool: True if the submission no longer exists, False otherwise.
+        """
+        try:
+            session = await self._get_session()
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                return self.dead_link_marker in await response.text(errors='replace')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"An error occurred when checking the Furaffinity link: {e}")
+            return False
+
+    async def check_dead_links(self, urls: list) -> set:
+        """
+        Checks several Furaffinity links concurrently.
+
+        Args:
+            urls (list): The submission URLs to check.
+
+        Returns:
+            set: The URLs that no longer exist.
+        """
+        results = await asyncio.gather(*(self._is_dead_link(url) for url in urls))
+        return {url for url, dead in zip(urls, results) if dead}
+
+    async def poll_telegram_updates(self, is_shutting_down_func):
+        """
+        Polls Telegram for new updates and processes incoming messages from admins.
+
+        Updates are handed to the dispatcher's worker pool, so a slow command does
+        not stall the event loop.
+
+        Args:
+            is_shutting_down_func (callable): Function that returns whether the bot is shutting down.
+        """
+        offset = None
+        consecutive_timeouts = 0
+        consecutive_errors = 0
+        url = self.telegram.build_telegram_api_url('getUpdates', '')
+        self.logger.info("Starting async Telegram polling loop for admin messages.")
+        while not is_shutting_down_func():
+            start_time = time.monotonic()
+            delay = 0
+            try:
+                params = {'timeout': 30}
+                if offset is not None:
+                    params['offset'] = offset
+                session = await self._get_session()
+                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=35, connect=5)) as response:
+                    status = response.status
+                    body = await response.text()
+                    data = await response.json(content_type=None) if status == 200 else {}
+                elapsed = time.monotonic() - start_time
+                if status == 200:
+                    updates = data.get('result', [])
+                    if updates:
+                        self.logger.debug(f"Polling succeeded in {elapsed:.2f}s with {len(updates)} update(s). Offset now {offset}.")
+                    else:
+                        self.logger.debug(f"Polling completed in {elapsed:.2f}s with no updates. Offset {offset}.")
+                    for update in updates:
+                        if not self.telegram.dispatch_update(update):
+                            # Workers are saturated. Leave the offset here so Telegram redelivers the rest.
+                            delay = 1
+                            break
+                        offset = update['update_id'] + 1
+                    consecutive_timeouts = 0
+                    consecutive_errors = 0
+                else:
+                    consecutive_errors += 1
+                    delay = min(5 * consecutive_errors, 60)
+                    self.logger.warning(
+                        f"Failed to fetch updates (status={status}) after {elapsed:.2f}s. "
+                        f"Body preview: {body[:200]!r}. Backing off {delay}s."
+                    )
+            except asyncio.TimeoutError:
+                consecutive_timeouts += 1
+                elapsed = time.monotonic() - start_time
+                log_method = self.logger.info if consecutive_timeouts % 3 == 0 else self.logger.debug
+                log_method(f"Telegram long poll timed out after {elapsed:.2f}s (#{consecutive_timeouts}).")
+            except aiohttp.ClientError as e:
+                consecutive_errors += 1
+                elapsed = time.monotonic() - start_time
+                delay = min(5 * consecutive_errors, 60)
+                self.logger.warning(
+                    f"Telegram polling connection error after {elapsed:.2f}s (#{consecutive_errors}): {self.telegram._redact_token(e)}. "
+                    f"Backing off {delay}s."
+                )
+            except Exception as e:
+                consecutive_errors += 1
+                elapsed = time.monotonic() - start_time
+                delay = min(5 * consecutive_errors, 60)
+                self.logger.error(
+                    f"Unexpected error in Telegram polling after {elapsed:.2f}s (#{consecutive_errors}): {self.telegram._redact_token(e)}. "
+                    f"Backing off {delay}s."
+                )
+            if delay:
+                await asyncio.sleep(delay)
+
+    def start_polling(self, is_shutting_down_func) -> concurrent.futures.Future:
+        """
+        Starts the polling loop as a task on the event loop.
+
+        Args:
+            is_shutting_down_func (callable): Function that returns whether the bot is shutting down.
+
+        Returns:
+            concurrent.futures.Future: The future for the polling task.
+        """
+        return self.submit(self.poll_telegram_updates(is_shutting_down_func))
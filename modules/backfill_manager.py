@@ -0,0 +1,354 @@
+from modules.log_manager import LogManager
+from modules.blob_manager import FetchError, FileTooLargeError, QuotaExceededError
+import os
+import sqlite3
+import threading
+import time
+import typing as t
+
+class Budget:
+    """
+    Paces work to at most a number of files and bytes per second.
+
+    The budget is averaged from the start of the run: after each file, the caller
+    sleeps until the files and bytes spent so far fit the rates. A rate of None
+    is unlimited.
+
+    Attributes:
+        files_per_second (float): The most files per second, or None.
+        bytes_per_second (float): The most bytes per second, or None.
+        files (int): The files spent since the start.
+        bytes (int): The bytes spent since the start.
+    """
+
+    def __init__(self, files_per_second: t.Optional[float] = None, bytes_per_second: t.Optional[float] = None,
+                 clock: t.Callable[[], float] = time.monotonic, sleep: t.Callable[[float], None] = time.sleep):
+        self.files_per_second = files_per_second
+        self.bytes_per_second = bytes_per_second
+        self.clock = clock
+        self.sleep = sleep
+        self.started = clock()
+        self.files = 0
+        self.bytes = 0
+
+    def spend(self, files: int = 0, nbytes: int = 0, should_stop: t.Callable[[], bool] = lambda: False):
+        """
+        Records work done, then waits until it fits the budget.
+
+        Args:
+            files (int): The files done.
+            nbytes (int): The bytes transferred.
+            should_stop (callable): Returns True to stop waiting, e.g. on shutdown.
+        """
+        self.files += files
+        self.bytes += nbytes
+        due = self.started
+        if self.files_per_second:
+            due = max(due, self.started + self.files / self.files_per_second)
+        if self.bytes_per_second:
+            due = max(due, self.started + self.bytes / self.bytes_per_second)
+        # Sleep in short steps, so shutdown is not held up.
+        while not should_stop():
+            remaining = due - self.clock()
+            if remaining <= 0:
+                return
+            self.sleep(min(remaining, 1.0))
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started
+
+
+class BackfillManager:
+    """
+    Imports a large tagged collection from Hydrus in a resumable, paced run.
+
+    A backfill first records every file tagged for a channel in a journal, in a
+    SQLite database. Each file then moves through the phases 'planned',
+    'downloaded' (stored in the queue directory), 'enqueued' (added to the queue)
+    and 'retagged' (queue tag replaced by the posted tag in Hydrus), and every
+    phase is committed before the next one starts. After a crash or shutdown,
+    the run resumes from the journal without searching Hydrus again: a file that
+    reached the queue is not downloaded again, and a file that was enqueued is
+    only retagged. The journal rows of a channel are dropped once it finishes.
+
+    The run is paced by 'backfill_files_per_second' and 'backfill_bytes_per_second',
+    so Hydrus keeps serving its own users, and logs its progress every
+    'backfill_progress_interval' seconds. It pauses while the queue is over quota.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        config (ConfigModel): The bot's configuration settings.
+        hydrus (HydrusManager): The Hydrus manager instance.
+        journal_file (str): The path to the journal database.
+        connection (sqlite3.Connection): The journal database connection.
+        progress (dict): The progress of the running backfills, by channel name.
+
+    Example:
+        >>> backfill = BackfillManager(config, hydrus)
+        >>> backfill.run(channels.default)
+        True
+    """
+
+    PLANNED = 'planned'
+    DOWNLOADED = 'downloaded'
+    ENQUEUED = 'enqueued'
+    RETAGGED = 'retagged'
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS backfill (
+            channel TEXT NOT NULL,
+            file_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            phase TEXT NOT NULL,
+            bytes INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (channel, file_id)
+        );
+        CREATE INDEX IF NOT EXISTS backfill_position ON backfill (channel, position);
+    """
+
+    def __init__(self, config, hydrus, journal_file: str = 'backfill.db'):
+        """
+        Initializes the BackfillManager and opens (or creates) the journal.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+            hydrus (HydrusManager): The Hydrus manager instance.
+            journal_file (str): The name of the journal database file, or ':memory:'.
+
+        Note:
+            The journal file will be stored in the 'queue/' directory.
+        """
+        self.logger = LogManager.setup_logger('BKF')
+        self.config = config.config_data
+        self.hydrus = hydrus
+        if journal_file == ':memory:':
+            self.journal_file = journal_file
+        else:
+            self.journal_file = 'queue/' + journal_file
+            os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.journal_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self._lock, self.connection:
+            if self.journal_file != ':memory:':
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(self.schema)
+        self.progress = {}
+        self.logger.debug('Backfill Module initialized.')
+
+    def close(self):
+        """
+        Closes the journal database connection.
+        """
+        with self._lock:
+            self.connection.close()
+
+    def plan(self, channel: str, file_ids: t.Iterable[int]) -> int:
+        """
+        Records the files a channel's backfill will import, replacing any finished run.
+
+        Args:
+            channel (str): The channel's name.
+            file_ids (Iterable[int]): The Hydrus file IDs, in import order.
+
+        Returns:
+            int: The number of files planned.
+        """
+        now = time.time()
+        rows = [(channel, file_id, position, self.PLANNED, now) for position, file_id in enumerate(file_ids)]
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM backfill WHERE channel = ?", (channel,))
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO backfill (channel, file_id, position, phase, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def mark(self, channel: str, file_id: int, phase: str, nbytes: t.Optional[int] = None):
+        """
+        Commits a file's new phase to the journal.
+
+        Args:
+            channel (str): The channel's name.
+            file_id (int): The Hydrus file ID.
+            phase (str): The phase the file reached.
+            nbytes (int, optional): The bytes downloaded for the file.
+        """
+        with self._lock, self.connection:
+            if nbytes is None:
+                self.connection.execute(
+                    "UPDATE backfill SET phase = ?, updated_at = ? WHERE channel = ? AND file_id = ?",
+                    (phase, time.time(), channel, file_id)
+                )
+            else:
+                self.connection.execute(
+                    "UPDATE backfill SET phase = ?, bytes = ?, updated_at = ? WHERE channel = ? AND file_id = ?",
+                    (phase, nbytes, time.time(), channel, file_id)
+                )
+
+    def pending(self, channel: str) -> t.List[dict]:
+        """
+        Returns a channel's files that are not retagged yet, in import order.
+
+        Returns:
+            list[dict]: The journal rows, with 'file_id' and 'phase' keys.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT file_id, phase FROM backfill WHERE channel = ? AND phase != ? ORDER BY position",
+                (channel, self.RETAGGED)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def has_pending(self, channel: str) -> bool:
+        """
+        Checks whether a channel has an unfinished backfill.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM backfill WHERE channel = ? AND phase != ? LIMIT 1", (channel, self.RETAGGED)
+            ).fetchone()
+        return row is not None
+
+    def counts(self, channel: str) -> dict:
+        """
+        Counts a channel's journaled files by phase.
+
+        Returns:
+            dict: The number of files in each phase, and the bytes downloaded as 'bytes'.
+        """
+        counts = {self.PLANNED: 0, self.DOWNLOADED: 0, self.ENQUEUED: 0, self.RETAGGED: 0, 'bytes': 0}
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT phase, COUNT(*) AS files, SUM(bytes) AS bytes FROM backfill WHERE channel = ? GROUP BY phase",
+                (channel,)
+            ).fetchall()
+        for row in rows:
+            counts[row['phase']] = row['files']
+            counts['bytes'] += row['bytes'] or 0
+        return counts
+
+    def clear(self, channel: str):
+        """
+        Drops a channel's journal rows.
+        """
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM backfill WHERE channel = ?", (channel,))
+
+    def run(self, channel, should_stop: t.Callable[[], bool] = lambda: False) -> bool:
+        """
+        Runs or resumes a channel's backfill.
+
+        Without an unfinished backfill, the files tagged with the channel's queue tag
+        are searched and planned first.
+
+        Args:
+            channel (Channel): The channel to import files for.
+            should_stop (callable): Returns True to stop after the current file, e.g. on shutdown.
+
+        Returns:
+            bool: True if the backfill finished, False if it was stopped or paused, or some
+                files could not be fetched, and can be resumed.
+
+        Raises:
+            hydrus_api.HydrusAPIException: If Hydrus fails. The journal keeps the
+                progress, so running again resumes.
+        """
+        name = channel.name
+        queue = channel.queue
+        pending = self.pending(name)
+        if not pending:
+            if not self.hydrus.check_hydrus_permissions():
+                return False
+            file_ids = self.hydrus.hydrus_client.search_files([channel.queue_tag]).get("file_ids", [])
+            if not file_ids:
+                self.logger.info(f"Nothing to backfill for {name}.")
+                return True
+            self.logger.info(f"Backfilling {self.plan(name, file_ids)} file(s) for {name}.")
+            pending = self.pending(name)
+        else:
+            self.logger.info(f"Resuming the backfill for {name}: {len(pending)} file(s) left.")
+
+        counts = self.counts(name)
+        total = sum(counts[phase] for phase in (self.PLANNED, self.DOWNLOADED, self.ENQUEUED, self.RETAGGED))
+        done = counts[self.RETAGGED]
+        budget = Budget(self.config.backfill_files_per_second, self.config.backfill_bytes_per_second)
+        self.progress[name] = {'done': done, 'total': total, 'bytes': counts['bytes'], 'resumed_at': done,
+                               'started': time.monotonic()}
+        last_report = budget.elapsed()
+        failed = 0
+        queue.ingest_paused = False
+        try:
+            for row in pending:
+                if should_stop():
+                    self.logger.info(f"Backfill for {name} stopped at {done}/{total} file(s). It resumes on the next ingest.")
+                    return False
+                file_id = row['file_id']
+                downloaded = []
+                if row['phase'] in (self.PLANNED, self.DOWNLOADED):
+                    def on_download(nbytes, file_id=file_id):
+                        downloaded.append(nbytes)
+                        self.mark(name, file_id, self.DOWNLOADED, nbytes)
+                    try:
+                        reason = queue.quota_exceeded()
+                        if reason:
+                            raise QuotaExceededError(reason)
+                        # A file queued before a crash is found in the queue and not downloaded again.
+                        queue.save_image_to_queue(file_id, on_download=on_download)
+                    except QuotaExceededError as e:
+                        queue.ingest_paused = True
+                        self.logger.warning(f"Pausing the backfill for {name} at {done}/{total} file(s): {e}.")
+                        return False
+                    except FetchError as e:
+                        # The journal keeps the file in its phase, so the next run tries it again.
+                        self.logger.warning(f"{e} Retrying on the next backfill run.")
+                        failed += 1
+                        continue
+                    except FileTooLargeError:
+                        # Done with, but not retagged. It keeps its queue tag in case the quota is raised.
+                        self.mark(name, file_id, self.RETAGGED)
+                        done += 1
+                        continue
+                    self.mark(name, file_id, self.ENQUEUED)
+                self.hydrus.retag_queued(file_id, channel.queue_tag)
+                self.mark(name, file_id, self.RETAGGED)
+                done += 1
+                self.progress[name].update(done=done, bytes=self.progress[name]['bytes'] + sum(downloaded))
+                budget.spend(1, sum(downloaded), should_stop)
+                if budget.elapsed() - last_report >= self.config.backfill_progress_interval:
+                    last_report = budget.elapsed()
+                    self.logger.info(self.format_progress(name))
+        finally:
+            queue.phash.save()
+            self.progress.pop(name, None)
+        if failed:
+            self.logger.warning(f"Backfill for {name} left {failed} file(s) that could not be fetched. "
+                                f"They are tried again on the next ingest.")
+            return False
+        self.clear(name)
+        self.logger.info(f"Backfill for {name} finished: {done} file(s).")
+        return True
+
+    def format_progress(self, channel: str) -> str:
+        """
+        Describes a channel's backfill progress, e.g. for the log or an admin message.
+
+        Returns:
+            str: The files done, the bytes downloaded, the rate and the estimated time left.
+        """
+        progress = self.progress.get(channel)
+        if progress is None:
+            counts = self.counts(channel)
+            left = counts[self.PLANNED] + counts[self.DOWNLOADED] + counts[self.ENQUEUED]
+            if not left:
+                return f"No backfill for {channel}."
+            return f"Backfill for {channel}: {counts[self.RETAGGED]}/{left + counts[self.RETAGGED]} file(s), paused."
+        done, total = progress['done'], progress['total']
+        elapsed = time.monotonic() - progress['started']
+        message = (f"Backfill for {channel}: {done}/{total} file(s) ({100 * done / max(total, 1):.1f}%), "
+                   f"{progress['bytes'] / 1e6:.1f} MB")
+        rate = (done - progress['resumed_at']) / elapsed if elapsed > 0 else 0
+        if rate > 0:
+            message += f", {rate:.2f} files/s, about {(total - done) / rate / 60:.0f} minute(s) left"
+        return message
@@ -0,0 +1,376 @@
+from modules.log_manager import LogManager
+import contextlib
+import errno
+import os
+import re
+import shutil
+import threading
+import time
+import typing as t
+
+class QuotaExceededError(Exception):
+    """
+    Raised instead of storing a file that would put the queue over its quota.
+    """
+
+
+class FileTooLargeError(Exception):
+    """
+    Raised instead of storing a file that could not fit even with the queue empty.
+    """
+
+
+class FetchError(Exception):
+    """
+    Raised when a file could not be fetched from Hydrus, e.g. because Hydrus did not answer.
+
+    Unlike a file that is skipped on purpose, the file keeps its queue tag and is tried again.
+    """
+
+
+class BlobManager:
+    """
+    Stores queued files once, shared between channel queues by reference count.
+
+    When several channels queue the same Hydrus file, it is downloaded and stored in
+    the 'queue/' directory once. Every queue entry holds a reference to the file, and
+    the file (with its converted video) is deleted when the last reference is released.
+
+    Reference counts are not persisted. They are rebuilt from the channel queues at
+    startup, so they can never drift from the queue files.
+
+    The bytes stored are counted once from the files on disk by rebuild(), then as
+    files are stored and deleted, and the free disk space is asked of the OS at most
+    every 'free_check_interval' seconds and estimated from the bytes written in
+    between, so enforcing the quota never walks the directory. Files derived from a
+    blob, e.g. converted videos and resized images, are not counted. A stored file is
+    never changed in place, so it always matches the hash it is named after.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        directory (str): The directory the files are stored in.
+        refs (dict): The number of queue entries referencing each file name.
+        sizes (dict): The size of each stored file, in bytes.
+        bytes (int): The bytes stored.
+        max_bytes (int): The most bytes to store, or None for no limit.
+        min_free_bytes (int): The free disk space to leave, in bytes.
+        too_large (set): The names of the files refused because they can never fit.
+
+    Example:
+        >>> blobs = BlobManager()
+        >>> blobs.acquire('abc.jpg', lambda: hydrus.get_file_content(file_id))
+        True
+        >>> blobs.release('abc.jpg')
+        True
+    """
+
+    # Files derived from a blob, which are deleted with it.
+    derived_suffixes = ('.mp4', '.part.mp4', '.jpg')
+    # Resized copies of an image keep its extension after this, e.g. 'abc.png.resized.png'.
+    resized_infixes = ('.resized', '.resized.part')
+    # Stored files are named after their SHA256 hash. Derived and temporary files are not.
+    blob_name = re.compile(r'[0-9a-f]{64}\.[0-9a-z]+')
+
+    def __init__(self, directory: str = 'queue', max_bytes: t.Optional[int] = None, min_free_bytes: int = 0,
+                 free_check_interval: float = 60.0, clock: t.Callable[[], float] = time.monotonic):
+        """
+        Initializes the BlobManager.
+
+        Args:
+            directory (str): The directory the files are stored in.
+            max_bytes (int, optional): The most bytes to store. No limit if None.
+            min_free_bytes (int): The free disk space to leave, in bytes.
+            free_check_interval (float): The seconds between free space checks.
+        """
+        self.logger = LogManager.setup_logger('BLB')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.free_check_interval = free_check_interval
+        self.clock = clock
+        self.refs = {}
+        self.sizes = {}
+        self.bytes = 0
+        self.free_checked = None
+        self.free_at_check = 0
+        self.written_since_check = 0
+        self.lock = threading.Lock()
+        self.file_locks = {}
+        self.too_large = set()
+        self.logger.debug('Blob Module initialized.')
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def derived_paths(self, filename: str) -> t.List[str]:
+        """
+        Returns the paths of the files that may be derived from a stored file.
+
+        Args:
+            filename (str): The file name.
+
+        Returns:
+            list[str]: The paths, whether or not the files exist.
+        """
+        path = self.path(filename)
+        ext = os.path.splitext(filename)[1]
+        return [path + suffix for suffix in self.derived_suffixes] + [path + infix + ext for infix in self.resized_infixes]
+
+    def file_lock(self, filename: str) -> threading.Lock:
+        """
+        Returns the lock serialising work on one file, e.g. downloading, converting,
+        verifying or uploading it.
+
+        Args:
+            filename (str): The file name.
+
+        Returns:
+            threading.Lock: The file's lock.
+        """
+        with self.lock:
+            return self.file_locks.setdefault(filename, threading.Lock())
+
+    def rebuild(self, queues: t.Iterable[t.Iterable]):
+        """
+        Recounts the references from the queued entries of every channel, and the
+        bytes stored.
+
+        Args:
+            queues (Iterable): One iterable of queue entries per channel.
+
+        Note:
+            Files stored without a queue entry, e.g. downloaded by a backfill that was
+            stopped before queueing them, count towards the quota too. They are shared
+            rather than downloaded again when they are queued.
+        """
+        refs = {}
+        for entries in queues:
+            for entry in entries:
+                refs[entry['path']] = refs.get(entry['path'], 0) + 1
+        sizes = {}
+        for filename in refs:
+            try:
+                sizes[filename] = os.path.getsize(self.path(filename))
+            except OSError:
+                sizes[filename] = 0
+        try:
+            with os.scandir(self.directory) as found:
+                for item in found:
+                    if item.name not in sizes and self.blob_name.fullmatch(item.name) and item.is_file():
+                        sizes[item.name] = item.stat().st_size
+        except OSError as e:
+            self.logger.error(f"Could not list {self.directory}: {e}")
+        with self.lock:
+            self.refs = refs
+            self.sizes = sizes
+            self.bytes = sum(sizes.values())
+        unreferenced = len(sizes.keys() - refs.keys())
+        self.logger.debug(f"Tracking {len(refs)} stored file(s) and {unreferenced} unreferenced file(s), {self.bytes} bytes.")
+
+    def free_bytes(self) -> int:
+        """
+        Returns the free disk space, in bytes.
+
+        Note:
+            The OS is asked at most every 'free_check_interval' seconds. In between,
+            the bytes stored and deleted since are taken into account.
+        """
+        now = self.clock()
+        with self.lock:
+            if self.free_checked is not None and now - self.free_checked < self.free_check_interval:
+                return self.free_at_check - self.written_since_check
+        free = shutil.disk_usage(self.directory).free
+        with self.lock:
+            self.free_checked = now
+            self.free_at_check = free
+            self.written_since_check = 0
+        return free
+
+    def quota_exceeded(self, incoming: int = 0) -> t.Optional[str]:
+        """
+        Checks whether storing more bytes would go over the quota.
+
+        Args:
+            incoming (int): The bytes about to be stored.
+
+        Returns:
+            str: Why the quota is exceeded, or None if there is room.
+        """
+        if self.max_bytes is not None and self.bytes + incoming > self.max_bytes:
+            return f"the queue holds {self.bytes} of {self.max_bytes} bytes"
+        if self.min_free_bytes and self.free_bytes() - incoming < self.min_free_bytes:
+            return f"less than {self.min_free_bytes} bytes of disk space are free"
+        return None
+
+    def never_fits(self, size: int) -> t.Optional[str]:
+        """
+        Checks whether a file is too large to store even once every other file is gone.
+
+        Args:
+            size (int): The file's size, in bytes.
+
+        Returns:
+            str: Why the file can never be stored, or None if it could be.
+        """
+        if self.max_bytes is not None and size > self.max_bytes:
+            return f"it is {size} bytes, more than the quota of {self.max_bytes} bytes"
+        if self.min_free_bytes and size > self.free_bytes() + self.bytes - self.min_free_bytes:
+            return f"it is {size} bytes, more than the disk has room for"
+        return None
+
+    def acquire(self, filename: str, fetch: t.Callable[[], t.Optional[bytes]], size: int = 0) -> bool:
+        """
+        Adds a reference to a file, storing it first if it is not stored yet.
+
+        Args:
+            filename (str): The file name.
+            fetch (Callable): Returns the file content. Only called if the file is not stored.
+            size (int): The file's expected size in bytes, e.g. from its metadata, so the
+                quota is checked before the file is fetched. 0 if unknown.
+
+        Returns:
+            bool: True if the file is stored and referenced, False if it could not be fetched.
+
+        Raises:
+            QuotaExceededError: If storing the file would go over the quota, or the disk is full.
+            FileTooLargeError: If the file could never be stored, however much of the queue is posted.
+
+        Note:
+            Files are written to a temporary name and renamed, so a stored file is
+            always complete.
+        """
+        path = self.path(filename)
+        with self.file_lock(filename):
+            if not os.path.exists(path):
+                if size:
+                    reason = self.never_fits(size)
+                    if reason:
+                        raise FileTooLargeError(f"Not storing {filename}: {reason}.")
+                    reason = self.quota_exceeded(size)
+                    if reason:
+                        raise QuotaExceededError(f"Not storing {filename}: {reason}.")
+                content = fetch()
+                if not content:
+                    return False
+                reason = self.never_fits(len(content))
+                if reason:
+                    raise FileTooLargeError(f"Not storing {filename}: {reason}.")
+                reason = self.quota_exceeded(len(content))
+                if reason:
+                    raise QuotaExceededError(f"Not storing {filename}: {reason}.")
+                try:
+                    with open(path + '.part', 'wb') as file:
+                        file.write(content)
+                    os.replace(path + '.part', path)
+                except OSError as e:
+                    with contextlib.suppress(OSError):
+                        os.remove(path + '.part')
+                    if e.errno in (errno.ENOSPC, getattr(errno, 'EDQUOT', errno.ENOSPC)):
+                        raise QuotaExceededError(f"Not storing {filename}: the disk is full.") from e
+                    raise
+                with self.lock:
+                    self.sizes[filename] = len(content)
+                    self.bytes += len(content)
+                    self.written_since_check += len(content)
+            else:
+                self.logger.debug(f"Sharing stored file {filename}.")
+            with self.lock:
+                self.refs[filename] = self.refs.get(filename, 0) + 1
+        return True
+
+    def names(self) -> list:
+        """
+        Returns the names of the referenced files, sorted.
+        """
+        with self.lock:
+            return sorted(self.refs)
+
+    def quarantine(self, filename: str, directory: str) -> t.Optional[str]:
+        """
+        Moves a stored file aside, e.g. because its content does not match its hash.
+
+        The file keeps its references, so its queue entries stay queued until it is
+        stored again with replace(). Files derived from it are deleted.
+
+        Args:
+            filename (str): The file name.
+            directory (str): The directory to move the file to.
+
+        Returns:
+            str: The path the file was moved to, or None if it was not stored.
+        """
+        path = self.path(filename)
+        with self.file_lock(filename):
+            for derived in self.derived_paths(filename):
+                with contextlib.suppress(OSError):
+                    os.remove(derived)
+            if not os.path.exists(path):
+                return None
+            os.makedirs(directory, exist_ok=True)
+            target = os.path.join(directory, filename)
+            os.replace(path, target)
+            with self.lock:
+                size = self.sizes.pop(filename, 0)
+                self.bytes -= size
+                self.written_since_check -= size
+        return target
+
+    def replace(self, filename: str, content: bytes):
+        """
+        Stores a file's content again, keeping its references.
+
+        Args:
+            filename (str): The file name.
+            content (bytes): The file content.
+
+        Raises:
+            OSError: If the file could not be written.
+        """
+        path = self.path(filename)
+        with self.file_lock(filename):
+            try:
+                with open(path + '.part', 'wb') as file:
+                    file.write(content)
+                os.replace(path + '.part', path)
+            except OSError:
+                with contextlib.suppress(OSError):
+                    os.remove(path + '.part')
+                raise
+            for derived in self.derived_paths(filename):
+                with contextlib.suppress(OSError):
+                    os.remove(derived)
+            with self.lock:
+                change = len(content) - self.sizes.get(filename, 0)
+                self.sizes[filename] = len(content)
+                self.bytes += change
+                self.written_since_check += change
+
+    def release(self, filename: str) -> bool:
+        """
+        Drops a reference to a file, deleting it when no references remain.
+
+        Args:
+            filename (str): The file name.
+
+        Returns:
+            bool: True if the file was deleted.
+        """
+        with self.file_lock(filename):
+            with self.lock:
+                count = self.refs.get(filename, 0) - 1
+                if count > 0:
+                    self.refs[filename] = count
+                    return False
+                self.refs.pop(filename, None)
+                size = self.sizes.pop(filename, 0)
+                self.bytes -= size
+                self.written_since_check -= size
+            path = self.path(filename)
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.error(f"Could not delete file {path}: {e}")
+            for derived in self.derived_paths(filename):
+                with contextlib.suppress(OSError):
+                    os.remove(derived)
+        return True
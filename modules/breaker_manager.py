@@ -0,0 +1,258 @@
+from modules.log_manager import LogManager
+import collections
+import threading
+import time
+import typing as t
+
+class BreakerOpenError(Exception):
+    """
+    Raised instead of calling a service whose circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service that keeps failing, and probes it until it recovers.
+
+    States:
+        closed:    Calls go through. The outcomes of the last 'window' calls are kept,
+                   and the breaker opens when at least 'min_calls' of them are recorded
+                   and the share of failures reaches 'failure_rate'.
+        open:      Calls are refused at once for 'cooldown' seconds.
+        half-open: After the cooldown, one probe is let through: the 'probe' callable
+                   if given (a cheap request), or else the next call. Success closes
+                   the breaker; failure opens it again with the cooldown doubled, up
+                   to 'max_cooldown'.
+
+    Only errors of 'failure_types' count as failures, e.g. connection errors, not a
+    missing file.
+
+    Attributes:
+        name (str): The service's name.
+        state (str): 'closed', 'open' or 'half-open'.
+        outcomes (deque): The recent outcomes while closed, True for success.
+        cooldown (float): The current open period in seconds.
+        opened (int): The number of times the breaker opened.
+
+    Example:
+        >>> breaker = CircuitBreaker('hydrus', probe=client.get_api_version)
+        >>> client = breaker.guard(client)
+        >>> client.search_files(['tag'])  # Raises BreakerOpenError while open.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name: str, window: int = 20, failure_rate: float = 0.5, min_calls: int = 5,
+                 cooldown: float = 30.0, max_cooldown: float = 600.0, probe: t.Optional[t.Callable] = None,
+                 failure_types: t.Tuple[t.Type[BaseException], ...] = (Exception,),
+                 clock: t.Callable[[], float] = time.monotonic):
+        self.logger = LogManager.setup_logger('BRK')
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.probe = probe
+        self.failure_types = failure_types
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.outcomes = collections.deque(maxlen=max(1, window))
+        self.state = self.CLOSED
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.opened = 0
+
+    def _open(self):
+        # Called with the lock held.
+        self.state = self.OPEN
+        self.opened_at = self.clock()
+        self.probe_started = None
+        self.outcomes.clear()
+        self.opened += 1
+        self.logger.warning(f"{self.name} circuit opened. Skipping calls for {self.cooldown:.0f} seconds.")
+
+    def _close(self):
+        # Called with the lock held.
+        self.state = self.CLOSED
+        self.cooldown = self.base_cooldown
+        self.probe_started = None
+        self.outcomes.clear()
+        self.logger.info(f"{self.name} circuit closed. The service recovered.")
+
+    def allow(self) -> bool:
+        """
+        Checks whether a call may go through now.
+
+        Returns:
+            bool: False while the breaker is open, or while another probe is under way.
+
+        Note:
+            A caller that is allowed through must report the outcome with
+            record_success() or record_failure(), or use call() instead.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            now = self.clock()
+            if self.state == self.OPEN:
+                if now < self.opened_at + self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+            # Half-open: let one probe through. A probe that never reported is replaced after a cooldown.
+            if self.probe_started is not None and now < self.probe_started + self.cooldown:
+                return False
+            self.probe_started = now
+        if self.probe is None:
+            return True
+        try:
+            self.probe()
+        except Exception as e:
+            self.logger.debug(f"{self.name} probe failed: {e}")
+            self.record_failure()
+            return False
+        self.record_success()
+        return True
+
+    def record_success(self):
+        """
+        Records a successful call.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                self.outcomes.append(True)
+            elif self.state == self.HALF_OPEN:
+                self._close()
+
+    def record_failure(self):
+        """
+        Records a failed call, opening the breaker if failures reach the threshold.
+        """
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == self.CLOSED:
+                self.outcomes.append(False)
+                failures = self.outcomes.count(False)
+                if len(self.outcomes) >= self.min_calls and failures >= self.failure_rate * len(self.outcomes):
+                    self._open()
+
+    def call(self, func: t.Callable, *args, **kwargs):
+        """
+        Calls a function through the breaker.
+
+        Raises:
+            BreakerOpenError: If the breaker is open.
+            Exception: Whatever the function raises.
+        """
+        if not self.allow():
+            raise BreakerOpenError(f"The {self.name} circuit is open.")
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_types:
+            self.record_failure()
+            raise
+        except Exception:
+            # Not a service failure, e.g. a missing file. The service answered.
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def guard(self, target) -> 'GuardedClient':
+        """
+        Wraps an API client so every method call goes through the breaker.
+        """
+        return GuardedClient(target, self)
+
+    def status(self) -> dict:
+        """
+        Returns the breaker's state for admin tooling.
+
+        Returns:
+            dict: 'name', 'state', 'calls' and 'failures' in the window, 'opened'
+                  (times opened) and 'retry_in' (seconds until the next probe, or 0).
+        """
+        with self.lock:
+            retry_in = 0.0
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.opened_at + self.cooldown - self.clock())
+            return {
+                'name': self.name,
+                'state': self.state,
+                'calls': len(self.outcomes),
+                'failures': self.outcomes.count(False),
+                'opened': self.opened,
+                'retry_in': retry_in,
+            }
+
+
+class GuardedClient:
+    """
+    Forwards attribute access to an API client, calling its methods through a breaker.
+    """
+
+    def __init__(self, target, breaker: CircuitBreaker):
+        self._target = target
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        breaker = self._breaker
+
+        def guarded(*args, **kwargs):
+            return breaker.call(attribute, *args, **kwargs)
+        return guarded
+
+
+class BreakerManager:
+    """
+    Collects the bot's circuit breakers so admins can inspect them.
+
+    Attributes:
+        breakers (dict): The circuit breakers, keyed by name.
+
+    Example:
+        >>> breakers = BreakerManager([hydrus.breaker, telegram.breaker])
+        >>> print(breakers.format_status())
+    """
+
+    def __init__(self, breakers: t.Iterable[CircuitBreaker] = ()):
+        self.breakers = {breaker.name: breaker for breaker in breakers if breaker is not None}
+
+    @staticmethod
+    def from_config(config, name: str, **kwargs) -> CircuitBreaker:
+        """
+        Creates a circuit breaker with the configured thresholds.
+
+        Args:
+            config (ConfigModel): The bot's configuration settings.
+            name (str): The service's name.
+            **kwargs: Passed to CircuitBreaker, e.g. 'probe' and 'failure_types'.
+
+        Returns:
+            CircuitBreaker: The breaker.
+        """
+        return CircuitBreaker(name, window=config.breaker_window, failure_rate=config.breaker_failure_rate,
+                              min_calls=config.breaker_min_calls, cooldown=config.breaker_cooldown,
+                              max_cooldown=config.breaker_max_cooldown, **kwargs)
+
+    def status(self) -> t.List[dict]:
+        return [breaker.status() for breaker in self.breakers.values()]
+
+    def format_status(self) -> str:
+        """
+        Returns one line per breaker, for an admin message.
+        """
+        lines = []
+        for status in self.status():
+            line = f"{status['name']}: {status['state']} ({status['failures']}/{status['calls']} failed, opened {status['opened']}x)"
+            if status['retry_in']:
+                line += f", probing in {status['retry_in']:.0f}s"
+            lines.append(line)
+        return "\n".join(lines) or "No circuit breakers."
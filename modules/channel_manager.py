@@ -0,0 +1,165 @@
+from modules.log_manager import LogManager
+from modules.blob_manager import BlobManager
+from modules.ledger_manager import LedgerManager
+from modules.media_cache_manager import MediaCacheManager
+from modules.process_manager import ProcessManager
+from modules.queue_manager import QueueManager
+from modules.schedule_manager import ScheduleManager
+import typing as t
+
+class Channel:
+    """
+    One Telegram channel the bot posts to.
+
+    Attributes:
+        name (str): The channel's name.
+        config (ConfigManager): The configuration with the channel's settings applied.
+        queue (QueueManager): The channel's queue.
+    """
+
+    def __init__(self, name: str, config, queue: QueueManager):
+        self.name = name
+        self.config = config
+        self.queue = queue
+
+    @property
+    def queue_tag(self) -> str:
+        return self.config.config_data.queue_tag
+
+    @property
+    def delay(self) -> int:
+        return self.config.config_data.delay
+
+    def get_delay(self) -> int:
+        """
+        Returns the delay until the channel's next update, in minutes.
+
+        With the 'adaptive' cadence, the delay follows the queue depth and ingest rate.
+        Otherwise it is the configured 'delay'.
+
+        Returns:
+            int: The delay in minutes.
+        """
+        config = self.config.config_data
+        if config.cadence_mode != 'adaptive':
+            return config.delay
+        try:
+            self.queue.load_queue()
+            depth = len(self.queue.snapshot().entries)
+            ingest_per_day = self.queue.ingest_rate()
+        except Exception as e:
+            # The next update must always be scheduled. Fall back to the fixed delay.
+            self.queue.logger.error(f"Could not measure the queue for the adaptive cadence: {e}")
+            return config.delay
+        delay = ScheduleManager.get_adaptive_delay(depth, ingest_per_day, config.post_batch_size, config.cadence_min_delay,
+                                                   config.cadence_max_delay, config.cadence_target_days)
+        self.queue.logger.info(f"{depth} file(s) queued, {ingest_per_day:.1f} queued per day: posting every {delay} minutes.")
+        return delay
+
+
+class ChannelManager:
+    """
+    Routes files from Hydrus to several Telegram channels from one process.
+
+    Every configured channel gets its own queue, posting plan and cadence, selected
+    by its own Hydrus queue tag. The queues share one reference-counted file store,
+    so a file queued for several channels is downloaded and stored once, as well as
+    the Telegram file_id cache and the posted ledger.
+
+    Without a 'channels' setting, a single 'default' channel is built from the
+    top-level settings, using the original queue file names.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        blobs (BlobManager): The file store shared by the channel queues.
+        media_cache (MediaCacheManager): The file_id cache shared by the channel queues.
+        ledger (LedgerManager): The posted ledger shared by the channel queues.
+        processes (ProcessManager): The media tool runner shared by the channel queues.
+        channels (list[Channel]): The channels, in configuration order.
+
+    Example:
+        >>> channels = ChannelManager(config)
+        >>> for channel in channels:
+        ...     hydrus.get_new_hydrus_files(channel.queue, channel.queue_tag)
+    """
+
+    def __init__(self, config):
+        """
+        Initializes the ChannelManager and a queue for every channel.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+        """
+        self.logger = LogManager.setup_logger('CHN')
+        self.blobs = BlobManager(max_bytes=config.config_data.queue_max_bytes,
+                                 min_free_bytes=config.config_data.queue_min_free_bytes)
+        self.media_cache = MediaCacheManager('media_cache.json')
+        self.ledger = LedgerManager('posted.db')
+        self.processes = ProcessManager(config)
+        self.channels = []
+        for channel in config.config_data.get_channels():
+            channel_config = config.for_channel(channel)
+            queue_file = 'queue.json' if channel.name == 'default' else f"queue-{channel.name}.json"
+            queue = QueueManager(channel_config, queue_file, channel=channel.name, blobs=self.blobs,
+                                 media_cache=self.media_cache, ledger=self.ledger, processes=self.processes)
+            self.channels.append(Channel(channel.name, channel_config, queue))
+        self.logger.debug(f"Channel Module initialized with {len(self.channels)} channel(s).")
+
+    def __iter__(self) -> t.Iterator[Channel]:
+        return iter(self.channels)
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    @property
+    def default(self) -> Channel:
+        """
+        The first configured channel.
+        """
+        return self.channels[0]
+
+    def get(self, name: str) -> t.Optional[Channel]:
+        """
+        Returns the channel with a name, or None.
+        """
+        for channel in self.channels:
+            if channel.name == name:
+                return channel
+        return None
+
+    def set_hydrus(self, hydrus):
+        """
+        Sets the Hydrus manager for every channel queue.
+        """
+        for channel in self.channels:
+            channel.queue.set_hydrus(hydrus)
+
+    def set_telegram(self, telegram):
+        """
+        Sets the Telegram manager for every channel queue.
+        """
+        for channel in self.channels:
+            channel.queue.set_telegram(telegram)
+
+    def load(self):
+        """
+        Loads every channel queue and counts the references to the stored files.
+        """
+        for channel in self.channels:
+            channel.queue.load_queue()
+        self.blobs.rebuild(channel.queue.snapshot().entries for channel in self.channels)
+
+    def save(self):
+        """
+        Saves every loaded channel queue.
+        """
+        for channel in self.channels:
+            if channel.queue.queue_loaded:
+                channel.queue.save_queue()
+
+    def flush(self):
+        """
+        Saves every loaded channel queue for shutdown, once the changes in progress are done.
+        """
+        for channel in self.channels:
+            channel.queue.flush()
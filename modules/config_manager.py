@@ -1,8 +1,76 @@
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, ValidationError, ValidationInfo, field_validator
 from modules.log_manager import LogManager
+from typing import Literal, Optional
+import copy
 import json
 import sys
 
+class TagRuleModel(BaseModel):
+    """
+    Pydantic model for a tag-to-caption rule.
+
+    Each rule maps a Hydrus tag namespace to a caption field and a template. See
+    TagManager for the placeholders a template may use.
+
+    Attributes:
+        namespace (str): The Hydrus tag namespace, e.g. 'creator'.
+        field (str): The caption field the tag is rendered into.
+        template (str): The template for each tag, using {name} and {query}.
+        remove (str): Text removed from the tag before it becomes {name}, e.g. ' (artist)'.
+        ascii_only (bool): Drop non-ASCII characters from {name}.
+    """
+
+    namespace: str = Field(..., min_length=1, title='Namespace', description='The Hydrus tag namespace, e.g. creator.')
+    field: Literal['title', 'creator', 'character'] = Field(..., title='Field', description='The caption field the tag is rendered into.')
+    template: str = Field('{name}', title='Template', description='The template for each tag. Supports {name} and {query}.')
+    remove: str = Field('', title='Remove', description='Text removed from the tag before it becomes {name}.')
+    ascii_only: bool = Field(False, title='ASCII Only', description='Drop non-ASCII characters from {name}.')
+
+
+def default_tag_rules() -> list[TagRuleModel]:
+    """
+    Returns the built-in tag rules, which link creators and characters to e621.
+    """
+    e621_link = '<a href="https://e621.net/posts?tags={query}">{name}</a>'
+    return [
+        TagRuleModel(namespace='creator', field='creator', template=e621_link, remove=' (artist)'),
+        TagRuleModel(namespace='title', field='title', template='{name}', remove=' (series)', ascii_only=True),
+        TagRuleModel(namespace='character', field='character', template=e621_link, remove=' (character)'),
+    ]
+
+
+class ChannelModel(BaseModel):
+    """
+    Pydantic model for one Telegram channel the bot posts to.
+
+    Each channel has its own Hydrus queue tag, queue and posting cadence. Settings
+    left unset fall back to the top-level configuration.
+
+    Attributes:
+        name (str): A short unique name, used in the channel's queue and plan file names.
+        telegram_channel (int): The Telegram channel ID to post to.
+        queue_tag (str): The Hydrus tag that queues files for this channel.
+        delay (int): The delay between updates in minutes.
+        ingest_delay (int): The delay between Hydrus searches in minutes.
+        post_batch_size (int): The number of files to post per update.
+        selection_strategy (str): How the next file is chosen.
+        cadence_mode (str): 'fixed' or 'adaptive'.
+        cadence_target_days (float): For 'adaptive', the number of days the queue should last.
+        queue_max_items (int): The most files to queue before ingest pauses.
+    """
+
+    name: str = Field(..., pattern=r'^[A-Za-z0-9_-]{1,64}$', title='Name', description="A short unique name. A channel named 'default' uses the original queue and plan file names.")
+    telegram_channel: int = Field(..., title='Telegram Channel ID', description='The Telegram channel ID.')
+    queue_tag: str = Field(..., title='Queue Tag', description='The tag to use for searching Hydrus for files to queue for this channel.')
+    delay: Optional[int] = Field(None, ge=1, title='Delay', description='The delay between updates in minutes. Defaults to the top-level delay.')
+    ingest_delay: Optional[int] = Field(None, ge=1, title='Ingest Delay', description="The delay between Hydrus searches for this channel's queue tag, in minutes. Defaults to the top-level ingest_delay.")
+    post_batch_size: Optional[int] = Field(None, ge=1, le=10, title='Post Batch Size', description='The number of files to post per update. Defaults to the top-level post_batch_size.')
+    selection_strategy: Optional[Literal['uniform', 'fifo', 'age', 'creator']] = Field(None, title='Selection Strategy', description='How the next file to post is chosen. Defaults to the top-level selection_strategy.')
+    cadence_mode: Optional[Literal['fixed', 'adaptive']] = Field(None, title='Cadence Mode', description='How the delay between updates is chosen. Defaults to the top-level cadence_mode.')
+    cadence_target_days: Optional[float] = Field(None, gt=0, title='Cadence Target Days', description="For 'adaptive': the number of days the queue should last. Defaults to the top-level cadence_target_days.")
+    queue_max_items: Optional[int] = Field(None, ge=1, title='Queue Max Items', description="The most files to queue for this channel before ingest pauses. Defaults to the top-level queue_max_items.")
+
+
 class ConfigModel(BaseModel):
     """
     Pydantic model for validating and managing bot configuration settings.
@@ -21,6 +89,54 @@ class ConfigModel(BaseModel):
         delay (int): The delay between updates in minutes.
         timezone (int): The timezone offset in hours from UTC.
         log_level (int): The logging level for the bot. uses 10/20/30/40/50 for DEBUG/INFO/WARNING/ERROR/CRITICAL
+        post_batch_size (int): The number of files to post per update. Values above 1 post an album.
+        telegram_async (bool): Use the asyncio network engine for Telegram instead of blocking requests.
+        dispatch_workers (int): The number of worker threads handling admin messages.
+        dispatch_queue_size (int): The number of admin messages that may wait for a worker.
+        tag_rules (list[TagRuleModel]): The rules for rendering tags into captions.
+        skip_posted (bool): Skip queueing files the posted ledger shows were already posted.
+        near_duplicate_threshold (int): The perceptual hash distance, in bits, at which files count as near-duplicates. Disabled by default.
+        near_duplicate_action (str): 'skip' to leave near-duplicates out of the queue, 'flag' to queue them and notify the admins.
+        selection_strategy (str): How the next file is chosen: 'uniform', 'fifo', 'age' or 'creator'.
+        selection_age_half_life (float): For 'age', the hours of waiting that double a file's chance of being chosen.
+        selection_creator_window (int): For 'creator', the number of recent posts whose creators are down-weighted.
+        selection_creator_penalty (float): For 'creator', the weight multiplier per recent post by the same creator.
+        plan_lookahead (int): The number of upcoming files kept in the posting plan and prepared ahead of time.
+        plan_seed (int): The seed for the posting plan's random order. Random when unset.
+        cadence_mode (str): 'fixed' posts every 'delay' minutes. 'adaptive' sets the delay from the queue depth and ingest rate.
+        cadence_min_delay (int): For 'adaptive', the shortest delay between updates in minutes.
+        cadence_max_delay (int): For 'adaptive', the longest delay between updates in minutes.
+        cadence_target_days (float): For 'adaptive', the number of days the queue should last.
+        ingest_delay (int): The delay between Hydrus searches in minutes. Defaults to the posting delay.
+        ingest_retries (int): The attempts at a Hydrus search and download before waiting for the next one.
+        post_retries (int): The attempts at a post before waiting for the next one.
+        telegram_api_url (str): The Bot API server's base URL. Defaults to https://api.telegram.org.
+        telegram_local_mode (bool): Whether the Bot API server runs locally with --local, so media is sent by file path.
+        metadata_refresh_ttl (float): The seconds before a planned file's tags are checked in Hydrus again. Never if unset.
+        link_check_ttl (float): The seconds before a planned file's source links are checked for removal again. Never if unset.
+        queue_max_items (int): The most files to queue per channel before ingest pauses. Unlimited if unset.
+        queue_max_bytes (int): The most bytes of queued files to store before ingest pauses. Unlimited if unset.
+        queue_min_free_bytes (int): The free disk space ingest leaves, in bytes.
+        backfill_files_per_second (float): The most files per second a backfill imports. Unlimited if unset.
+        backfill_bytes_per_second (int): The most bytes per second a backfill downloads. Unlimited if unset.
+        backfill_progress_interval (float): The seconds between a backfill's progress reports in the log.
+        media_tool_timeout (float): The seconds a media tool such as ffmpeg may run before it is killed.
+        media_tool_cpu_seconds (int): The CPU seconds a media tool may use before it is killed. Unlimited if unset.
+        media_tool_stderr_lines (int): The number of a media tool's last stderr lines kept for the log.
+        verify_interval (int): The minutes between integrity checks of the stored queue files. 0 to not check.
+        verify_workers (int): The number of threads hashing stored files during an integrity check.
+        verify_slice_size (int): The most stored files one integrity check verifies.
+        hydrus_session_ttl (float): The seconds a successful Hydrus permission check is trusted.
+        breaker_window (int): The number of recent calls a circuit breaker judges a service by.
+        breaker_failure_rate (float): The share of failed calls in the window that opens a circuit breaker.
+        breaker_min_calls (int): The number of calls in the window before a circuit breaker can open.
+        breaker_cooldown (float): The seconds an open circuit breaker waits before probing the service.
+        breaker_max_cooldown (float): The longest wait between probes, as failed probes double the wait.
+        channels (list[ChannelModel]): The channels to post to. When empty, the bot posts to telegram_channel only.
+        webhook_url (str): The public HTTPS URL Telegram sends updates to. Long polling is used when unset.
+        webhook_host (str): The local address the webhook server listens on.
+        webhook_port (int): The local port the webhook server listens on.
+        webhook_secret (str): The secret token Telegram must send with every update. Generated at startup when unset.
 
     Example:
         >>> config = ConfigModel(
@@ -51,6 +167,78 @@ class ConfigModel(BaseModel):
     max_image_dimension: int = Field(..., title='Max Image Dimension', description='The maximum dimension of an image in pixels.')
     max_file_size: int = Field(..., title='Max File Size', description='The maximum size of a file in bytes.')
     log_level: int = Field(..., title='Log Level', description='The logging level for the bot.')
+    post_batch_size: int = Field(1, ge=1, le=10, title='Post Batch Size', description='The number of files to post per update. Values above 1 are posted together as an album.')
+    telegram_async: bool = Field(False, title='Telegram Async', description='Use the asyncio network engine for all Telegram I/O instead of blocking requests.')
+    dispatch_workers: int = Field(2, ge=1, title='Dispatch Workers', description='The number of worker threads handling admin messages.')
+    dispatch_queue_size: int = Field(100, ge=1, title='Dispatch Queue Size', description='The number of admin messages that may wait for a worker before new updates are rejected.')
+    tag_rules: list[TagRuleModel] = Field(default_factory=default_tag_rules, title='Tag Rules', description='The rules for rendering Hydrus tags into captions.')
+    skip_posted: bool = Field(True, title='Skip Posted', description='Skip queueing files that the local posted ledger shows were already posted.')
+    near_duplicate_threshold: Optional[int] = Field(None, ge=0, le=64, title='Near-Duplicate Threshold', description='The perceptual hash distance, in bits, at which a new file counts as a near-duplicate of a queued or posted file, e.g. 6. Disabled when null.')
+    near_duplicate_action: Literal['skip', 'flag'] = Field('skip', title='Near-Duplicate Action', description="'skip' leaves near-duplicates out of the queue. 'flag' queues them and notifies the admins.")
+    selection_strategy: Literal['uniform', 'fifo', 'age', 'creator'] = Field('uniform', title='Selection Strategy', description="How the next file to post is chosen: 'uniform' (random), 'fifo' (oldest first), 'age' (random, favouring files that waited longer) or 'creator' (random, with an equal share per creator).")
+    selection_age_half_life: float = Field(168.0, gt=0, title='Selection Age Half-Life', description="For 'age': the hours of waiting that double a file's chance of being chosen.")
+    selection_creator_window: int = Field(10, ge=1, title='Selection Creator Window', description="For 'creator': the number of recent posts whose creators are down-weighted.")
+    selection_creator_penalty: float = Field(0.25, gt=0, le=1, title='Selection Creator Penalty', description="For 'creator': the weight multiplier applied per recent post by the same creator.")
+    plan_lookahead: int = Field(10, ge=1, le=100, title='Plan Lookahead', description='The number of upcoming files kept in the posting plan and prepared ahead of time.')
+    plan_seed: Optional[int] = Field(None, title='Plan Seed', description="The seed for the posting plan's random order, for a reproducible order. Random when unset.")
+    cadence_mode: Literal['fixed', 'adaptive'] = Field('fixed', title='Cadence Mode', description="'fixed' posts every 'delay' minutes. 'adaptive' sets the delay from the queue depth and ingest rate, between cadence_min_delay and cadence_max_delay.")
+    cadence_min_delay: int = Field(15, ge=1, title='Cadence Min Delay', description="For 'adaptive': the shortest delay between updates in minutes.")
+    cadence_max_delay: int = Field(1440, ge=1, title='Cadence Max Delay', description="For 'adaptive': the longest delay between updates in minutes.")
+    cadence_target_days: float = Field(14.0, gt=0, title='Cadence Target Days', description="For 'adaptive': the number of days the queued files should last, on top of keeping up with new files.")
+    ingest_delay: Optional[int] = Field(None, ge=1, title='Ingest Delay', description='The delay between Hydrus searches for new files, in minutes. Ingest runs apart from posting. Defaults to the posting delay.')
+    ingest_retries: int = Field(3, ge=1, title='Ingest Retries', description='The attempts at a Hydrus search and download before waiting for the next scheduled one.')
+    post_retries: int = Field(3, ge=1, title='Post Retries', description='The attempts at a post before waiting for the next scheduled one. Retries do not search Hydrus again.')
+    telegram_api_url: Optional[str] = Field(None, pattern=r'^https?://', title='Telegram API URL', description='The base URL of the Bot API server, e.g. http://127.0.0.1:8081 for a self-hosted telegram-bot-api. Defaults to https://api.telegram.org.')
+    telegram_local_mode: bool = Field(False, title='Telegram Local Mode', description="Whether the Bot API server at telegram_api_url runs with --local on this machine. Queued files are then sent by their file:// path instead of being uploaded, and may be up to 2 GB.")
+    metadata_refresh_ttl: Optional[float] = Field(21600.0, ge=0, title='Metadata Refresh TTL', description="The seconds before the tags and sources of a planned file are checked in Hydrus again, so captions follow corrections made after ingest. Never if null.")
+    link_check_ttl: Optional[float] = Field(86400.0, ge=0, title='Link Check TTL', description="The seconds before the Furaffinity links of a planned file are checked for removed submissions again, since a file may wait weeks between ingest and its post. Never if null.")
+    queue_max_items: Optional[int] = Field(None, ge=1, title='Queue Max Items', description="The most files to queue per channel. Ingest pauses, leaving files tagged in Hydrus, until posts drain the queue. Unlimited if null.")
+    queue_max_bytes: Optional[int] = Field(None, ge=1, title='Queue Max Bytes', description="The most bytes of queued files to store, for all channels. Ingest pauses until posts drain the queue. Unlimited if null.")
+    queue_min_free_bytes: int = Field(100000000, ge=0, title='Queue Min Free Bytes', description="The free disk space ingest leaves on the queue's disk, in bytes. 0 to not check.")
+    backfill_files_per_second: Optional[float] = Field(2.0, gt=0, title='Backfill Files per Second', description='The most files per second a backfill imports from Hydrus. Unlimited if null.')
+    backfill_bytes_per_second: Optional[int] = Field(5000000, gt=0, title='Backfill Bytes per Second', description='The most bytes per second a backfill downloads from Hydrus. Unlimited if null.')
+    backfill_progress_interval: float = Field(30.0, gt=0, title='Backfill Progress Interval', description="The seconds between a backfill's progress reports in the log.")
+    media_tool_timeout: float = Field(600.0, gt=0, title='Media Tool Timeout', description='The seconds a media tool such as ffmpeg may run, e.g. to convert a video, before it is killed.')
+    media_tool_cpu_seconds: Optional[int] = Field(3600, ge=1, title='Media Tool CPU Seconds', description='The CPU seconds a media tool may use, counting all its threads, before the OS kills it. Only enforced on Linux. Unlimited if null.')
+    media_tool_stderr_lines: int = Field(50, ge=1, title='Media Tool Stderr Lines', description="The number of a media tool's last stderr lines kept and logged when it fails.")
+    verify_interval: int = Field(1440, ge=0, title='Verify Interval', description='The minutes between integrity checks of the stored queue files. Each check verifies the next slice of files. 0 to only check on the /verify command.')
+    verify_workers: int = Field(4, ge=1, title='Verify Workers', description='The number of threads hashing stored files during an integrity check.')
+    verify_slice_size: int = Field(1000, ge=1, title='Verify Slice Size', description='The most stored files one integrity check verifies. Larger queues are verified over several checks.')
+    hydrus_session_ttl: float = Field(3600.0, ge=0, title='Hydrus Session TTL', description='The seconds a successful Hydrus permission check is trusted before asking again. It is asked again at once if Hydrus refuses the access key.')
+    breaker_window: int = Field(20, ge=1, title='Breaker Window', description='The number of recent calls to Hydrus or Telegram a circuit breaker judges the service by.')
+    breaker_failure_rate: float = Field(0.5, gt=0, le=1, title='Breaker Failure Rate', description='The share of failed calls in the window that opens a circuit breaker, skipping calls to the service.')
+    breaker_min_calls: int = Field(5, ge=1, title='Breaker Minimum Calls', description='The number of calls in the window before a circuit breaker can open.')
+    breaker_cooldown: float = Field(30.0, gt=0, title='Breaker Cooldown', description='The seconds an open circuit breaker waits before probing the service again.')
+    breaker_max_cooldown: float = Field(600.0, gt=0, title='Breaker Maximum Cooldown', description='The longest wait between probes, in seconds. Every failed probe doubles the wait.')
+    channels: list[ChannelModel] = Field(default_factory=list, title='Channels', description='The channels to post to, each with its own queue tag, queue and cadence. When empty, the bot posts to telegram_channel using queue_tag and delay.')
+    webhook_url: Optional[str] = Field(None, title='Webhook URL', description='The public HTTPS URL Telegram sends updates to. Long polling is used when unset.')
+    webhook_host: str = Field('127.0.0.1', title='Webhook Host', description='The local address the webhook server listens on.')
+    webhook_port: int = Field(8443, ge=0, le=65535, title='Webhook Port', description='The local port the webhook server listens on.')
+    webhook_secret: Optional[str] = Field(None, pattern=r'^[A-Za-z0-9_-]{1,256}$', title='Webhook Secret', description='The secret token Telegram must send with every update. Generated at startup when unset.')
+
+    @field_validator('channels')
+    @classmethod
+    def unique_channel_names(cls, channels: list[ChannelModel]) -> list[ChannelModel]:
+        names = [channel.name for channel in channels]
+        if len(names) != len(set(names)):
+            raise ValueError('Channel names must be unique.')
+        return channels
+
+    @field_validator('telegram_local_mode')
+    @classmethod
+    def local_mode_needs_local_server(cls, local_mode: bool, info: ValidationInfo) -> bool:
+        if local_mode and not info.data.get('telegram_api_url'):
+            raise ValueError('telegram_local_mode needs telegram_api_url set to the local Bot API server.')
+        return local_mode
+
+    def get_channels(self) -> list[ChannelModel]:
+        """
+        Returns the configured channels, or a single 'default' channel built from the
+        top-level settings when none are configured.
+        """
+        if self.channels:
+            return list(self.channels)
+        return [ChannelModel(name='default', telegram_channel=self.telegram_channel, queue_tag=self.queue_tag, delay=self.delay)]
 
 
 class ConfigManager:
@@ -122,4 +310,20 @@ class ConfigManager:
         except ValidationError as e:
             self.logger.error(f"Configuration validation error: {e}")
             # Cannot continue.
-            sys.exit(1)
\ No newline at end of file
+            sys.exit(1)
+
+    def for_channel(self, channel: ChannelModel) -> 'ConfigManager':
+        """
+        Returns a view of the configuration with a channel's settings applied.
+
+        Args:
+            channel (ChannelModel): The channel.
+
+        Returns:
+            ConfigManager: A copy whose config_data uses the channel's Telegram channel,
+                           queue tag and any per-channel overrides.
+        """
+        view = copy.copy(self)
+        overrides = {key: value for key, value in channel.model_dump(exclude={'name'}).items() if value is not None}
+        view.config_data = self.config_data.model_copy(update=overrides)
+        return view
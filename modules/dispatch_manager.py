@@ -0,0 +1,160 @@
+from modules.log_manager import LogManager
+import collections
+import queue
+import threading
+import typing as t
+
+class DispatchManager:
+    """
+    Hands Telegram updates to a small pool of worker threads.
+
+    Updates are routed to a worker by chat, so messages from one chat are handled
+    in the order they arrived while different chats are handled in parallel. Each
+    worker has a bounded queue; when it is full the update is rejected instead of
+    blocking the caller. Updates that were already seen (by update_id) are dropped.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        handler (callable): The function called with each update's message.
+        workers (int): The number of worker threads.
+        queues (list): The bounded work queue of each worker.
+        seen_window (int): The number of recent update_ids remembered for de-duplication.
+
+    Example:
+        >>> dispatcher = DispatchManager(telegram.process_incoming_message, workers=2)
+        >>> dispatcher.start()
+        >>> dispatcher.submit({'update_id': 1, 'message': {...}})
+        True
+        >>> dispatcher.stop()
+    """
+
+    def __init__(self, handler: t.Callable[[dict], None], workers: int = 2, queue_size: int = 100, seen_window: int = 1000):
+        """
+        Initializes the DispatchManager.
+
+        Args:
+            handler (callable): The function called with each update's message.
+            workers (int): The number of worker threads.
+            queue_size (int): The total number of updates that may wait across all workers.
+            seen_window (int): The number of recent update_ids remembered for de-duplication.
+        """
+        self.logger = LogManager.setup_logger('DIS')
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queues = [queue.Queue(maxsize=max(1, queue_size // self.workers)) for _ in range(self.workers)]
+        self.seen_window = seen_window
+        self._seen = collections.OrderedDict()
+        self._seen_lock = threading.Lock()
+        self._threads = []
+        self.logger.debug('Dispatch Module initialized.')
+
+    @staticmethod
+    def chat_key(message: dict):
+        """
+        Returns the key used to keep a chat's messages in order.
+
+        Args:
+            message (dict): The Telegram message.
+
+        Returns:
+            Any: The chat id, falling back to the sender id.
+        """
+        return message.get('chat', {}).get('id', message.get('from', {}).get('id'))
+
+    def start(self):
+        """
+        Starts the worker threads.
+        """
+        if self._threads:
+            return
+        for index, work_queue in enumerate(self.queues):
+            thread = threading.Thread(target=self._work, args=(work_queue,), name=f'dispatch-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stops the worker threads after they finish the updates already queued.
+
+        Args:
+            timeout (float): The maximum time to wait for each worker in seconds.
+        """
+        for work_queue in self.queues:
+            work_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self, work_queue: queue.Queue):
+        """
+        Worker loop. Handles messages until it receives the stop sentinel.
+
+        Args:
+            work_queue (queue.Queue): The queue this worker consumes.
+        """
+        while True:
+            message = work_queue.get()
+            try:
+                if message is None:
+                    return
+                self.handler(message)
+            except Exception as e:
+                self.logger.error(f"An error occurred while handling a Telegram message: {e}")
+            finally:
+                work_queue.task_done()
+
+    def _mark_seen(self, update_id) -> bool:
+        """
+        Records an update_id.
+
+        Returns:
+            bool: True if the update_id is new, False if it was already seen.
+        """
+        with self._seen_lock:
+            if update_id in self._seen:
+                return False
+            self._seen[update_id] = None
+            if len(self._seen) > self.seen_window:
+                self._seen.popitem(last=False)
+            return True
+
+    def _forget(self, update_id):
+        with self._seen_lock:
+            self._seen.pop(update_id, None)
+
+    def submit(self, update: dict) -> bool:
+        """
+        Queues an update for handling without blocking.
+
+        Args:
+            update (dict): The Telegram update.
+
+        Returns:
+            bool: True if the update was queued, dropped as a duplicate or had nothing to handle.
+                  False if the worker queue is full and the update should be delivered again later.
+        """
+        update_id = update.get('update_id')
+        if update_id is not None and not self._mark_seen(update_id):
+            self.logger.debug(f"Dropped duplicate update {update_id}.")
+            return True
+
+        message = update.get('message')
+        if not message:
+            return True
+
+        work_queue = self.queues[hash(self.chat_key(message)) % self.workers]
+        try:
+            work_queue.put_nowait(message)
+        except queue.Full:
+            # Forget the id so a redelivery of this update is accepted.
+            if update_id is not None:
+                self._forget(update_id)
+            self.logger.warning(f"Dispatch queue is full. Rejected update {update_id}.")
+            return False
+        return True
+
+    def pending(self) -> int:
+        """
+        Returns the number of updates waiting to be handled.
+        """
+        return sum(work_queue.qsize() for work_queue in self.queues)
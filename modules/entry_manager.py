@@ -0,0 +1,325 @@
+from modules.log_manager import LogManager
+import dataclasses
+import typing as t
+
+# The caption fields a QueueEntry keeps tags for. See TagRuleModel.field.
+FIELDS = ('creator', 'title', 'character')
+
+@dataclasses.dataclass(slots=True, eq=False)
+class QueueEntry:
+    """
+    A compact queue entry.
+
+    Entries keep the raw facts about a file (hash, extension, size) and the tags
+    that feed each caption field, rather than expanded HTML. Tags are interned through
+    the EntryManager that created the entry, so a creator that appears on thousands
+    of entries is stored once. Field markup is rendered on demand by the TagManager.
+
+    Entries can be read like the dicts the queue used to hold (entry['path'],
+    'sauce' in entry, entry.get('title')), so callers do not need to know the difference.
+
+    Attributes:
+        hash (str): The file's SHA256 hash.
+        ext (str): The file's extension, including the dot.
+        size (int): The file's size in bytes, if known.
+        added (float): When the file was queued, as a UNIX timestamp.
+        creator_tags (tuple): The interned tags for the 'creator' field.
+        title_tags (tuple): The interned tags for the 'title' field.
+        character_tags (tuple): The interned tags for the 'character' field.
+        sauce (str, optional): The comma-separated source URLs.
+        legacy (dict, optional): Pre-rendered caption fields, for entries loaded from old queues.
+        rendered (dict, optional): The wire-form render cached by TelegramManager. Kept in
+            memory only, and rebuilt when missing or stale.
+        digest (str, optional): A digest of the file's Hydrus tags and URLs, to detect changes.
+        refreshed (float): When the file's metadata was last checked, as a UNIX timestamp.
+        renderer (TagManager): Renders the caption fields.
+    """
+
+    hash: str
+    ext: str
+    size: int = 0
+    added: float = 0.0
+    creator_tags: tuple = ()
+    title_tags: tuple = ()
+    character_tags: tuple = ()
+    sauce: t.Optional[str] = None
+    legacy: t.Optional[dict] = None
+    rendered: t.Optional[dict] = None
+    digest: t.Optional[str] = None
+    refreshed: float = 0.0
+    renderer: t.Any = dataclasses.field(default=None, repr=False)
+
+    @property
+    def path(self) -> str:
+        return self.hash + self.ext
+
+    @property
+    def tags(self) -> dict:
+        """
+        Returns the tags for each caption field that has any.
+        """
+        return {field: getattr(self, field + '_tags') for field in FIELDS if getattr(self, field + '_tags')}
+
+    def field(self, name: str) -> t.Optional[str]:
+        """
+        Renders one caption field.
+
+        Args:
+            name (str): The field, e.g. 'creator'.
+
+        Returns:
+            str: The rendered markup, or None if the entry has nothing for the field.
+        """
+        if self.legacy and name in self.legacy:
+            return self.legacy[name]
+        tags = getattr(self, name + '_tags', None) if name in FIELDS else None
+        if not tags or self.renderer is None:
+            return None
+        return self.renderer.render_field(tags) or None
+
+    def _lookup(self, key: str):
+        if key == 'path':
+            return self.path
+        if key == 'sauce':
+            return self.sauce
+        if key == 'rendered':
+            return self.rendered
+        return self.field(key)
+
+    def __getitem__(self, key: str):
+        value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key) is not None
+
+    def __setitem__(self, key: str, value):
+        if key != 'rendered':
+            raise KeyError(f"Queue entries only accept 'rendered', not '{key}'.")
+        self.rendered = value
+
+    def get(self, key: str, default=None):
+        value = self._lookup(key)
+        return default if value is None else value
+
+
+class EntryManager:
+    """
+    Creates queue entries and converts the queue to and from its on-disk form.
+
+    The queue file stores each recurring string once, in a 'strings' table, and
+    entries refer to those strings by their index in it:
+
+        {"version": 2, "strings": [...], "queue": [{"h": hash, "e": ext, "s": size, "a": added,
+         "t": {field: [ids]}, "u": sauce, "l": {field: id}, "g": digest, "f": refreshed}]}
+
+    Only strings that recur (tags, extensions) go through the table. Hashes and source
+    URLs are unique to an entry and are written inline. Renders are not written: they
+    would hold the expanded markup the table avoids, and are rebuilt from the tags
+    when a file is prepared for posting.
+
+    Queue files from before version 2 (a list of dicts with rendered fields) are read
+    and converted on load.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        tags (TagManager): Renders the caption fields of the entries.
+        strings (dict): The intern table. Maps each string to its shared instance.
+    """
+
+    version = 2
+
+    def __init__(self, tags):
+        """
+        Initializes the EntryManager.
+
+        Args:
+            tags (TagManager): Renders the caption fields of the entries.
+        """
+        self.logger = LogManager.setup_logger('ENT')
+        self.tags = tags
+        self.strings = {}
+        self.logger.debug('Entry Module initialized.')
+
+    def intern(self, text: str) -> str:
+        """
+        Returns the shared instance of a string.
+
+        Args:
+            text (str): The string.
+
+        Returns:
+            str: An equal string, shared with every other entry that uses it.
+        """
+        return self.strings.setdefault(text, text)
+
+    def select(self, tags: t.Iterable[str]) -> dict:
+        """
+        Picks the interned tags for each caption field.
+
+        Returns:
+            dict: The tags for every field, keyed by the QueueEntry attribute, e.g. 'creator_tags'.
+        """
+        intern = self.intern
+        selected = {field + '_tags': () for field in FIELDS}
+        selected.update({
+            field + '_tags': tuple(intern(tag) for tag in field_tags)
+            for field, field_tags in self.tags.select_tags(tags).items() if field in FIELDS
+        })
+        return selected
+
+    def create(self, file_hash: str, ext: str, tags: t.Iterable[str] = (), sauce: t.Optional[str] = None,
+               size: int = 0, added: float = 0.0, digest: t.Optional[str] = None) -> QueueEntry:
+        """
+        Creates a queue entry from a file's Hydrus facts.
+
+        Args:
+            file_hash (str): The file's SHA256 hash.
+            ext (str): The file's extension, including the dot.
+            tags (Iterable[str]): The file's tags. Only tags with a caption rule are kept.
+            sauce (str, optional): The file's comma-separated source URLs.
+            size (int): The file's size in bytes.
+            added (float): When the file was queued, as a UNIX timestamp.
+            digest (str, optional): The digest of the file's tags and URLs. See QueueManager.metadata_digest().
+
+        Returns:
+            QueueEntry: The entry.
+        """
+        return QueueEntry(
+            hash=file_hash,
+            ext=self.intern(ext),
+            size=size or 0,
+            added=added,
+            sauce=sauce or None,
+            digest=digest,
+            refreshed=added,
+            renderer=self.tags,
+            **self.select(tags),
+        )
+
+    def update(self, entry: QueueEntry, tags: t.Iterable[str], sauce: t.Optional[str], digest: t.Optional[str]) -> bool:
+        """
+        Replaces an entry's caption tags and sources with fresh ones from Hydrus.
+
+        Args:
+            entry (QueueEntry): The entry to update in place.
+            tags (Iterable[str]): The file's current tags.
+            sauce (str, optional): The file's current comma-separated source URLs.
+            digest (str, optional): The digest of the current tags and URLs.
+
+        Returns:
+            bool: True if the caption changed, so the entry must be rendered again.
+        """
+        selected = self.select(tags)
+        changed = (entry.legacy is not None or (sauce or None) != entry.sauce
+                   or any(getattr(entry, name) != value for name, value in selected.items()))
+        entry.digest = digest
+        if changed:
+            for name, value in selected.items():
+                setattr(entry, name, value)
+            entry.sauce = sauce or None
+            entry.legacy = None
+        return changed
+
+    def _from_legacy(self, item: dict) -> QueueEntry:
+        """
+        Converts a queue entry from before version 2.
+        """
+        intern = self.intern
+        file_hash, ext = item['path'], ''
+        if '.' in file_hash:
+            stem, dot, suffix = file_hash.rpartition('.')
+            file_hash, ext = stem, dot + suffix
+        legacy = {field: intern(item[field]) for field in FIELDS if item.get(field)}
+        return QueueEntry(
+            hash=file_hash,
+            ext=intern(ext),
+            legacy=legacy or None,
+            sauce=item.get('sauce') or None,
+            renderer=self.tags,
+        )
+
+    def decode(self, data: dict) -> dict:
+        """
+        Builds the in-memory queue from the queue file's contents.
+
+        Args:
+            data (dict): The parsed queue file.
+
+        Returns:
+            dict: The queue data, as {"queue": [QueueEntry, ...]}.
+        """
+        self.strings = {}
+        if not data or 'queue' not in data:
+            return {"queue": []}
+
+        if data.get('version') != self.version:
+            entries = [self._from_legacy(item) for item in data['queue'] if item.get('path')]
+            self.logger.info(f"Converted {len(entries)} queue entries to the compact format.")
+            return {"queue": entries}
+
+        strings = [self.intern(text) for text in data.get('strings', [])]
+        entries = []
+        for item in data['queue']:
+            entries.append(QueueEntry(
+                hash=item['h'],
+                ext=strings[item['e']],
+                size=item.get('s', 0),
+                added=item.get('a', 0.0),
+                sauce=item.get('u'),
+                legacy={field: strings[index] for field, index in item['l'].items()} if item.get('l') else None,
+                digest=item.get('g'),
+                refreshed=item.get('f', item.get('a', 0.0)),
+                renderer=self.tags,
+                **{
+                    field + '_tags': tuple(strings[index] for index in ids)
+                    for field, ids in item.get('t', {}).items() if field in FIELDS
+                },
+            ))
+        return {"queue": entries}
+
+    def encode(self, queue_data: dict) -> dict:
+        """
+        Builds the queue file's contents from the in-memory queue.
+
+        The string table is rebuilt on every save, so strings no longer used by any
+        entry are dropped.
+
+        Args:
+            queue_data (dict): The queue data, as {"queue": [QueueEntry, ...]}.
+
+        Returns:
+            dict: The serializable queue file contents.
+        """
+        strings = []
+        ids = {}
+
+        def index(text: str) -> int:
+            position = ids.get(text)
+            if position is None:
+                position = ids[text] = len(strings)
+                strings.append(text)
+            return position
+
+        queue = []
+        for entry in queue_data.get('queue', []):
+            item = {'h': entry.hash, 'e': index(entry.ext)}
+            if entry.size:
+                item['s'] = entry.size
+            if entry.added:
+                item['a'] = entry.added
+            tags = entry.tags
+            if tags:
+                item['t'] = {field: [index(tag) for tag in field_tags] for field, field_tags in tags.items()}
+            if entry.sauce:
+                item['u'] = entry.sauce
+            if entry.legacy:
+                item['l'] = {field: index(value) for field, value in entry.legacy.items()}
+            if entry.digest:
+                item['g'] = entry.digest
+            if entry.refreshed and entry.refreshed != entry.added:
+                item['f'] = entry.refreshed
+            queue.append(item)
+        return {"version": self.version, "strings": strings, "queue": queue}
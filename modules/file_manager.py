@@ -1,5 +1,6 @@
 from modules.log_manager import LogManager
 import json
+import os
 
 class FileManager:
     """
@@ -53,13 +54,18 @@ class FileManager:
             >>> file_manager.operation('data.json', 'w', {'key': 'value'})
         """
         try:
+            if 'w' in mode and payload is not None:
+                # Write a temporary file and rename it over the old one, so a write
+                # interrupted e.g. by shutdown never leaves a truncated file.
+                self.logger.debug(f"Writing json data to {filename}.")
+                with open(filename + '.tmp', 'w', encoding='utf-8') as file:
+                    json.dump(payload, file)
+                os.replace(filename + '.tmp', filename)
+                return None
             with open(filename, mode, encoding='utf-8') as file:
                 if 'r' in mode:
                     self.logger.debug(f"Reading json data from {filename}.")
                     return json.load(file)
-                elif 'w' in mode and payload is not None:
-                    self.logger.debug(f"Writing json data to {filename}.")
-                    json.dump(payload, file)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             if 'r' in mode:
                 self.logger.warning(f"{filename} missing or corrupted. {e}")
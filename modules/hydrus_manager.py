@@ -1,5 +1,8 @@
 import requests
 from modules.log_manager import LogManager
+from modules.breaker_manager import BreakerManager, BreakerOpenError
+from modules.session_manager import SessionManager
+from modules.blob_manager import FetchError, FileTooLargeError, QuotaExceededError
 import hydrus_api
 import hydrus_api.utils
 import typing as t
@@ -12,12 +15,14 @@ class HydrusManager:
     through its API. It handles file operations, tag management, and metadata retrieval.
 
     Attributes:
-        hydrus_client (hydrus_api.Client): The Hydrus API client instance.
+        hydrus_client (GuardedClient): The Hydrus API client, called through the circuit breaker.
+        breaker (CircuitBreaker): Skips Hydrus calls while Hydrus is down.
+        session (SessionManager): Caches the permission check and the discovered service keys.
         config (ConfigModel): The bot's configuration settings.
-        queue (QueueManager): The queue manager instance.
+        queue (QueueManager): The default channel's queue manager instance.
         logger (Logger): The logger instance for this class.
         queue_file (str): The path to the queue file.
-        hydrus_service_key (dict): Mapping of service names to their keys.
+        hydrus_service_key (dict): The default service keys, used when discovery finds no service by that name.
         permissions (tuple): Required permissions for the Hydrus client.
 
     Example:
@@ -51,7 +56,16 @@ class HydrusManager:
         """
         self.logger = LogManager.setup_logger('HYD')
         self.config = config.config_data
-        self.hydrus_client = hydrus_api.Client(self.config.hydrus_api_key)
+        client = hydrus_api.Client(self.config.hydrus_api_key)
+        # While Hydrus is down, calls fail at once. Recovery is probed with the cheap api_version call.
+        self.breaker = BreakerManager.from_config(
+            self.config, 'hydrus', probe=client.get_api_version,
+            failure_types=(hydrus_api.ConnectionError, hydrus_api.ServerError, hydrus_api.DatabaseLocked,
+                           requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+        )
+        self.hydrus_client = self.breaker.guard(client)
+        self.session = SessionManager(self.hydrus_client, self.permissions, self.config.hydrus_session_ttl,
+                                      self.hydrus_service_key)
         self.queue = queue
         self.queue_file = self.queue.queue_file
         self.logger.debug('Hydrus Module initialized.')
@@ -84,17 +98,45 @@ class HydrusManager:
                 return
 
         # Validate service key
-        if service not in self.hydrus_service_key:
+        service_key = self.get_service_key(service)
+        if not service_key:
             self.logger.error(f"Invalid service key '{service}'")
             return
 
         # Add the tag to the file
         self.hydrus_client.add_tags(file_ids=file_id, service_keys_to_actions_to_tags={
-            self.hydrus_service_key[service]: {
+            service_key: {
                 int(action): [tag]
             }
         })
 
+    def retag_queued(self, file_id: int, queue_tag: str):
+        """
+        Replaces a queued file's queue tag with the posted tag, so it is not queued again.
+
+        Args:
+            file_id (int): The file ID.
+            queue_tag (str): The tag that queued the file.
+        """
+        self.modify_tag(file_id, queue_tag, hydrus_api.TagAction.DELETE, "downloader_tags")
+        self.modify_tag(file_id, queue_tag, hydrus_api.TagAction.DELETE, "my_tags")
+        self.modify_tag(file_id, self.config.posted_tag, hydrus_api.TagAction.ADD, "my_tags")
+
+    def get_service_key(self, service: str) -> t.Optional[str]:
+        """
+        Returns the key of a tag service.
+
+        Args:
+            service (str): The service's name, e.g. 'my_tags' or 'downloader_tags'.
+
+        Returns:
+            str: The key Hydrus reported for the service, the default key, or None.
+
+        Note:
+            The services are discovered through the Client API once and cached.
+        """
+        return self.session.service_key(service)
+
     def check_hydrus_permissions(self) -> bool:
         """
         Verifies that Hydrus is running and the client has required permissions.
@@ -108,14 +150,22 @@ class HydrusManager:
 
         Note:
             The required permissions are defined in the class's permissions tuple.
+            A successful check is cached for 'hydrus_session_ttl' seconds, so
+            most calls do not ask Hydrus.
         """
         try:
-            if not hydrus_api.utils.verify_permissions(self.hydrus_client, self.permissions):
+            if not self.session.check():
                 self.logger.error("The client does not have the required permissions.")
                 return False
-        except requests.exceptions.ConnectionError:
+        except hydrus_api.InsufficientAccess:
+            self.logger.error("Hydrus refused the access key.")
+            return False
+        except (requests.exceptions.ConnectionError, hydrus_api.ConnectionError):
             self.logger.warning("The Hydrus client is not running.")
             return False
+        except BreakerOpenError:
+            self.logger.debug("Skipping Hydrus: the circuit is open.")
+            return False
         else:
             return True
 
@@ -139,6 +189,27 @@ class HydrusManager:
             self.logger.error(f"An error occurred while getting metadata: {e}")
             return None
 
+    def get_metadata_batch(self, hashes: t.List[str]) -> t.List[dict]:
+        """
+        Retrieves the metadata of several files from Hydrus Network in one request.
+
+        Args:
+            hashes (list[str]): The SHA256 hashes of the files.
+
+        Returns:
+            list[dict]: The files' metadata, or an empty list if an error occurs.
+        """
+        if not hashes:
+            return []
+        try:
+            return self.hydrus_client.get_file_metadata(hashes=hashes).get('metadata', [])
+        except hydrus_api.InsufficientAccess as e:
+            self.session.invalidate()
+            self.logger.error(f"Hydrus refused the access key: {e}")
+        except Exception as e:
+            self.logger.error(f"An error occurred while getting metadata: {e}")
+        return []
+
     def get_file_content(self, id: int) -> bytes:
         """
         Retrieves the content of a file from Hydrus Network.
@@ -155,7 +226,38 @@ class HydrusManager:
         """
         return self.hydrus_client.get_file(file_id=id).content
 
-    def get_new_hydrus_files(self):
+    def get_file_content_by_hash(self, file_hash: str) -> bytes:
+        """
+        Retrieves the content of a file from Hydrus Network by its SHA256 hash.
+
+        Args:
+            file_hash (str): The SHA256 hash of the file.
+
+        Returns:
+            bytes: The raw file content.
+        """
+        return self.hydrus_client.get_file(hash_=file_hash).content
+
+    def get_thumbnail(self, id: int) -> t.Optional[bytes]:
+        """
+        Retrieves the thumbnail of a file from Hydrus Network.
+
+        Args:
+            id (int): The file ID to get the thumbnail for.
+
+        Returns:
+            bytes: The encoded thumbnail, or None if an error occurs.
+
+        Note:
+            Thumbnails are a few KB, so they are a cheap input for perceptual hashing.
+        """
+        try:
+            return self.hydrus_client.get_thumbnail(file_id=id).content
+        except Exception as e:
+            self.logger.error(f"An error occurred while getting the thumbnail: {e}")
+            return None
+
+    def get_new_hydrus_files(self, queue=None, queue_tag: t.Optional[str] = None):
         """
         Checks Hydrus for new files and adds them to the queue.
 
@@ -165,27 +267,61 @@ class HydrusManager:
         3. Saves them to the queue
         4. Updates their tags
 
+        Args:
+            queue (QueueManager, optional): The channel queue to add files to. Defaults to the bot's queue.
+            queue_tag (str, optional): The tag that queues files for that channel. Defaults to 'queue_tag'.
+
         Note:
+            With the permission check cached, a check that finds no new files costs
+            a single search request.
+            Ingest pauses while the queue is over quota, leaving the remaining
+            files tagged in Hydrus.
             Files are processed in chunks to avoid overwhelming the API.
             Each file's queue tag is removed and replaced with a posted tag
-            after being added to the queue.
+            after being added to the queue. A file that could not be fetched,
+            or is too large to ever fit in the quota, keeps its queue tag.
         """
+        queue = queue or self.queue
+        queue_tag = queue_tag or self.config.queue_tag
         # Check Hydrus for new images to enqueue.
-        self.logger.debug("Checking Hydrus for new files.")
+        self.logger.debug(f"Checking Hydrus for new files tagged {queue_tag}.")
+        if not self.breaker.allow():
+            self.logger.info("Skipping Hydrus check: Hydrus has been failing. Waiting for it to recover.")
+            return
         if not self.check_hydrus_permissions():
             return
         num_images = 0
-        response = self.hydrus_client.search_files([self.config.queue_tag])
-        all_tagged_file_ids = response.get("file_ids", [])
-        if not all_tagged_file_ids:
-            self.logger.info("No new images found.")
-            return
-        for file_ids in hydrus_api.utils.yield_chunks(all_tagged_file_ids, 100):
-            for file_id in file_ids:
-                num_images += self.queue.save_image_to_queue(file_id)
-                self.modify_tag(file_id, self.config.queue_tag, hydrus_api.TagAction.DELETE, "downloader_tags")
-                self.modify_tag(file_id, self.config.queue_tag, hydrus_api.TagAction.DELETE, "my_tags")
-                self.modify_tag(file_id, self.config.posted_tag, hydrus_api.TagAction.ADD, "my_tags")
+        try:
+            response = self.hydrus_client.search_files([queue_tag])
+            all_tagged_file_ids = response.get("file_ids", [])
+            if not all_tagged_file_ids:
+                self.logger.info("No new images found.")
+                return
+            queue.ingest_paused = False
+            for file_ids in hydrus_api.utils.yield_chunks(all_tagged_file_ids, 100):
+                for file_id in file_ids:
+                    # Over quota, the remaining files keep their queue tag and are queued later.
+                    reason = queue.quota_exceeded()
+                    if reason:
+                        raise QuotaExceededError(reason)
+                    try:
+                        num_images += queue.save_image_to_queue(file_id)
+                    except FetchError as e:
+                        # The file keeps its queue tag and is tried again on the next check.
+                        self.logger.warning(f"{e} Trying again later.")
+                        continue
+                    except FileTooLargeError:
+                        # Reported when first seen. It keeps its queue tag, and ingest goes on.
+                        continue
+                    self.retag_queued(file_id, queue_tag)
+        except QuotaExceededError as e:
+            queue.ingest_paused = True
+            self.logger.warning(f"Pausing ingest: {e}. It resumes as posts drain the queue.")
+        except hydrus_api.InsufficientAccess as e:
+            # The cached permissions are stale. Check them again next time.
+            self.session.invalidate()
+            self.logger.error(f"Hydrus refused the access key: {e}")
+        queue.phash.save()
         if num_images > 0:
             self.logger.info(f"Added {num_images} image(s) to the queue.")
         else:
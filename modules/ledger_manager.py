@@ -0,0 +1,234 @@
+from modules.log_manager import LogManager
+import os
+import sqlite3
+import threading
+import time
+import typing as t
+
+class LedgerManager:
+    """
+    Keeps an append-only local record of everything the bot has posted.
+
+    Each post is one row in a SQLite database holding the content hash, when it was
+    posted, the chat and message id, and the bytes uploaded (0 when Telegram reused a
+    cached file_id). The hash and time columns are indexed, so lookups by hash and
+    aggregates over a time window are B-tree searches rather than scans.
+
+    Files added to a queue are recorded in a second table, which gives the ingest
+    rate used by the adaptive posting cadence.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        ledger_file (str): The path to the database file.
+        connection (sqlite3.Connection): The database connection.
+
+    Example:
+        >>> ledger = LedgerManager('posted.db')
+        >>> ledger.record('abc123', -100123, 42, 183422)
+        >>> ledger.was_posted('abc123')
+        True
+        >>> ledger.stats(since=time.time() - 86400)
+        {'posts': 1, 'bytes': 183422, 'first': 1700000000.0, 'last': 1700000000.0}
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS posted (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL,
+            posted_at REAL NOT NULL,
+            chat_id TEXT NOT NULL,
+            message_id INTEGER,
+            bytes INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS posted_hash ON posted (hash);
+        CREATE INDEX IF NOT EXISTS posted_time ON posted (posted_at);
+        CREATE TABLE IF NOT EXISTS queued (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL,
+            queued_at REAL NOT NULL,
+            chat_id TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS queued_time ON queued (queued_at);
+    """
+
+    def __init__(self, ledger_file: str):
+        """
+        Initializes the LedgerManager and opens (or creates) the database.
+
+        Args:
+            ledger_file (str): The name of the database file to use, or ':memory:'.
+
+        Note:
+            The database file will be stored in the 'queue/' directory.
+        """
+        self.logger = LogManager.setup_logger('LED')
+        if ledger_file == ':memory:':
+            self.ledger_file = ledger_file
+        else:
+            self.ledger_file = 'queue/' + ledger_file
+            os.makedirs(os.path.dirname(self.ledger_file), exist_ok=True)
+        # The scheduler and the dispatch workers share one connection, serialized by the lock.
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.ledger_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self._lock, self.connection:
+            if self.ledger_file != ':memory:':
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(self.schema)
+        self.logger.debug('Ledger Module initialized.')
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self.connection.close()
+
+    def record(self, file_hash: str, chat_id, message_id: t.Optional[int], bytes_sent: int = 0,
+               posted_at: t.Optional[float] = None):
+        """
+        Appends a post to the ledger.
+
+        Args:
+            file_hash (str): The content hash of the posted file.
+            chat_id (int | str): The chat the file was posted to.
+            message_id (int, optional): The id of the Telegram message.
+            bytes_sent (int): The bytes uploaded. 0 if the file was sent by file_id.
+            posted_at (float, optional): When the file was posted, as a UNIX timestamp. Defaults to now.
+        """
+        try:
+            with self._lock, self.connection:
+                self.connection.execute(
+                    "INSERT INTO posted (hash, posted_at, chat_id, message_id, bytes) VALUES (?, ?, ?, ?, ?)",
+                    (file_hash, time.time() if posted_at is None else posted_at, str(chat_id), message_id, bytes_sent)
+                )
+        except sqlite3.Error as e:
+            self.logger.error(f"Could not record {file_hash} in the posted ledger: {e}")
+
+    def record_queued(self, file_hash: str, chat_id, queued_at: t.Optional[float] = None):
+        """
+        Records that a file was added to a chat's queue.
+
+        Args:
+            file_hash (str): The content hash of the queued file.
+            chat_id (int | str): The chat the file was queued for.
+            queued_at (float, optional): When the file was queued, as a UNIX timestamp. Defaults to now.
+        """
+        try:
+            with self._lock, self.connection:
+                self.connection.execute(
+                    "INSERT INTO queued (hash, queued_at, chat_id) VALUES (?, ?, ?)",
+                    (file_hash, time.time() if queued_at is None else queued_at, str(chat_id))
+                )
+        except sqlite3.Error as e:
+            self.logger.error(f"Could not record {file_hash} as queued in the ledger: {e}")
+
+    def queued_count(self, since: t.Optional[float] = None, until: t.Optional[float] = None, chat_id=None) -> int:
+        """
+        Counts the files queued in a time window.
+
+        Args:
+            since (float, optional): The start of the window, as a UNIX timestamp. Unbounded if None.
+            until (float, optional): The end of the window (exclusive). Unbounded if None.
+            chat_id (int | str, optional): Only count files queued for this chat.
+
+        Returns:
+            int: The number of files queued.
+        """
+        where, params = self._window(since, until, chat_id, 'queued_at')
+        with self._lock:
+            row = self.connection.execute(f"SELECT COUNT(*) FROM queued WHERE {where}", params).fetchone()
+        return row[0]
+
+    def was_posted(self, file_hash: str, chat_id: t.Optional[t.Union[int, str]] = None) -> bool:
+        """
+        Checks whether a content hash has been posted before.
+
+        Args:
+            file_hash (str): The content hash of the file.
+            chat_id (int | str, optional): Only count posts to this chat.
+
+        Returns:
+            bool: True if the ledger holds a post of the file.
+        """
+        with self._lock:
+            if chat_id is None:
+                row = self.connection.execute("SELECT 1 FROM posted WHERE hash = ? LIMIT 1", (file_hash,)).fetchone()
+            else:
+                row = self.connection.execute(
+                    "SELECT 1 FROM posted WHERE hash = ? AND chat_id = ? LIMIT 1", (file_hash, str(chat_id))
+                ).fetchone()
+        return row is not None
+
+    def get(self, file_hash: str) -> t.List[dict]:
+        """
+        Returns every post of a content hash, oldest first.
+
+        Args:
+            file_hash (str): The content hash of the file.
+
+        Returns:
+            list[dict]: The posts, with 'hash', 'posted_at', 'chat_id', 'message_id' and 'bytes' keys.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT hash, posted_at, chat_id, message_id, bytes FROM posted WHERE hash = ? ORDER BY posted_at",
+                (file_hash,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _window(since: t.Optional[float], until: t.Optional[float], chat_id, column: str = 'posted_at') -> t.Tuple[str, list]:
+        """
+        Builds the WHERE clause for a time window and optional chat.
+        """
+        clauses = [f"{column} >= ?", f"{column} < ?"]
+        params = [since if since is not None else float('-inf'), until if until is not None else float('inf')]
+        if chat_id is not None:
+            clauses.append("chat_id = ?")
+            params.append(str(chat_id))
+        return " AND ".join(clauses), params
+
+    def stats(self, since: t.Optional[float] = None, until: t.Optional[float] = None, chat_id=None) -> dict:
+        """
+        Aggregates the posts in a time window.
+
+        Args:
+            since (float, optional): The start of the window, as a UNIX timestamp. Unbounded if None.
+            until (float, optional): The end of the window (exclusive). Unbounded if None.
+            chat_id (int | str, optional): Only count posts to this chat.
+
+        Returns:
+            dict: 'posts' and 'bytes' totals, and the 'first' and 'last' post times (None if there were no posts).
+        """
+        where, params = self._window(since, until, chat_id)
+        with self._lock:
+            row = self.connection.execute(
+                f"SELECT COUNT(*) AS posts, COALESCE(SUM(bytes), 0) AS bytes, MIN(posted_at) AS first, "
+                f"MAX(posted_at) AS last FROM posted WHERE {where}",
+                params
+            ).fetchone()
+        return dict(row)
+
+    def histogram(self, bucket: float, since: t.Optional[float] = None, until: t.Optional[float] = None,
+                  chat_id=None) -> t.List[dict]:
+        """
+        Aggregates posts into fixed-width time buckets, e.g. per day.
+
+        Args:
+            bucket (float): The bucket width in seconds.
+            since (float, optional): The start of the window, as a UNIX timestamp. Unbounded if None.
+            until (float, optional): The end of the window (exclusive). Unbounded if None.
+            chat_id (int | str, optional): Only count posts to this chat.
+
+        Returns:
+            list[dict]: One entry per non-empty bucket, oldest first, with 'start', 'posts' and 'bytes' keys.
+        """
+        where, params = self._window(since, until, chat_id)
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT CAST(posted_at / ? AS INTEGER) * ? AS start, COUNT(*) AS posts, SUM(bytes) AS bytes "
+                f"FROM posted WHERE {where} GROUP BY 1 ORDER BY 1",
+                [bucket, bucket] + params
+            ).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,120 @@
+import contextlib
+import threading
+import typing as t
+
+class ReadWriteLock:
+    """
+    A reader-writer lock: any number of threads may read at once, or one may write.
+
+    Writers are preferred. Once a writer waits, new readers wait behind it, so a
+    steady stream of readers cannot starve it. Both locks are reentrant, and the
+    writer may also read. A thread that only reads cannot start writing, since two
+    readers doing so would wait for each other forever.
+
+    Attributes:
+        readers (dict): The read locks held, by thread ident.
+        writer (int): The ident of the thread holding the write lock, or None.
+        writers_waiting (int): The number of threads waiting for the write lock.
+
+    Example:
+        >>> lock = ReadWriteLock()
+        >>> with lock.read():
+        ...     count = len(entries)
+        >>> with lock.write():
+        ...     entries.append(entry)
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = {}
+        self.writer = None
+        self.writer_depth = 0
+        self.writers_waiting = 0
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self.condition:
+            if self.writer != me and me not in self.readers:
+                self.condition.wait_for(lambda: self.writer is None and not self.writers_waiting)
+            self.readers[me] = self.readers.get(me, 0) + 1
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self.condition:
+            count = self.readers.get(me, 0) - 1
+            if count < 0:
+                raise RuntimeError("Cannot release a read lock that is not held.")
+            if count:
+                self.readers[me] = count
+            else:
+                del self.readers[me]
+                self.condition.notify_all()
+
+    def acquire_write(self, timeout: t.Optional[float] = None) -> bool:
+        """
+        Takes the write lock, once the readers and the writer holding the lock are done.
+
+        Args:
+            timeout (float, optional): The most seconds to wait. Waits for as long as it takes if None.
+
+        Returns:
+            bool: True if the lock was taken, False if the timeout ran out.
+
+        Raises:
+            RuntimeError: If the thread holds a read lock but not the write lock.
+        """
+        me = threading.get_ident()
+        with self.condition:
+            if self.writer == me:
+                self.writer_depth += 1
+                return True
+            if me in self.readers:
+                raise RuntimeError("Cannot take the write lock while holding a read lock.")
+            self.writers_waiting += 1
+            try:
+                if not self.condition.wait_for(lambda: self.writer is None and not self.readers, timeout):
+                    return False
+            finally:
+                self.writers_waiting -= 1
+                # Readers waiting behind this writer may go ahead if it gave up.
+                self.condition.notify_all()
+            self.writer = me
+            self.writer_depth = 1
+            return True
+
+    def release_write(self):
+        with self.condition:
+            if self.writer != threading.get_ident():
+                raise RuntimeError("Cannot release a write lock that is not held.")
+            self.writer_depth -= 1
+            if not self.writer_depth:
+                self.writer = None
+                self.condition.notify_all()
+
+    def write_held(self) -> bool:
+        """
+        Returns whether the calling thread holds the write lock.
+        """
+        return self.writer == threading.get_ident()
+
+    def read_held(self) -> bool:
+        """
+        Returns whether the calling thread holds a read lock.
+        """
+        return threading.get_ident() in self.readers
+
+    @contextlib.contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
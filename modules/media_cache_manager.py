@@ -0,0 +1,119 @@
+from modules.log_manager import LogManager
+from modules.file_manager import FileManager
+import time
+import typing as t
+
+class MediaCacheManager:
+    """
+    Keeps a persistent index of Telegram file_ids for media that has already been uploaded.
+
+    Telegram returns a reusable file_id for every photo or video it receives. Recording it
+    against the content hash lets later sends of the same content reference the file by id
+    instead of uploading the blob again.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        files (FileManager): The file manager instance.
+        cache_file (str): The path to the cache file.
+        cache_data (dict): The current cache data, keyed by content hash.
+
+    Example:
+        >>> cache = MediaCacheManager('media_cache.json')
+        >>> cache.remember('abc123', 'photo', message)
+        >>> cache.get('abc123')
+        {'type': 'photo', 'file_id': '...', 'file_unique_id': '...', 'cached_at': 1700000000}
+    """
+
+    media_types = ('photo', 'video')
+
+    def __init__(self, cache_file: str):
+        """
+        Initializes the MediaCacheManager and loads the cache from disk.
+
+        Args:
+            cache_file (str): The name of the cache file to use.
+
+        Note:
+            The cache file will be stored in the 'queue/' directory.
+        """
+        self.logger = LogManager.setup_logger('MED')
+        self.files = FileManager()
+        self.cache_file = 'queue/' + cache_file
+        self.cache_data = self.files.operation(self.cache_file, 'r', {"media": {}}) or {"media": {}}
+        self.cache_data.setdefault("media", {})
+        self.logger.debug('Media Cache Module initialized.')
+
+    @staticmethod
+    def extract_file_ids(message: dict, media_type: str) -> t.Optional[dict]:
+        """
+        Extracts the file_id and file_unique_id from a sent Telegram message.
+
+        Args:
+            message (dict): The message object returned by sendPhoto/sendVideo.
+            media_type (str): The media type that was sent ('photo' or 'video').
+
+        Returns:
+            dict: The file identifiers, or None if the message holds no usable media.
+
+        Note:
+            Telegram returns every generated size for photos. The last entry is the largest.
+        """
+        if not isinstance(message, dict):
+            return None
+        media = message.get(media_type)
+        if media_type == 'photo' and isinstance(media, list):
+            media = media[-1] if media else None
+        if not isinstance(media, dict) or not media.get('file_id'):
+            return None
+        return {'file_id': media['file_id'], 'file_unique_id': media.get('file_unique_id')}
+
+    def get(self, file_hash: str) -> t.Optional[dict]:
+        """
+        Looks up the cached Telegram media for a content hash.
+
+        Args:
+            file_hash (str): The content hash of the file.
+
+        Returns:
+            dict: The cached entry with 'type' and 'file_id' keys, or None if not cached.
+        """
+        return self.cache_data["media"].get(file_hash)
+
+    def remember(self, file_hash: str, media_type: str, message: dict) -> bool:
+        """
+        Records the file_id Telegram assigned to an upload.
+
+        Args:
+            file_hash (str): The content hash of the file.
+            media_type (str): The media type that was sent ('photo' or 'video').
+            message (dict): The message object returned by Telegram.
+
+        Returns:
+            bool: True if an entry was recorded, False otherwise.
+        """
+        if media_type not in self.media_types:
+            return False
+        file_ids = self.extract_file_ids(message, media_type)
+        if not file_ids:
+            self.logger.debug(f"No file_id found in Telegram response for {file_hash}.")
+            return False
+        self.cache_data["media"][file_hash] = {'type': media_type, **file_ids, 'cached_at': int(time.time())}
+        self.save_cache()
+        return True
+
+    def forget(self, file_hash: str):
+        """
+        Removes a cached entry, e.g. after Telegram rejected its file_id.
+
+        Args:
+            file_hash (str): The content hash of the file.
+        """
+        if self.cache_data["media"].pop(file_hash, None) is not None:
+            self.save_cache()
+
+    def save_cache(self):
+        """
+        Saves the cache data to the cache file.
+        """
+        self.files.operation(self.cache_file, 'w+', self.cache_data)
+        self.logger.debug(f"Saved {self.cache_file}")
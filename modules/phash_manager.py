@@ -0,0 +1,207 @@
+from modules.log_manager import LogManager
+from wand.image import Image
+import numpy as np
+import os
+import typing as t
+
+class PhashManager:
+    """
+    Detects near-duplicate images by perceptual hash.
+
+    Each image is reduced to a 64-bit difference hash (dHash): the image is shrunk to
+    9x8 greyscale pixels and every bit records whether a pixel is brighter than its
+    right-hand neighbour. Re-encodes, resizes and small edits of the same artwork give
+    hashes only a few bits apart, so they are compared by Hamming distance.
+
+    The hashes of queued and posted files are kept in a contiguous numpy uint64 array,
+    so a lookup XORs the new hash against every stored hash and counts the differing
+    bits in one vectorized pass. This stays around a millisecond at 100k+ hashes.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        index_file (str): The path to the index file.
+        hashes (np.ndarray): The stored perceptual hashes. Only the first 'count' are in use.
+        keys (np.ndarray): The content hash (SHA256, as a row of 32 bytes) of each stored file.
+        count (int): The number of stored hashes.
+
+    Example:
+        >>> phash = PhashManager('phash_index.npz')
+        >>> value = phash.dhash(thumbnail_bytes)
+        >>> phash.find(value, threshold=6)
+        ('9f86d0...', 2)
+        >>> phash.add('abc123...', value)
+        >>> phash.save()
+    """
+
+    hash_size = 8
+    initial_capacity = 1024
+
+    def __init__(self, index_file: str):
+        """
+        Initializes the PhashManager and loads the index from disk.
+
+        Args:
+            index_file (str): The name of the index file to use.
+
+        Note:
+            The index file will be stored in the 'queue/' directory.
+        """
+        self.logger = LogManager.setup_logger('PHA')
+        self.index_file = 'queue/' + index_file
+        self.hashes = np.zeros(self.initial_capacity, dtype=np.uint64)
+        self.keys = np.zeros((self.initial_capacity, 32), dtype=np.uint8)
+        self.count = 0
+        self.positions = {}
+        self.dirty = False
+        self.load()
+        self.logger.debug('Perceptual Hash Module initialized.')
+
+    @classmethod
+    def dhash_pixels(cls, pixels: t.Sequence[int]) -> int:
+        """
+        Computes a difference hash from greyscale pixels.
+
+        Args:
+            pixels (Sequence[int]): (hash_size + 1) x hash_size greyscale values, row by row.
+
+        Returns:
+            int: The 64-bit hash.
+        """
+        grid = np.asarray(pixels, dtype=np.int16).reshape(cls.hash_size, cls.hash_size + 1)
+        bits = (grid[:, 1:] > grid[:, :-1]).ravel()
+        return int(np.packbits(bits).view('>u8')[0])
+
+    @classmethod
+    def dhash(cls, blob: bytes) -> t.Optional[int]:
+        """
+        Computes the difference hash of an encoded image.
+
+        Args:
+            blob (bytes): The image file's content, e.g. a Hydrus thumbnail.
+
+        Returns:
+            int: The 64-bit hash, or None if the image could not be read.
+        """
+        try:
+            with Image(blob=blob) as img:
+                img.transform_colorspace('gray')
+                img.resize(cls.hash_size + 1, cls.hash_size)
+                pixels = img.export_pixels(channel_map='R', storage='char')
+            return cls.dhash_pixels(pixels)
+        except Exception:
+            return None
+
+    def load(self):
+        """
+        Loads the index from the index file, if it exists.
+        """
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with np.load(self.index_file, allow_pickle=False) as data:
+                hashes, keys = data['hashes'], data['keys']
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.error(f"Could not load {self.index_file}, starting a new index: {e}")
+            return
+        self._reserve(len(hashes))
+        self.count = len(hashes)
+        self.hashes[:self.count] = hashes
+        self.keys[:self.count] = keys
+        self.positions = {key.tobytes().hex(): position for position, key in enumerate(keys)}
+
+    def save(self):
+        """
+        Saves the index to the index file, if it changed.
+        """
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        temporary_file = self.index_file + '.tmp.npz'
+        np.savez(temporary_file, hashes=self.hashes[:self.count], keys=self.keys[:self.count])
+        os.replace(temporary_file, self.index_file)
+        self.dirty = False
+        self.logger.debug(f"Saved {self.index_file}")
+
+    def _reserve(self, size: int):
+        """
+        Grows the arrays, doubling their capacity, until they can hold 'size' hashes.
+        """
+        capacity = len(self.hashes)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self.hashes = np.resize(self.hashes, capacity)
+        self.keys = np.resize(self.keys, (capacity, 32))
+
+    def add(self, file_hash: str, phash: int):
+        """
+        Stores the perceptual hash of a file. Storing a file again replaces its hash.
+
+        Args:
+            file_hash (str): The file's SHA256 hash.
+            phash (int): The file's perceptual hash.
+        """
+        position = self.positions.get(file_hash)
+        if position is None:
+            position = self.count
+            self._reserve(position + 1)
+            self.keys[position] = np.frombuffer(bytes.fromhex(file_hash), dtype=np.uint8)
+            self.positions[file_hash] = position
+            self.count += 1
+        self.hashes[position] = phash
+        self.dirty = True
+
+    def remove(self, file_hash: str):
+        """
+        Removes a file from the index.
+
+        Args:
+            file_hash (str): The file's SHA256 hash.
+        """
+        position = self.positions.pop(file_hash, None)
+        if position is None:
+            return
+        # Move the last hash into the gap so the array stays contiguous.
+        last = self.count - 1
+        if position != last:
+            self.hashes[position] = self.hashes[last]
+            self.keys[position] = self.keys[last]
+            self.positions[self.keys[position].tobytes().hex()] = position
+        self.count = last
+        self.dirty = True
+
+    def distances(self, phash: int) -> np.ndarray:
+        """
+        Returns the Hamming distance from a perceptual hash to every stored hash.
+
+        Args:
+            phash (int): The perceptual hash to compare.
+
+        Returns:
+            np.ndarray: The distances, in index order.
+        """
+        return np.bitwise_count(self.hashes[:self.count] ^ np.uint64(phash))
+
+    def find(self, phash: int, threshold: int, exclude: t.Optional[str] = None) -> t.Optional[t.Tuple[str, int]]:
+        """
+        Finds the closest stored file within a Hamming distance.
+
+        Args:
+            phash (int): The perceptual hash to look up.
+            threshold (int): The largest distance, in bits, that counts as a near-duplicate.
+            exclude (str, optional): A file hash to ignore, e.g. the file being checked.
+
+        Returns:
+            tuple: The closest file's SHA256 hash and its distance, or None if nothing is within the threshold.
+        """
+        if not self.count:
+            return None
+        distances = self.distances(phash)
+        if exclude is not None and exclude in self.positions:
+            distances[self.positions[exclude]] = 255
+        position = int(np.argmin(distances))
+        distance = int(distances[position])
+        if distance > threshold:
+            return None
+        return self.keys[position].tobytes().hex(), distance
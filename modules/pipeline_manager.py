@@ -0,0 +1,358 @@
+from modules.log_manager import LogManager
+from modules.breaker_manager import BreakerOpenError
+import queue
+import threading
+import time
+import typing as t
+
+class RetryPolicy:
+    """
+    Retries an operation with exponential backoff.
+
+    An operation refused by an open circuit breaker is not retried: the breaker
+    already knows the service is down.
+
+    Attributes:
+        attempts (int): The number of attempts, including the first.
+        initial_delay (float): The delay before the first retry, in seconds.
+        max_delay (float): The longest delay between retries, in seconds.
+    """
+
+    def __init__(self, attempts: int = 3, initial_delay: float = 1.0, max_delay: float = 60.0):
+        self.attempts = max(1, attempts)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """
+        Returns the delay after a failed attempt, in seconds.
+
+        Args:
+            attempt (int): The failed attempt, starting at 1.
+        """
+        return min(self.initial_delay * 2 ** (attempt - 1), self.max_delay)
+
+    def run(self, func: t.Callable, logger, name: str, should_stop: t.Callable[[], bool] = lambda: False):
+        """
+        Calls a function until it succeeds or the attempts run out.
+
+        Args:
+            func (callable): The operation. Called without arguments.
+            logger (Logger): Logs the failed attempts.
+            name (str): The operation's name, for the log.
+            should_stop (callable): Returns True to give up instead of retrying, e.g. on shutdown.
+
+        Returns:
+            Any: The function's return value.
+
+        Raises:
+            Exception: The last error, once the attempts run out.
+        """
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return func()
+            except BreakerOpenError as e:
+                logger.info(f"{name} skipped: {e}")
+                raise
+            except Exception as e:
+                if attempt == self.attempts or should_stop():
+                    logger.error(f"{name} failed after {attempt} attempt(s): {e}")
+                    raise
+                delay = self.delay(attempt)
+                logger.warning(f"{name} attempt {attempt} failed: {e}. Retrying in {delay} seconds...")
+                time.sleep(delay)
+
+
+class Stage:
+    """
+    A pipeline stage: one worker thread taking tasks from a bounded queue.
+
+    Submitting a task never blocks. A task whose key is already waiting is dropped,
+    so e.g. two ingest requests for one channel run once, and a full queue rejects
+    new tasks rather than letting work pile up behind a slow stage.
+
+    Attributes:
+        name (str): The stage's name.
+        retry (RetryPolicy): The retry policy for the stage's tasks.
+        tasks (queue.Queue): The waiting (key, function) tasks.
+        waiting (set): The keys of the waiting tasks.
+    """
+
+    def __init__(self, name: str, retry: RetryPolicy, size: int, logger):
+        self.name = name
+        self.retry = retry
+        self.logger = logger
+        self.tasks = queue.Queue(maxsize=max(1, size))
+        self.waiting = set()
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._work, name=f"stage-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.stopped = True
+        try:
+            self.tasks.put_nowait(None)
+        except queue.Full:
+            pass
+        if self.thread:
+            self.thread.join(timeout)
+
+    def submit(self, key: str, func: t.Callable) -> bool:
+        """
+        Hands a task to the stage.
+
+        Args:
+            key (str): Identifies the task. A task with a waiting key is dropped.
+            func (callable): The task. Called without arguments.
+
+        Returns:
+            bool: True if the task was queued.
+        """
+        with self.lock:
+            if self.stopped or key in self.waiting:
+                return False
+            try:
+                self.tasks.put_nowait((key, func))
+            except queue.Full:
+                self.logger.warning(f"The {self.name} stage is full. Dropped {key}.")
+                return False
+            self.waiting.add(key)
+        return True
+
+    def _work(self):
+        while True:
+            task = self.tasks.get()
+            if task is None or self.stopped:
+                return
+            key, func = task
+            with self.lock:
+                self.waiting.discard(key)
+            try:
+                self.retry.run(func, self.logger, key, lambda: self.stopped)
+            except Exception:
+                # Logged by the retry policy. The next scheduled run tries again.
+                pass
+
+
+class PipelineManager:
+    """
+    Runs ingest, preparation and posting as separate stages.
+
+    Ingest (searching Hydrus and downloading new files) runs on its own worker thread,
+    on its own cadence ('ingest_delay'). Preparation (rendering, link checks, video
+    conversion and resizing of the planned files, after refreshing their Hydrus
+    metadata) runs on a second worker, fed after
+    every ingest and post. Posting runs on the scheduler thread at the channel's
+    cadence, so a slow Hydrus never makes a post late. Each stage has its own retry
+    policy: a failed post is retried without running the ingest again. Its retry is
+    a scheduler job of its own, so the backoff never holds up the other channels' jobs.
+
+    Every channel gets an 'ingest:<channel>' and a 'post:<channel>' scheduler job.
+
+    Ingest pauses while a channel's queue is over quota, and is triggered again as
+    soon as a post makes room.
+
+    A backfill of a large collection runs on the ingest stage too. While a channel
+    has an unfinished backfill, its ingest resumes the backfill instead of
+    searching Hydrus for every tagged file at once.
+
+    The integrity check of the stored files runs on a stage of its own, as the
+    'verify' scheduler job every 'verify_interval' minutes.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        config (ConfigModel): The bot's configuration settings.
+        channels (ChannelManager): The channels to run.
+        hydrus (HydrusManager): The Hydrus manager instance.
+        scheduler (ScheduleManager): The scheduler the jobs run on.
+        ingest (Stage): The ingest stage.
+        prepare (Stage): The preparation stage.
+        post_retry (RetryPolicy): The retry policy for posting.
+        backfill (BackfillManager): The backfill journal, or None.
+        verifier (VerifyManager): The integrity check of the stored files, or None.
+        verify (Stage): The integrity check stage.
+
+    Example:
+        >>> pipeline = PipelineManager(config, channels, hydrus, scheduler)
+        >>> pipeline.start()
+        >>> scheduler.run()
+    """
+
+    def __init__(self, config, channels, hydrus, scheduler, backfill=None, verifier=None):
+        """
+        Initializes the PipelineManager.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+            channels (ChannelManager): The channels to run.
+            hydrus (HydrusManager): The Hydrus manager instance.
+            scheduler (ScheduleManager): The scheduler the jobs run on.
+            backfill (BackfillManager, optional): The backfill journal.
+            verifier (VerifyManager, optional): The integrity check of the stored files.
+        """
+        self.logger = LogManager.setup_logger('PIP')
+        self.config = config.config_data
+        self.channels = channels
+        self.hydrus = hydrus
+        self.scheduler = scheduler
+        self.backfill = backfill
+        self.verifier = verifier
+        self.stopped = False
+        size = len(channels)
+        self.ingest = Stage('ingest', RetryPolicy(self.config.ingest_retries), size, self.logger)
+        self.prepare = Stage('prepare', RetryPolicy(1), size, self.logger)
+        self.verify = Stage('verify', RetryPolicy(1), 1, self.logger)
+        self.post_retry = RetryPolicy(self.config.post_retries)
+        self.logger.debug('Pipeline Module initialized.')
+
+    def start(self):
+        """
+        Starts the stage workers, and runs a first ingest and post for every channel.
+        Each job then reschedules itself at its own cadence.
+        """
+        self.ingest.start()
+        self.prepare.start()
+        self.verify.start()
+        for channel in self.channels:
+            self.on_ingest(channel)
+            self.on_post(channel)
+        if self.verifier and self.config.verify_interval:
+            self.scheduler.schedule_update(self.on_verify, self.config.verify_interval, (), 'verify')
+
+    def stop(self):
+        """
+        Stops the stage workers. Running tasks are given a few seconds to finish.
+        """
+        self.stopped = True
+        self.ingest.stop()
+        self.prepare.stop()
+        self.verify.stop()
+
+    def ingest_delay(self, channel) -> int:
+        return channel.config.config_data.ingest_delay or channel.delay
+
+    def on_ingest(self, channel):
+        """
+        Scheduler job: hands a channel's ingest to the ingest stage and reschedules it.
+        """
+        if self.stopped:
+            return
+        self.ingest.submit(f"ingest:{channel.name}", lambda: self.run_ingest(channel))
+        self.scheduler.schedule_update(self.on_ingest, self.ingest_delay(channel), (channel,), f"ingest:{channel.name}")
+
+    def run_ingest(self, channel):
+        """
+        Ingest stage: adds a channel's newly tagged Hydrus files to its queue, then
+        has the planned files prepared.
+        """
+        channel.queue.load_queue()
+        if self.backfill and self.backfill.has_pending(channel.name):
+            self.backfill.run(channel, lambda: self.stopped)
+        else:
+            self.hydrus.get_new_hydrus_files(channel.queue, channel.queue_tag)
+        self.prepare.submit(f"prepare:{channel.name}", channel.queue.prepare_upcoming)
+
+    def start_backfill(self, name: str = '') -> bool:
+        """
+        Hands a channel's backfill to the ingest stage.
+
+        Args:
+            name (str): The channel's name. Defaults to the first channel.
+
+        Returns:
+            bool: True if the backfill was queued.
+        """
+        channel = self.channels.get(name) if name else self.channels.default
+        if channel is None or self.backfill is None:
+            return False
+
+        def run_backfill():
+            channel.queue.load_queue()
+            self.backfill.run(channel, lambda: self.stopped)
+            self.prepare.submit(f"prepare:{channel.name}", channel.queue.prepare_upcoming)
+        return self.ingest.submit(f"backfill:{channel.name}", run_backfill)
+
+    def on_post(self, channel, attempt: int = 1):
+        """
+        Scheduler job: posts a channel's next files, then has the following files
+        prepared and reschedules the post.
+
+        Args:
+            channel (Channel): The channel to post to.
+            attempt (int): The attempt at this post, starting at 1.
+
+        Note:
+            A failed attempt is retried after the post retry policy's backoff, as a
+            job replacing the channel's next post, rather than by sleeping here.
+        """
+        if self.stopped:
+            return
+        name = f"post:{channel.name}"
+        retry_delay = None
+        try:
+            channel.queue.process_queue()
+        except BreakerOpenError as e:
+            # The breaker already knows Telegram is down. Wait for the next post.
+            self.logger.info(f"{name} skipped: {e}")
+        except Exception as e:
+            if attempt < self.post_retry.attempts:
+                retry_delay = self.post_retry.delay(attempt)
+                self.logger.warning(f"{name} attempt {attempt} failed: {e}. Retrying in {retry_delay} seconds...")
+            else:
+                self.logger.error(f"An error occurred while posting to {channel.name} after {attempt} attempt(s): {e}")
+        finally:
+            if not self.stopped:
+                self.prepare.submit(f"prepare:{channel.name}", channel.queue.prepare_upcoming)
+                if channel.queue.ingest_paused and not channel.queue.quota_exceeded():
+                    # The post made room. Resume the paused ingest now.
+                    self.scheduler.trigger(f"ingest:{channel.name}")
+                if retry_delay is not None:
+                    self.scheduler.schedule_at(time.time() + retry_delay, self.on_post, (channel, attempt + 1), name)
+                else:
+                    # Always schedule the next run, even after failures.
+                    self.scheduler.schedule_update(self.on_post, channel.get_delay(), (channel,), name)
+
+    def post_now(self, name: str = '') -> bool:
+        """
+        Runs a channel's next post now rather than at its scheduled time.
+
+        Args:
+            name (str): The channel's name. Defaults to the first channel.
+
+        Returns:
+            bool: True if the channel's post job was found.
+        """
+        channel = self.channels.get(name) if name else self.channels.default
+        return channel is not None and self.scheduler.trigger(f"post:{channel.name}")
+
+    def on_verify(self):
+        """
+        Scheduler job: hands the next integrity check to the verify stage and reschedules it.
+        """
+        if self.stopped:
+            return
+        self.verify_now()
+        self.scheduler.schedule_update(self.on_verify, self.config.verify_interval, (), 'verify')
+
+    def verify_now(self, on_done: t.Optional[t.Callable[[dict], None]] = None) -> bool:
+        """
+        Hands an integrity check of the next slice of stored files to the verify stage.
+
+        Args:
+            on_done (callable, optional): Called with the check's results when it finishes.
+
+        Returns:
+            bool: True if the check was queued.
+        """
+        if self.verifier is None:
+            return False
+
+        def run_verify():
+            report = self.verifier.run(lambda: self.stopped)
+            if report and on_done:
+                on_done(report)
+        return self.verify.submit('verify', run_verify)
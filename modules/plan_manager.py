@@ -0,0 +1,147 @@
+from modules.log_manager import LogManager
+from modules.file_manager import FileManager
+import random
+import typing as t
+
+class PlanManager:
+    """
+    Keeps a persisted plan of the next files to post.
+
+    The plan holds the next 'plan_lookahead' paths, drawn ahead of time by the
+    SelectionManager with a seeded random number generator. Because the order is
+    decided in advance, the upcoming files can be prepared (rendered, link-checked,
+    converted) before their turn, and operators can see what comes next. The
+    generator's state is saved with the plan, so the order survives a restart.
+
+    The plan is updated incrementally: files that leave the queue are dropped from it,
+    and it is topped up from the selector whenever it runs short.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        files (FileManager): The file manager instance.
+        selector (SelectionManager): Draws the files that are added to the plan.
+        plan_file (str): The path to the plan file.
+        lookahead (int): The number of files kept in the plan.
+        upcoming (list): The planned paths, next first.
+
+    Example:
+        >>> plan = PlanManager(selector, 'plan.json', lookahead=10)
+        >>> plan.refresh()
+        >>> plan.peek(3)
+        [QueueEntry(...), QueueEntry(...), QueueEntry(...)]
+    """
+
+    version = 1
+
+    def __init__(self, selector, plan_file: str, lookahead: int = 10, seed: t.Optional[int] = None):
+        """
+        Initializes the PlanManager and loads the plan from disk.
+
+        Args:
+            selector (SelectionManager): Draws the files that are added to the plan.
+            plan_file (str): The name of the plan file to use.
+            lookahead (int): The number of files kept in the plan.
+            seed (int, optional): The seed for a new plan. A random seed is used when unset.
+
+        Note:
+            The plan file will be stored in the 'queue/' directory.
+        """
+        self.logger = LogManager.setup_logger('PLN')
+        self.files = FileManager()
+        self.selector = selector
+        self.plan_file = 'queue/' + plan_file
+        self.lookahead = max(1, lookahead)
+        self.upcoming = []
+        self.rng = random.Random(seed)
+        self.load()
+        # Draws for the plan come from the persisted generator, so they are reproducible.
+        self.selector.rng = self.rng
+        self.logger.debug('Plan Module initialized.')
+
+    def load(self):
+        """
+        Loads the plan and the generator state from the plan file.
+
+        Note:
+            A plan made with a different selection strategy is discarded.
+        """
+        data = self.files.operation(self.plan_file, 'r', {}) or {}
+        if data.get('version') != self.version or data.get('strategy') != self.selector.strategy:
+            return
+        self.upcoming = list(data.get('upcoming', []))
+        state = data.get('rng')
+        if state:
+            self.rng.setstate((state[0], tuple(state[1]), state[2]))
+
+    def save(self):
+        """
+        Saves the plan and the generator state to the plan file.
+        """
+        self.files.operation(self.plan_file, 'w+', {
+            'version': self.version,
+            'strategy': self.selector.strategy,
+            'upcoming': self.upcoming,
+            'rng': self.rng.getstate(),
+        })
+
+    def refresh(self) -> bool:
+        """
+        Drops files that are no longer queued and tops the plan up to 'lookahead' files.
+
+        Returns:
+            bool: True if the plan changed (and was saved).
+        """
+        entries = self.selector.entries
+        kept = [path for path in self.upcoming if path in entries]
+        changed = len(kept) != len(self.upcoming)
+        self.upcoming = kept
+
+        needed = self.lookahead - len(self.upcoming)
+        if needed > 0:
+            for entry in self.selector.select(needed, exclude=self.upcoming):
+                self.upcoming.append(entry['path'])
+                self.selector.posted(entry)
+                changed = True
+
+        if changed:
+            self.save()
+        return changed
+
+    def peek(self, count: t.Optional[int] = None) -> list:
+        """
+        Returns the next planned entries without removing them from the plan.
+
+        Args:
+            count (int, optional): The number of entries. Defaults to the whole plan.
+
+        Returns:
+            list: The planned queue entries, next first.
+        """
+        self.refresh()
+        entries = self.selector.entries
+        paths = self.upcoming if count is None else self.upcoming[:count]
+        return [entries[path] for path in paths]
+
+    def remove(self, path: str):
+        """
+        Drops a path from the plan, e.g. after it was posted or deleted.
+
+        Args:
+            path (str): The queue entry's path.
+        """
+        if path in self.upcoming:
+            self.upcoming.remove(path)
+            self.save()
+
+    def defer(self, path: str):
+        """
+        Moves a path to the end of the plan, e.g. after a failed send, so one bad file
+        does not block the files behind it.
+
+        Args:
+            path (str): The queue entry's path.
+        """
+        if path in self.upcoming:
+            self.upcoming.remove(path)
+            self.upcoming.append(path)
+            self.save()
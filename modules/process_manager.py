@@ -0,0 +1,327 @@
+from modules.log_manager import LogManager
+import atexit
+import collections
+import contextlib
+import os
+import signal
+import subprocess
+import threading
+import time
+import typing as t
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+class ProcessError(subprocess.CalledProcessError):
+    """
+    Raised when a media tool fails, is killed, or runs out of time.
+
+    A subclass of subprocess.CalledProcessError, so callers that handled a failed
+    subprocess.run(check=True) handle it too. 'stderr' holds the last lines the
+    tool wrote, for the log.
+    """
+
+    def __init__(self, returncode: t.Optional[int], cmd, stderr: str = '', reason: str = ''):
+        super().__init__(returncode, cmd, stderr=stderr)
+        self.reason = reason
+
+    def __str__(self):
+        text = f"{os.path.basename(str(self.cmd[0]))} {self.reason or f'exited with status {self.returncode}'}"
+        if self.stderr:
+            text += f": {self.stderr.strip().splitlines()[-1]}"
+        return text
+
+
+class ProcessTimeoutError(ProcessError):
+    """
+    Raised when a media tool runs past its wall-clock limit and is killed.
+    """
+
+
+class ProcessResult(t.NamedTuple):
+    """
+    The outcome of a media tool run.
+
+    Attributes:
+        returncode (int): The exit status.
+        elapsed (float): The wall-clock seconds the run took.
+        stderr (str): The last lines the tool wrote to stderr.
+        progress (dict): The last ffmpeg '-progress' report, e.g. 'fps', 'speed' and 'total_size'.
+    """
+    returncode: int
+    elapsed: float
+    stderr: str
+    progress: dict
+
+
+class ProcessManager:
+    """
+    Runs media tools such as ffmpeg as bounded, cancellable child processes.
+
+    Every run has a wall-clock limit ('media_tool_timeout'), after which the tool
+    is killed, and a CPU-time limit ('media_tool_cpu_seconds'), enforced by the OS
+    through RLIMIT_CPU, so a stuck decode can never hold up the thread waiting on
+    it. The CPU-time limit is set with prlimit() once the tool has started, which
+    is only available on Linux. Elsewhere only the wall-clock limit applies.
+
+    Output is not passed to the console. The last 'media_tool_stderr_lines' lines of
+    stderr are kept in a ring buffer and attached to the error when a tool fails.
+    ffmpeg runs report their progress on stdout ('-progress'), which is parsed into
+    throughput figures for the log and the per-tool totals in 'metrics'.
+
+    Children run in their own process group and are killed by stop(), which the
+    bot calls at shutdown and which also runs at interpreter exit.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        config (ConfigModel): The bot's configuration settings.
+        children (set): The running child processes.
+        metrics (dict): The runs, failures and seconds spent per tool, and the seconds of media ffmpeg wrote.
+        stopped (bool): Whether stop() was called. No tool is started after it.
+
+    Example:
+        >>> processes = ProcessManager(config)
+        >>> processes.ffmpeg(["-y", "-i", "in.webm", "out.mp4"], name="convert in.webm")
+        ProcessResult(returncode=0, elapsed=4.2, stderr='', progress={'fps': '120.0', 'speed': '3.1x', ...})
+    """
+
+    # The seconds a child is given to exit after SIGTERM at shutdown.
+    stop_grace = 2.0
+
+    def __init__(self, config):
+        """
+        Initializes the ProcessManager.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+        """
+        self.logger = LogManager.setup_logger('PRC')
+        self.config = config.config_data
+        self.children = set()
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.stopped = False
+        atexit.register(self.stop)
+        self.logger.debug('Process Module initialized.')
+
+    def limit_cpu(self, process: subprocess.Popen, seconds: int):
+        """
+        Limits the CPU time of a running child process.
+
+        Applied from the parent after the child starts, since running Python in the
+        child between fork and exec is not safe while other threads run.
+
+        Args:
+            process (subprocess.Popen): The child process.
+            seconds (int): The CPU seconds it may use before it is sent SIGXCPU.
+        """
+        try:
+            resource.prlimit(process.pid, resource.RLIMIT_CPU, (seconds, seconds + 1))
+        except ProcessLookupError:
+            # It exited already.
+            pass
+        except OSError as e:
+            self.logger.warning(f"Could not limit the CPU time of process {process.pid}: {e}")
+
+    @staticmethod
+    def parse_progress(line: str, report: dict) -> bool:
+        """
+        Adds one line of ffmpeg '-progress' output to a report.
+
+        Args:
+            line (str): The line, e.g. 'fps=120.0'.
+            report (dict): The report being read.
+
+        Returns:
+            bool: True if the line ends a report ('progress=continue' or 'progress=end').
+        """
+        key, separator, value = line.strip().partition('=')
+        if not separator:
+            return False
+        report[key] = value.strip()
+        return key == 'progress'
+
+    def run(self, args: t.List[str], name: t.Optional[str] = None, timeout: t.Optional[float] = None,
+            progress: bool = False) -> ProcessResult:
+        """
+        Runs a tool to completion within the configured limits.
+
+        Args:
+            args (list[str]): The command line.
+            name (str, optional): Describes the run in the log. Defaults to the command line.
+            timeout (float, optional): The wall-clock limit in seconds. Defaults to 'media_tool_timeout'.
+            progress (bool): Whether the tool writes ffmpeg '-progress' reports to stdout.
+
+        Returns:
+            ProcessResult: The outcome of a successful run.
+
+        Raises:
+            ProcessTimeoutError: If the tool ran past the wall-clock limit.
+            ProcessError: If the tool failed, ran out of CPU time or was stopped at shutdown.
+            OSError: If the tool could not be started, e.g. it is not installed.
+        """
+        name = name or ' '.join(args)
+        timeout = timeout or self.config.media_tool_timeout
+        cpu_seconds = self.config.media_tool_cpu_seconds
+        stderr = collections.deque(maxlen=self.config.media_tool_stderr_lines)
+        report, last_report = {}, {}
+        options = {}
+        if os.name == 'nt':
+            options['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            options['start_new_session'] = True
+        cpu_limited = bool(cpu_seconds) and hasattr(resource, 'prlimit')
+
+        with self.lock:
+            if self.stopped:
+                raise ProcessError(None, args, reason="was not started: shutting down")
+            process = subprocess.Popen(args, stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE if progress else subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE, text=True, errors='replace', **options)
+            self.children.add(process)
+        started = time.monotonic()
+        if cpu_limited:
+            self.limit_cpu(process, cpu_seconds)
+
+        # Both pipes are drained on their own threads, so a chatty tool never blocks on a full pipe.
+        def read_stderr():
+            for line in process.stderr:
+                stderr.append(line)
+
+        def read_progress():
+            for line in process.stdout:
+                if self.parse_progress(line, report):
+                    last_report.clear()
+                    last_report.update(report)
+        readers = [threading.Thread(target=read_stderr, name='process-stderr', daemon=True)]
+        if progress:
+            readers.append(threading.Thread(target=read_progress, name='process-progress', daemon=True))
+        for reader in readers:
+            reader.start()
+
+        try:
+            returncode = process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.kill(process)
+            returncode = None
+        finally:
+            with self.lock:
+                self.children.discard(process)
+        for reader in readers:
+            reader.join(1.0)
+        for pipe in (process.stdout, process.stderr):
+            if pipe:
+                with contextlib.suppress(OSError):
+                    pipe.close()
+        elapsed = time.monotonic() - started
+        tail = ''.join(stderr)
+        self.record(args, elapsed, returncode == 0, last_report)
+
+        if returncode is None:
+            self.logger.error(f"{name} ran for more than {timeout} seconds. Killed it.")
+            raise ProcessTimeoutError(None, args, tail, f"ran for more than {timeout} seconds")
+        if returncode != 0:
+            if self.stopped:
+                reason = "was stopped at shutdown"
+            elif cpu_limited and returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+                reason = f"exceeded {cpu_seconds} seconds of CPU time"
+            else:
+                reason = ''
+            self.logger.error(f"{name} failed after {elapsed:.1f} seconds. Last output:\n{tail.strip()}")
+            raise ProcessError(returncode, args, tail, reason)
+        self.logger.debug(f"{name} finished in {elapsed:.1f} seconds. {self.format_progress(last_report)}")
+        return ProcessResult(returncode, elapsed, tail, dict(last_report))
+
+    def ffmpeg(self, args: t.List[str], name: t.Optional[str] = None, timeout: t.Optional[float] = None) -> ProcessResult:
+        """
+        Runs ffmpeg quietly, with its progress reported on stdout.
+
+        Args:
+            args (list[str]): The arguments after 'ffmpeg'.
+            name (str, optional): Describes the run in the log.
+            timeout (float, optional): The wall-clock limit in seconds. Defaults to 'media_tool_timeout'.
+
+        Returns:
+            ProcessResult: The outcome of a successful run.
+        """
+        command = ["ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error", "-progress", "pipe:1", *args]
+        return self.run(command, name, timeout, progress=True)
+
+    def kill(self, process: subprocess.Popen, grace: float = 0.0):
+        """
+        Kills a child process and its own children.
+
+        Args:
+            process (subprocess.Popen): The child process.
+            grace (float): The seconds to wait for it to exit after SIGTERM before killing it.
+        """
+        if process.poll() is not None:
+            return
+        try:
+            if grace:
+                self.signal(process, signal.SIGTERM)
+                try:
+                    process.wait(grace)
+                    return
+                except subprocess.TimeoutExpired:
+                    pass
+            self.signal(process, signal.SIGKILL if os.name != 'nt' else signal.SIGTERM)
+            process.wait(5.0)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.logger.warning(f"Could not kill process {process.pid}: {e}")
+
+    @staticmethod
+    def signal(process: subprocess.Popen, signum: int):
+        if os.name == 'nt':
+            process.send_signal(signum)
+        else:
+            # The child leads its own process group. Signal the tools it started too.
+            os.killpg(process.pid, signum)
+
+    def stop(self):
+        """
+        Kills the running children and refuses to start new ones, e.g. at shutdown.
+        """
+        with self.lock:
+            self.stopped = True
+            children = list(self.children)
+        for process in children:
+            self.logger.info(f"Stopping process {process.pid}.")
+            self.kill(process, self.stop_grace)
+
+    def record(self, args: t.List[str], elapsed: float, ok: bool, report: dict):
+        tool = os.path.basename(str(args[0]))
+        with self.lock:
+            metrics = self.metrics.setdefault(tool, {'runs': 0, 'failures': 0, 'seconds': 0.0, 'media_seconds': 0.0})
+            metrics['runs'] += 1
+            metrics['failures'] += 0 if ok else 1
+            metrics['seconds'] += elapsed
+            try:
+                metrics['media_seconds'] += int(report.get('out_time_us', 0)) / 1000000
+            except ValueError:
+                pass
+
+    @staticmethod
+    def format_progress(report: dict) -> str:
+        """
+        Describes the throughput in an ffmpeg '-progress' report.
+
+        Args:
+            report (dict): The report.
+
+        Returns:
+            str: e.g. '120.0 fps, 3.1x realtime, 2.5 MB written.', or '' if there is no report.
+        """
+        if not report:
+            return ''
+        parts = []
+        if report.get('fps') not in (None, '', '0.00'):
+            parts.append(f"{report['fps']} fps")
+        if report.get('speed') not in (None, '', 'N/A'):
+            parts.append(f"{report['speed']} realtime")
+        if report.get('total_size', '').isdigit():
+            parts.append(f"{int(report['total_size']) / 1000000:.1f} MB written")
+        return ', '.join(parts) + '.' if parts else ''
@@ -1,10 +1,37 @@
+import contextlib
+import hashlib
+import json
 import os
-import pathlib
-import random
-import subprocess
+import threading
+import time
+import typing as t
 import urllib.parse
 from modules.log_manager import LogManager
+from modules.blob_manager import BlobManager, FetchError, FileTooLargeError, QuotaExceededError
+from modules.entry_manager import EntryManager, QueueEntry
 from modules.file_manager import FileManager
+from modules.ledger_manager import LedgerManager
+from modules.lock_manager import ReadWriteLock
+from modules.media_cache_manager import MediaCacheManager
+from modules.phash_manager import PhashManager
+from modules.plan_manager import PlanManager
+from modules.process_manager import ProcessManager
+from modules.selection_manager import SelectionManager
+from modules.tag_manager import TagManager, proper_title
+
+class QueueSnapshot(t.NamedTuple):
+    """
+    The queue as it was at one point, for reading without holding the queue lock.
+
+    Attributes:
+        entries (tuple): The queued entries, in queue order.
+        paths (frozenset): The paths of the queued entries.
+        version (int): The queue version the snapshot was taken at.
+    """
+    entries: tuple
+    paths: frozenset
+    version: int
+
 
 class QueueManager:
     """
@@ -13,12 +40,33 @@ class QueueManager:
     This class handles the storage, retrieval, and processing of images in the queue.
     It interfaces with both Hydrus Network and Telegram to manage the posting workflow.
 
+    The queue is shared by the ingest, preparation, posting and polling threads.
+    Changes to it are made under the write side of a reader-writer lock, by
+    mutation(), and readers take a snapshot(), which is cached until the next
+    change. No lock on the queue is held while Hydrus, Telegram or ffmpeg is
+    called, or while the queue file is written: posting and preparation are kept
+    apart by a lock of their own, and saves by another. flush() saves the queue at
+    shutdown once the change in progress is done.
+
     Attributes:
-        config (ConfigModel): The bot's configuration settings.
+        config (ConfigModel): The bot's configuration settings, with the channel's settings applied.
+        channel (str): The name of the channel the queue posts to.
         files (FileManager): The file manager instance.
+        blobs (BlobManager): The reference-counted file store shared by all channels.
+        media_cache (MediaCacheManager): The index of Telegram file_ids for uploaded media.
+        ledger (LedgerManager): The local record of posted files.
+        processes (ProcessManager): Runs ffmpeg within its time limits.
+        phash (PhashManager): The perceptual hash index of queued and posted files.
+        selector (SelectionManager): Chooses which queued files to post next.
+        plan (PlanManager): The persisted plan of the next files to post.
+        tags (TagManager): The compiled tag-to-caption renderer.
+        entries (EntryManager): Creates queue entries and converts the queue file.
         queue_file (str): The path to the queue file.
-        queue_data (dict): The current queue data.
+        queue_data (dict): The current queue data. Entries are QueueEntry objects.
         queue_loaded (bool): Whether the queue has been loaded from disk.
+        queue_lock (ReadWriteLock): Held to write while the queue changes, and to read while it is read.
+        version (int): The number of changes made to the queue.
+        ingest_paused (bool): Whether the last ingest stopped because the queue was over quota.
         telegram (TelegramManager): The Telegram manager instance.
         hydrus (HydrusManager): The Hydrus manager instance.
         logger (Logger): The logger instance for this class.
@@ -28,67 +76,88 @@ class QueueManager:
         set_hydrus(hydrus): Sets the Hydrus manager for the bot.
         load_queue(): Loads the queue data from the queue file.
         save_queue(): Saves the queue data to the queue file.
+        mutation(): Context manager for changing the queue.
+        snapshot(): Returns the queue as it is now, for reading.
+        flush(): Saves the queue for shutdown.
         image_is_queued(filename): Checks if an image is already in the queue.
         save_image_to_queue(file_id): Saves an image to the queue.
+        ingest_rate(days): Returns the number of files queued per day, recently.
+        refresh_upcoming(): Brings the captions of the planned files up to date with Hydrus.
+        prepare_upcoming(): Refreshes and prepares the planned files ahead of their turn.
+        quota_exceeded(): Checks whether the queue is over its item or byte quota.
         process_queue(): Processes the queue by posting an image to Telegram.
+        prepare_media(image): Prepares a queued image for sending.
+        keep_missing(image, error): Keeps an image whose stored file is missing in the queue.
+        post_image(image): Posts a single queued image.
+        post_album(images): Posts several queued images as one album.
         delete_from_queue(path, index): Deletes an image from the queue and disk.
+        delete_image(image): Deletes a queued image by identity.
     """
 
+    version = 0
+    saved_version = -1
+    cached_snapshot = None
+    flush_pending = False
+    closed = False
+
     def _proper_title(self, text: str) -> str:
         """
         Converts text to title case while properly handling apostrophes.
-        
-        This function fixes the issue with Python's .title() method which
-        incorrectly capitalizes letters after apostrophes (e.g., "don't" -> "Don'T").
-        
+
         Args:
             text (str): The text to convert to title case.
-            
+
         Returns:
             str: The text in proper title case.
+
+        Note:
+            Kept for compatibility. See modules.tag_manager.proper_title().
         """
-        if not text:
-            return text
-        
-        # Split by spaces and handle each word
-        words = text.split()
-        title_words = []
-        
-        for word in words:
-            # Handle apostrophes by splitting on them and capitalizing each part
-            if "'" in word:
-                parts = word.split("'")
-                title_parts = []
-                for i, part in enumerate(parts):
-                    if part:  # Only capitalize non-empty parts
-                        if i == 0:  # First part gets title case
-                            title_parts.append(part.capitalize())
-                        else:  # Parts after apostrophe stay lowercase
-                            title_parts.append(part.lower())
-                title_words.append("'".join(title_parts))
-            else:
-                # No apostrophe, just capitalize normally
-                title_words.append(word.capitalize())
-        
-        return " ".join(title_words)
+        return proper_title(text)
 
-    def __init__(self, config, queue_file: str):
+    def __init__(self, config, queue_file: str, channel: str = 'default', blobs: t.Optional[BlobManager] = None,
+                 media_cache: t.Optional[MediaCacheManager] = None, ledger: t.Optional[LedgerManager] = None,
+                 processes: t.Optional[ProcessManager] = None):
         """
         Initializes the QueueManager with configuration and queue file.
 
         Args:
-            config (ConfigManager): The bot's configuration manager.
+            config (ConfigManager): The bot's configuration manager, or a channel's view of it.
             queue_file (str): The name of the queue file to use.
+            channel (str): The name of the channel the queue posts to.
+            blobs (BlobManager, optional): The file store shared with other channels.
+            media_cache (MediaCacheManager, optional): The file_id cache shared with other channels.
+            ledger (LedgerManager, optional): The posted ledger shared with other channels.
+            processes (ProcessManager, optional): The media tool runner shared with other channels.
 
         Note:
-            The queue file will be stored in the 'queue/' directory.
+            The queue file will be stored in the 'queue/' directory. The plan and
+            perceptual hash index of a channel other than 'default' are named after it.
         """
         self.logger = LogManager.setup_logger('QUE')
         self.config = config.config_data
+        self.channel = channel
+        suffix = '' if channel == 'default' else f"-{channel}"
         self.files = FileManager()
+        self.blobs = blobs or BlobManager()
+        self.media_cache = media_cache or MediaCacheManager('media_cache.json')
+        self.ledger = ledger or LedgerManager('posted.db')
+        self.processes = processes or ProcessManager(config)
+        self.phash = PhashManager(f"phash_index{suffix}.npz")
+        self.selector = SelectionManager(config)
+        self.plan = PlanManager(self.selector, f"plan{suffix}.json", self.config.plan_lookahead, self.config.plan_seed)
+        # Held to write while the queue changes, and to read while it is encoded or copied.
+        self.queue_lock = ReadWriteLock()
+        # Held while posting, so only one post is made at a time.
+        self.post_lock = threading.RLock()
+        # Held while the queue file is read or written, so saves never interleave.
+        self.save_lock = threading.Lock()
+        self.tags = TagManager(config)
+        self.entries = EntryManager(self.tags)
         self.queue_file = 'queue/' + queue_file
         self.queue_data = {"queue": []}
         self.queue_loaded = False
+        self.ingest_paused = False
         self.logger.debug('Queue Module initialized.')
 
     def set_telegram(self, telegram):
@@ -115,6 +184,7 @@ class QueueManager:
 
         This method reads the queue data from the JSON file and stores it in memory.
         If the file doesn't exist, it creates a new queue with an empty list.
+        Queue files in the old format are converted to compact entries.
 
         Note:
             The queue is only loaded if it hasn't been loaded already.
@@ -125,23 +195,120 @@ class QueueManager:
             self.logger.debug("Queue already loaded.")
             return
 
-        self.queue_data = self.files.operation(self.queue_file, 'r', {"queue":[]})
+        with self.mutation():
+            # Another thread may have loaded it while this one waited.
+            if self.queue_loaded:
+                return
+            with self.save_lock:
+                data = self.files.operation(self.queue_file, 'r', {"queue":[]})
+            self.queue_data = self.entries.decode(data)
+            self.selector.rebuild(self.queue_data['queue'])
+            self.queue_loaded = True
         self.logger.debug("Loaded queue.json")
-        self.queue_loaded = True
 
     def save_queue(self):
         """
         Saves the current queue data to the queue file.
 
-        This method writes the current queue data to the JSON file and marks
-        the queue as unloaded to ensure fresh data is read next time.
+        This method writes the current queue data to the JSON file, in the compact
+        format built by EntryManager.encode().
 
         Note:
-            The queue is marked as unloaded after saving to ensure data consistency.
+            The queue is encoded under the read lock and written without it. A save
+            that finds a later version already written is skipped, so saves from
+            several threads never leave an older queue on disk. The queue stays
+            loaded: the queue in memory is the authority, and reloading it would
+            replace the entries other threads are working on.
         """
-        self.files.operation(self.queue_file, 'w+', self.queue_data)
+        with self.queue_lock.read():
+            version = self.version
+            data = self.entries.encode(self.queue_data)
+        with self.save_lock:
+            if self.closed or self.saved_version > version:
+                return
+            self.files.operation(self.queue_file, 'w+', data)
+            self.saved_version = version
         self.logger.debug("Saved queue.json")
-        self.queue_loaded = False
+
+    @contextlib.contextmanager
+    def mutation(self):
+        """
+        Context manager for changing the queue: holds the write lock, and marks the
+        queue as changed when done.
+
+        Yields:
+            dict: The queue data.
+
+        Note:
+            If flush() was called on this thread while it was changing the queue,
+            the queue is flushed once the change is done.
+        """
+        try:
+            with self.queue_lock.write():
+                try:
+                    yield self.queue_data
+                finally:
+                    self.version += 1
+                    self.cached_snapshot = None
+        finally:
+            if self.flush_pending and not self.queue_lock.write_held():
+                self.flush_pending = False
+                self.flush()
+
+    def snapshot(self) -> QueueSnapshot:
+        """
+        Returns the queue as it is now, for reading without holding the queue lock.
+
+        The snapshot is copied once per change to the queue and shared by every
+        reader until the next change.
+
+        Returns:
+            QueueSnapshot: The queued entries and their paths.
+        """
+        snapshot = self.cached_snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        with self.queue_lock.read():
+            entries = tuple(self.queue_data['queue'])
+            snapshot = QueueSnapshot(entries, frozenset(entry['path'] for entry in entries), self.version)
+        self.cached_snapshot = snapshot
+        return snapshot
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Saves the queue for shutdown, once the change in progress is done.
+
+        Not safe to call from a signal handler, which may have interrupted a thread
+        holding the queue's locks. The bot flushes from its main loop instead.
+
+        Waits up to 'timeout' seconds for another thread's change to finish. After
+        the flush, the queue file is not written again, so a thread still running
+        at exit cannot leave it half written.
+
+        Args:
+            timeout (float): The most seconds to wait for the change in progress.
+
+        Returns:
+            bool: True if the queue was saved, False if the flush is deferred until
+                  this thread's own change is done.
+        """
+        if not self.queue_loaded:
+            return True
+        if self.queue_lock.write_held():
+            # Called during this thread's own change.
+            self.flush_pending = True
+            return False
+        if self.queue_lock.read_held():
+            # Called during this thread's own read. Nothing is changing.
+            pass
+        elif self.queue_lock.acquire_write(timeout):
+            self.queue_lock.release_write()
+        else:
+            self.logger.warning(f"The queue was still changing after {timeout} seconds. Saving it as it is.")
+        self.save_queue()
+        with self.save_lock:
+            self.closed = True
+        return True
 
     def image_is_queued(self, filename: str) -> bool:
         """
@@ -157,13 +324,9 @@ class QueueManager:
             This method automatically loads the queue if it hasn't been loaded.
         """
         self.load_queue()
-        if len(self.queue_data['queue']) > 0:
-            for entry in self.queue_data['queue']:
-                if entry['path'] == filename:
-                    return True
-        return False
+        return filename in self.snapshot().paths
 
-    def save_image_to_queue(self, file_id: int) -> int:
+    def save_image_to_queue(self, file_id: int, on_download: t.Optional[t.Callable[[int], None]] = None) -> int:
         """
         Saves an image from Hydrus to the queue.
 
@@ -175,20 +338,28 @@ class QueueManager:
 
         Args:
             file_id (int): The ID of the file to save.
+            on_download (callable, optional): Called with the bytes downloaded once the file
+                is stored, before it is added to the queue. 0 if it was stored already.
 
         Returns:
-            int: 1 if the image was saved successfully, 0 otherwise.
+            int: 1 if the image was saved successfully, 0 if it was skipped, e.g. already queued or posted.
 
         Raises:
-            Exception: If an error occurs while saving the image.
+            QuotaExceededError: If the file would put the queue over its quota, or the disk is full.
+                The quota is checked against the file's size from its metadata before it is downloaded.
+            FileTooLargeError: If the file could never fit in the quota. It is not downloaded.
+            FetchError: If the file's metadata or content could not be fetched from Hydrus, or
+                it could not be queued for another reason. Its stored file is released.
 
         Note:
             The image is only added to the queue if it's not already present.
         """
         try:
-            # Load metadata from Hydrus.
+            # Load metadata from Hydrus. None means the request failed.
             metadata = self.hydrus.get_metadata(file_id)
-            if not metadata or 'metadata' not in metadata or not metadata["metadata"]:
+            if metadata is None:
+                raise FetchError(f"Could not fetch the metadata of file_id {file_id}.")
+            if 'metadata' not in metadata or not metadata["metadata"]:
                 self.logger.error(f"No metadata found for file_id {file_id}.")
                 return 0
 
@@ -197,129 +368,289 @@ class QueueManager:
                 self.logger.error(f"Missing file info for file_id {file_id}.")
                 return 0
 
+            # Skip files that were posted before, e.g. re-tagged for queueing in Hydrus.
+            if self.config.skip_posted and self.ledger.was_posted(file_info['hash'], self.config.telegram_channel):
+                self.logger.info(f"Skipping file_id {file_id}: {file_info['hash']} was already posted.")
+                return 0
+
+            # Skip or flag files that look like a queued or posted file, e.g. a re-encode.
+            phash = None
+            if self.config.near_duplicate_threshold is not None:
+                phash, is_duplicate = self.check_near_duplicate(file_info)
+                if is_duplicate:
+                    return 0
+
             # Save image from Hydrus to queue folder. Creates filename based on hash.
+            # A file another channel queued already is shared rather than downloaded again.
             filename = str(f"{file_info['hash']}{file_info['ext']}")
-            path = pathlib.Path.cwd() / "queue" / filename
+            if self.image_is_queued(filename):
+                return 0
+            downloaded = []
+
+            def fetch():
+                content = self.hydrus.get_file_content(file_info['file_id'])
+                downloaded.append(len(content or b''))
+                return content
             try:
-                file_content = self.hydrus.get_file_content(file_info['file_id'])
-                if not file_content:
-                    self.logger.error(f"No file content found for file_id {file_info['file_id']}.")
-                    return 0
-                path.write_bytes(file_content)
+                if not self.blobs.acquire(filename, fetch, file_info.get('size') or 0):
+                    raise FetchError(f"No file content found for file_id {file_info['file_id']}.")
+            except (QuotaExceededError, FetchError):
+                raise
+            except FileTooLargeError as e:
+                # Reported once. The file keeps its queue tag, so it is queued if the quota is raised.
+                if filename not in self.blobs.too_large:
+                    self.blobs.too_large.add(filename)
+                    self.logger.warning(f"Skipping file_id {file_id}: {e}")
+                    self.telegram.send_message(f"⚠️ File too large for the queue quota, skipped:\n`{filename}`\n{e}")
+                raise
             except Exception as e:
-                self.logger.error(f"An error occurred while saving the image to the queue: {filename}: {e}")
-                return 0
+                raise FetchError(f"Could not download {filename}: {e}") from e
+            if on_download:
+                on_download(sum(downloaded))
 
-            # Get the tags for the image
-            tags_dict = file_info.get("tags", {})
-            if self.hydrus.hydrus_service_key["downloader_tags"] not in tags_dict:
-                self.logger.error(f"No downloader tags found for file_id {file_id}.")
-                return 0
-                
-            # Debug logging to understand the tags structure
-            # Commented out to avoid Unicode encoding issues in console logging
-            # Uncomment the lines below if you need to debug tag structures
-            # try:
-            #     sanitized_tags = str(tags_dict).encode('ascii', errors='replace').decode('ascii')
-            #     self.logger.debug(f"Tags structure for file_id {file_id}: {sanitized_tags}")
-            #     self.logger.debug(f"Downloader tags key: {self.hydrus.hydrus_service_key['downloader_tags']}")
-            #     if self.hydrus.hydrus_service_key["downloader_tags"] in tags_dict:
-            #         sanitized_downloader_tags = str(tags_dict[self.hydrus.hydrus_service_key['downloader_tags']]).encode('ascii', errors='replace').decode('ascii')
-            #         self.logger.debug(f"Downloader tags structure: {sanitized_downloader_tags}")
-            # except Exception as e:
-            #     self.logger.debug(f"Could not log tags structure due to encoding issues: {e}")
-
-            # Process tags and create metadata
-            downloader_tags = tags_dict[self.hydrus.hydrus_service_key["downloader_tags"]]
-            
-            # Check if downloader_tags has the expected structure
-            if 'storage_tags' not in downloader_tags:
-                self.logger.warning(f"No storage_tags found in downloader_tags for file_id {file_id}. Skipping tag processing.")
-                tags = []
-            else:
-                storage_tags = downloader_tags['storage_tags']
+            # The file is referenced now. Until its entry is queued, a failure must drop the
+            # reference, or the file stays on disk with nothing to delete it.
+            try:
+                # Get the tags for the image
+                tags_dict = file_info.get("tags", {})
+                downloader_tags_key = self.hydrus.get_service_key("downloader_tags")
+                if downloader_tags_key not in tags_dict:
+                    self.logger.error(f"No downloader tags found for file_id {file_id}.")
+                    self.blobs.release(filename)
+                    return 0
                 
-                # Check if storage_tags has the expected structure
-                if not storage_tags or '0' not in storage_tags:
-                    self.logger.warning(f"No storage tags found for file_id {file_id} or missing '0' key. "
-                                        f"(available keys: {list(storage_tags.keys()) if storage_tags else 'none'}). "
-                                        f"File: {filename}. Skipping tag processing.")
-                    tags = []
-                else:
-                    tags = storage_tags['0']
-            creator = None
-            title = None
-            character = None
-
-            for tag in tags:
-                if tag.startswith("creator:"):
-                    tag = self.telegram.replace_html_entities(tag)
-                    creator_tag = tag.split(":", 1)[1]
-                    creator_name = creator_tag.replace(" (artist)", "")
-                    creator_name = self._proper_title(creator_name)
-                    creator_urlencoded = creator_tag.replace(" ", "_")
-                    creator_urlencoded = urllib.parse.quote(creator_urlencoded)
-                    creator_markup = f"<a href=\"https://e621.net/posts?tags={creator_urlencoded}\">{creator_name}</a>"
-                    creator = creator_markup if creator is None else creator + "\n" + creator_markup
-
-                elif tag.startswith("title:"):
-                    tag = self.telegram.replace_html_entities(tag)
-                    title_tag = tag.split(":", 1)[1]
-                    title_name = title_tag.replace(" (series)", "")
-                    title_name = self._proper_title(title_name)
-                    # Remove non-ASCII characters from title_name
-                    title_name = ''.join(c for c in title_name if ord(c) < 128)
-                    title_markup = f"{title_name}"
-                    title = title_markup if title is None else title + "\n" + title_markup
-
-                elif tag.startswith("character:"):
-                    tag = self.telegram.replace_html_entities(tag)
-                    character_tag = tag.split(":", 1)[1]
-                    character_name = character_tag.replace(" (character)", "")
-                    character_name = self._proper_title(character_name)
-                    character_urlencoded = character_tag.replace(" ", "_")
-                    character_urlencoded = urllib.parse.quote(character_urlencoded)
-                    character_markup = f"<a href=\"https://e621.net/posts?tags={character_urlencoded}\">{character_name}</a>"
-                    character = character_markup if character is None else character + "\n" + character_markup
-
-            # Create sauce links.
-            known_urls = metadata['metadata'][0].get('known_urls', [])
-            sauce = self.telegram.concatenate_sauce(known_urls) if known_urls else None
-
-            # Add image to queue if not present.
-            if not self.image_is_queued(filename):
-                # Assemble image data into a dict
-                image_data = {'path': filename}
-                if sauce is not None and sauce != "":
-                    image_data.update({'sauce': sauce})
-
-                if creator is not None and creator != "":
-                    image_data.update({'creator': creator})
-
-                if title is not None and title != "":
-                    image_data.update({'title': title})
-
-                if character is not None and character != "":
-                    image_data.update({'character': character})
-
-                # Insert image data dict into queue.
-                self.queue_data['queue'].append(image_data)
-                self.queue_loaded = False
-                self.save_queue()
-                return 1
-            else:
-                return 0
+                # Debug logging to understand the tags structure
+                # Commented out to avoid Unicode encoding issues in console logging
+                # Uncomment the lines below if you need to debug tag structures
+                # try:
+                #     sanitized_tags = str(tags_dict).encode('ascii', errors='replace').decode('ascii')
+                #     self.logger.debug(f"Tags structure for file_id {file_id}: {sanitized_tags}")
+                #     self.logger.debug(f"Downloader tags key: {self.hydrus.hydrus_service_key['downloader_tags']}")
+                #     if self.hydrus.hydrus_service_key["downloader_tags"] in tags_dict:
+                #         sanitized_downloader_tags = str(tags_dict[self.hydrus.hydrus_service_key['downloader_tags']]).encode('ascii', errors='replace').decode('ascii')
+                #         self.logger.debug(f"Downloader tags structure: {sanitized_downloader_tags}")
+                # except Exception as e:
+                #     self.logger.debug(f"Could not log tags structure due to encoding issues: {e}")
+
+                # Process tags and create metadata
+                tags = self.storage_tags(tags_dict[downloader_tags_key], file_id, filename)
+
+                # Create sauce links.
+                known_urls = file_info.get('known_urls', [])
+                sauce = self.telegram.concatenate_sauce(known_urls) if known_urls else None
+
+                # Keep the tags behind each caption field. Markup is rendered from them on demand.
+                image_data = self.entries.create(
+                    file_info['hash'],
+                    file_info['ext'],
+                    tags=tags,
+                    sauce=sauce,
+                    size=file_info.get('size') or 0,
+                    added=time.time(),
+                    digest=self.metadata_digest(tags, known_urls),
+                )
 
+                # Insert the entry into the queue. Ingest runs beside posting, so the queue
+                # is locked only for the insert, not while the file downloads or the queue is saved.
+                with self.mutation() as queue_data:
+                    if any(entry['path'] == filename for entry in queue_data['queue']):
+                        self.blobs.release(filename)
+                        return 0
+                    queue_data['queue'].append(image_data)
+                    self.selector.add(image_data)
+            except Exception as e:
+                self.blobs.release(filename)
+                if isinstance(e, FetchError):
+                    raise
+                raise FetchError(f"Could not queue {filename}: {e}") from e
+            self.ledger.record_queued(file_info['hash'], self.config.telegram_channel)
+            if phash is not None:
+                self.phash.add(file_info['hash'], phash)
+            self.save_queue()
+            return 1
+
+        except (QuotaExceededError, FetchError, FileTooLargeError):
+            raise
         except Exception as e:
+            # E.g. an open breaker. The file keeps its queue tag, rather than being retagged unqueued.
             self.logger.error(f"An error occurred while saving the image to the queue: {e}")
+            raise FetchError(f"Could not queue file_id {file_id}: {e}") from e
+
+    def storage_tags(self, downloader_tags: dict, file_id: int, filename: str = '') -> list:
+        """
+        Returns a file's current tags from its downloader tags service entry.
+
+        Args:
+            downloader_tags (dict): The file's Hydrus metadata for the downloader tags service.
+            file_id (int): The file's ID, for the log.
+            filename (str): The file's name, for the log.
+
+        Returns:
+            list: The tags, or an empty list if the entry has none.
+        """
+        # Check if downloader_tags has the expected structure
+        if 'storage_tags' not in downloader_tags:
+            self.logger.warning(f"No storage_tags found in downloader_tags for file_id {file_id}. Skipping tag processing.")
+            return []
+        storage_tags = downloader_tags['storage_tags']
+
+        # Check if storage_tags has the expected structure
+        if not storage_tags or '0' not in storage_tags:
+            self.logger.warning(f"No storage tags found for file_id {file_id} or missing '0' key. "
+                                f"(available keys: {list(storage_tags.keys()) if storage_tags else 'none'}). "
+                                f"File: {filename}. Skipping tag processing.")
+            return []
+        return storage_tags['0']
+
+    @staticmethod
+    def metadata_digest(tags: t.Iterable[str], known_urls: t.Iterable[str]) -> str:
+        """
+        Digests a file's tags and source URLs, so a change is found without comparing them.
+
+        Returns:
+            str: A short hex digest. The order of the tags and URLs does not matter.
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update("\n".join(sorted(tags)).encode('utf-8'))
+        digest.update(b"\0")
+        digest.update("\n".join(sorted(known_urls)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def refresh_upcoming(self) -> int:
+        """
+        Brings the captions of the planned files up to date with Hydrus.
+
+        The metadata of every planned file not checked for 'metadata_refresh_ttl'
+        seconds is fetched in one request. Only entries whose tag digest changed
+        are compared and rendered again, so posting needs no Hydrus round trip.
+
+        Returns:
+            int: The number of entries rendered again.
+
+        Note:
+            The Hydrus request, the rendering and the save are made without holding the queue lock.
+        """
+        ttl = self.config.metadata_refresh_ttl
+        if ttl is None:
+            return 0
+        now = time.time()
+        with self.mutation():
+            stale = {image.hash: image for image in self.plan.peek()
+                     if isinstance(image, QueueEntry) and now - image.refreshed >= ttl}
+        if not stale:
             return 0
 
+        metadata = self.hydrus.get_metadata_batch(list(stale))
+        downloader_tags_key = self.hydrus.get_service_key("downloader_tags")
+        changed = []
+        with self.mutation():
+            for file_info in metadata:
+                image = stale.get(file_info.get('hash'))
+                if image is None:
+                    continue
+                image.refreshed = now
+                downloader_tags = file_info.get('tags', {}).get(downloader_tags_key)
+                if downloader_tags is None:
+                    continue
+                tags = self.storage_tags(downloader_tags, file_info.get('file_id'), image.path)
+                known_urls = file_info.get('known_urls', [])
+                digest = self.metadata_digest(tags, known_urls)
+                if digest == image.digest:
+                    continue
+                sauce = self.telegram.concatenate_sauce(known_urls) if known_urls else None
+                if self.entries.update(image, tags, sauce, digest):
+                    changed.append(image)
+        # Rendering may check the source links, so it is done without the lock.
+        renders = [(image, self.telegram.render_message(image)) for image in changed]
+        with self.mutation():
+            for image, rendered in renders:
+                image['rendered'] = rendered
+        self.save_queue()
+        if changed:
+            self.logger.info(f"Updated the captions of {len(changed)} planned file(s) from Hydrus.")
+        return len(changed)
+
+    def prepare_upcoming(self):
+        """
+        Refreshes the metadata of the planned files, then prepares them ahead of their turn.
+        """
+        try:
+            self.refresh_upcoming()
+        except Exception as e:
+            # Post with the captions from ingest rather than not at all.
+            self.logger.warning(f"Could not refresh the metadata of the planned files: {e}")
+        self.warm_upcoming()
+
+    def ingest_rate(self, days: float = 7.0) -> float:
+        """
+        Returns the number of files queued per day for this channel, recently.
+
+        Args:
+            days (float): The length of the window to average over, in days.
+
+        Returns:
+            float: The files queued per day.
+        """
+        return self.ledger.queued_count(since=time.time() - days * 86400, chat_id=self.config.telegram_channel) / days
+
+    def quota_exceeded(self) -> t.Optional[str]:
+        """
+        Checks whether the queue is over its item or byte quota, or the disk is nearly full.
+
+        Returns:
+            str: Why ingest should pause, or None if there is room.
+
+        Note:
+            Both checks use counts kept up to date as files are queued and posted.
+        """
+        max_items = self.config.queue_max_items
+        queued = len(self.snapshot().entries) if max_items is not None else 0
+        if max_items is not None and queued >= max_items:
+            return f"{queued} of {max_items} files are queued"
+        return self.blobs.quota_exceeded()
+
+    def check_near_duplicate(self, file_info: dict) -> t.Tuple[t.Optional[int], bool]:
+        """
+        Compares a file's perceptual hash against the queued and posted files.
+
+        The hash is computed from the Hydrus thumbnail, so the full file is never
+        downloaded for a skipped near-duplicate.
+
+        Args:
+            file_info (dict): The file's Hydrus metadata.
+
+        Returns:
+            tuple: The file's perceptual hash (None if it could not be computed, e.g. no
+                   thumbnail), and whether the file should be skipped as a near-duplicate.
+        """
+        if not file_info.get('mime', 'image/').startswith('image/'):
+            return None, False
+        thumbnail = self.hydrus.get_thumbnail(file_info['file_id'])
+        phash = self.phash.dhash(thumbnail) if thumbnail else None
+        if phash is None:
+            self.logger.debug(f"No perceptual hash for {file_info['hash']}.")
+            return None, False
+
+        match = self.phash.find(phash, self.config.near_duplicate_threshold, exclude=file_info['hash'])
+        if match is None:
+            return phash, False
+        match_hash, distance = match
+        if self.config.near_duplicate_action == 'skip':
+            self.logger.info(f"Skipping {file_info['hash']}: near-duplicate of {match_hash} (distance {distance}).")
+            return phash, True
+        self.logger.info(f"Flagged {file_info['hash']} as a near-duplicate of {match_hash} (distance {distance}).")
+        self.telegram.send_message(
+            f"⚠️ Queued a possible near-duplicate (distance {distance}):\n`{file_info['hash']}`\nlooks like `{match_hash}`"
+        )
+        return phash, False
+
     def delete_from_queue(self, path: str, index: int):
         """
         Deletes an image from the queue and disk.
 
         This method:
-        1. Deletes the image file from disk
+        1. Releases the queue's reference to the image file, deleting it from disk
+           unless another channel still has it queued
         2. Removes the image from the queue data
         3. Saves the updated queue
         4. Logs the remaining queue size
@@ -330,44 +661,356 @@ class QueueManager:
         
         Raises:
             IndexError: If the image could not be removed from the queue.
-            OSError: If the image could not be deleted from disk.
             Exception: If any other error occurs during deletion.
 
         Note:
             For webm files, both the original file and its mp4 conversion are deleted.
         """
-        try:
-            os.remove(path)
-        except OSError as e:
-            self.logger.error(f"Could not delete file {path}: {e}")
+        self.blobs.release(os.path.basename(path))
+
+        with self.mutation() as queue_data:
+            try:
+                entry = queue_data['queue'].pop(index)
+                self.selector.remove(entry)
+                self.plan.remove(entry['path'])
+            except IndexError as e:
+                self.logger.error(f"Could not remove image from queue: {e}")
+            remaining = len(queue_data['queue'])
+
+        self.save_queue()
+
+        # Send queue size update to terminal.
+        self.logger.info("Queued images remaining: " + str(remaining))
+
+    def delete_image(self, image: dict):
+        """
+        Deletes a queued image from the queue and disk by path rather than index.
+
+        Args:
+            image (dict): The queue entry to delete.
+
+        Note:
+            Used when several entries are handled in one pass, where indices shift
+            after every removal, and by posting, which runs beside ingest.
+        """
+        with self.mutation() as queue_data:
+            for index, entry in enumerate(queue_data['queue']):
+                if entry['path'] == image['path']:
+                    # The write lock is reentrant, so the entry cannot move in between.
+                    self.delete_from_queue("queue/" + image['path'], index)
+                    return
+        self.logger.error(f"Could not find {image['path']} in queue.")
+
+    def prepare_media(self, image: dict) -> t.Optional[dict]:
+        """
+        Prepares a queued image for sending to Telegram.
+
+        This method:
+        1. Reuses the cached Telegram file_id if the content was uploaded before
+        2. Converts webm to mp4 and extracts video thumbnails if needed
+        3. Ensures images are compatible with the Telegram API
+
+        Args:
+            image (dict): The queue entry to prepare.
+
+        Returns:
+            dict: The prepared media with 'path', 'hash', 'type', 'file_id', 'media' and
+                  'thumbnail' keys, or None if the image cannot be sent.
+
+        Raises:
+            ProcessError: If ffmpeg fails to process a video, or runs out of time.
+            FetchError: If the stored file is missing, e.g. quarantined by the verifier and
+                not fetched again yet. The entry stays queued.
+        """
+        path = "queue/" + image['path']
+        file_hash = os.path.splitext(image['path'])[0]
+        media = {'path': path, 'hash': file_hash, 'file_id': None, 'media': path, 'thumbnail': None}
+
+        # Reuse the Telegram file_id if this content was uploaded before.
+        cached_media = self.media_cache.get(file_hash)
+        if cached_media:
+            self.logger.debug(f"Sending {path} by cached file_id.")
+            media.update({'type': cached_media['type'], 'file_id': cached_media['file_id'], 'media': None})
+            return media
+
+        if not os.path.exists(path):
+            raise FetchError(f"{path} is missing, e.g. quarantined by the verifier and not fetched again yet.")
 
         if path.endswith(".webm"):
+            self.convert_video(path)
+            # Use ffmpeg to extract thumbnail from mp4
+            self.processes.ffmpeg(["-y", "-i", path + ".mp4", "-vframes", "1", path + ".jpg"], f"thumbnail of {path}")
+            media.update({'type': 'video', 'media': path + ".mp4", 'thumbnail': path + ".jpg"})
+        elif path.endswith(".mp4"):
+            # Native mp4 file. Extract thumbnail and send as video.
+            self.processes.ffmpeg(["-y", "-i", path, "-vframes", "1", path + ".jpg"], f"thumbnail of {path}")
+            media.update({'type': 'video', 'thumbnail': path + ".jpg"})
+        else:
+            # Ensure image filesize and dimensions are compatible with Telegram API
+            resized = self.resize_image(path)
+            if resized is None:
+                self.logger.warning(f"Image {path} has invalid dimensions and cannot be sent. Removing from queue.")
+                self.telegram.send_message(
+                    f"⚠️ Image removed from queue (invalid dimensions):\n`{image['path']}`"
+                )
+                return None
+            media.update({'type': 'photo', 'media': resized})
+        return media
+
+    def convert_video(self, path: str):
+        """
+        Converts a webm file to mp4, unless a finished conversion already exists.
+
+        Args:
+            path (str): The path to the webm file. The mp4 is written next to it.
+
+        Raises:
+            ProcessError: If ffmpeg fails, or runs out of time.
+
+        Note:
+            ffmpeg writes to a temporary file that is renamed when complete, so an
+            existing mp4 is never a partial conversion.
+        """
+        # Channels share the file, so only one of them converts it.
+        with self.blobs.file_lock(os.path.basename(path)):
+            if os.path.exists(path + ".mp4"):
+                return
+            # Use ffmpeg to convert webm to mp4
             try:
-                os.remove(path + ".mp4")
-            except OSError as e:
-                self.logger.error(f"Could not delete file {path + '.mp4'}: {e}")
+                self.processes.ffmpeg(["-y", "-i", path, "-c:v", "libx264", "-c:a", "aac", "-strict", "experimental",
+                                       path + ".part.mp4"], f"conversion of {path}")
+            except Exception:
+                with contextlib.suppress(OSError):
+                    os.remove(path + ".part.mp4")
+                raise
+            os.replace(path + ".part.mp4", path + ".mp4")
 
-        try:
-            self.queue_data['queue'].pop(index)
-        except IndexError as e:
-            self.logger.error(f"Could not remove image from queue: {e}")
+    def resize_image(self, path: str) -> t.Optional[str]:
+        """
+        Returns the path of a version of an image that Telegram accepts.
 
-        self.queue_loaded = False
+        Args:
+            path (str): The path to the stored image.
+
+        Returns:
+            str: The stored image, or a resized copy of it, or None if the image cannot be sent.
+
+        Note:
+            The stored image is never changed, so it keeps matching its hash. The
+            resized copy is written next to it, once, and deleted with it.
+        """
+        ext = os.path.splitext(path)[1]
+        resized, partial = path + ".resized" + ext, path + ".resized.part" + ext
+        with self.blobs.file_lock(os.path.basename(path)):
+            if os.path.exists(resized):
+                return resized
+            if not self.telegram.reduce_image_size(path, partial):
+                with contextlib.suppress(OSError):
+                    os.remove(partial)
+                return None
+            if not os.path.exists(partial):
+                # Small enough already.
+                return path
+            os.replace(partial, resized)
+        return resized
+
+    def warm_upcoming(self):
+        """
+        Prepares the planned files ahead of their turn.
+
+        Renders captions and keyboards (including dead-link checks), converts videos
+        and resizes images, so posting them later does little more than upload.
+        A render whose links were checked more than 'link_check_ttl' seconds ago is
+        rendered again.
+
+        Note:
+            Each step holds only the lock of the file it prepares, so posting waits
+            at most for one step on the file it is about to send.
+        """
+        with self.mutation():
+            images = self.plan.peek()
+        for image in images:
+            path = "queue/" + image['path']
+            try:
+                with self.blobs.file_lock(image['path']):
+                    # Files wait a while between ingest and their post. Check their links again.
+                    self.telegram.get_rendered(image, self.config.link_check_ttl)
+                if path.endswith(".webm"):
+                    self.convert_video(path)
+                elif not path.endswith(".mp4") and not self.media_cache.get(image['path'].rsplit('.', 1)[0]):
+                    self.resize_image(path)
+            except Exception as e:
+                self.logger.warning(f"Could not prepare {path} ahead of time: {e}")
         self.save_queue()
 
-        # Send queue size update to terminal.
-        self.logger.info("Queued images remaining: " + str(len(self.queue_data['queue'])))
+    def finish_media(self, image: dict, media: dict, sent_message: t.Optional[dict]):
+        """
+        Cleans up after a send attempt and dequeues the image if it was sent.
+
+        Args:
+            image (dict): The queue entry that was sent.
+            media (dict): The prepared media returned by prepare_media().
+            sent_message (dict): The Telegram message for the image, or None if it failed.
+        """
+        if media['thumbnail'] and os.path.exists(media['thumbnail']):
+            os.remove(media['thumbnail'])
+
+        # Only delete the image from disk and queue if it was sent successfully.
+        if sent_message is not None:
+            bytes_sent = 0
+            if not media['file_id']:
+                self.media_cache.remember(media['hash'], media['type'], sent_message)
+                with contextlib.suppress(OSError):
+                    bytes_sent = os.path.getsize(media['media'])
+            self.ledger.record(media['hash'], self.config.telegram_channel, sent_message.get('message_id'), bytes_sent)
+            self.delete_image(image)
+        else:
+            if media['file_id']:
+                # The file_id may have expired. Upload the blob again on the next attempt.
+                self.media_cache.forget(media['hash'])
+            # Let the rest of the plan go first.
+            with self.mutation():
+                self.plan.defer(image['path'])
+            self.logger.warning(f"Keeping {media['path']} in queue due to send failure.")
+
+    def keep_missing(self, image: dict, error: FetchError):
+        """
+        Keeps an image whose stored file is missing in the queue, behind the rest of the plan.
+
+        The verifier fetches the file from Hydrus again on its next pass.
+
+        Args:
+            image (dict): The queue entry.
+            error (FetchError): The error prepare_media() raised.
+        """
+        with self.mutation():
+            self.plan.defer(image['path'])
+        self.logger.warning(f"{error} Keeping it in queue.")
+
+    def post_image(self, image: dict, media: t.Optional[dict] = None):
+        """
+        Posts a single queued image to Telegram.
+
+        Args:
+            image (dict): The queue entry to post.
+            media (dict, optional): The already prepared media for the entry.
+
+        Note:
+            With a local Bot API server, the file is passed by its file:// URI rather than uploaded.
+        """
+        try:
+            media = media or self.prepare_media(image)
+        except FetchError as e:
+            self.keep_missing(image, e)
+            return
+        if media is None:
+            self.delete_image(image)
+            return
+
+        channel = str(self.config.telegram_channel)
+        media_param = ''
+        with contextlib.ExitStack() as stack:
+            # Hold the file while it is sent, so the verifier does not move it aside mid-upload.
+            stack.enter_context(self.blobs.file_lock(image['path']))
+            if media['file_id']:
+                telegram_file = {}
+                media_param = f"&{media['type']}={urllib.parse.quote(media['file_id'])}"
+            elif self.telegram.local_mode:
+                # A local Bot API server reads the file from disk. Nothing is uploaded.
+                telegram_file = {}
+                media_param = f"&{media['type']}={urllib.parse.quote(self.telegram.local_media_uri(media['media']), safe='')}"
+                if media['thumbnail']:
+                    media_param += f"&thumbnail={urllib.parse.quote(self.telegram.local_media_uri(media['thumbnail']), safe='')}"
+            else:
+                telegram_file = {media['type']: stack.enter_context(open(media['media'], 'rb'))}
+                if media['thumbnail']:
+                    telegram_file['thumbnail'] = stack.enter_context(open(media['thumbnail'], 'rb'))
+            api_method = 'sendVideo' if media['type'] == 'video' else 'sendPhoto'
+
+            # Build Telegram bot API URL.
+            message = self.telegram.get_message_markup(image)
+            request = self.telegram.build_telegram_api_url(api_method, '?chat_id=' + channel + media_param + message + '&parse_mode=html', False)
+
+            # Post the image to Telegram.
+            sent_message = self.telegram.send_image(request, telegram_file, media['path'])
+
+        self.finish_media(image, media, sent_message)
+
+    def post_album(self, images: list):
+        """
+        Posts several queued images to Telegram as a single album.
+
+        Each image keeps its own caption. Albums cannot carry inline keyboards, so
+        source links are written into the caption instead. Only the images Telegram
+        returned a message for are removed from the queue.
+
+        Args:
+            images (list): The queue entries to post.
+        """
+        prepared = []
+        for image in images:
+            try:
+                media = self.prepare_media(image)
+            except FetchError as e:
+                self.keep_missing(image, e)
+                continue
+            if media is None:
+                self.delete_image(image)
+            else:
+                prepared.append((image, media))
+
+        if not prepared:
+            return
+        if len(prepared) == 1:
+            # Albums need at least two items. Post the remaining image on its own.
+            self.post_image(*prepared[0])
+            return
+
+        media_group = []
+        with contextlib.ExitStack() as stack:
+            for filename in sorted({image['path'] for image, _ in prepared}):
+                stack.enter_context(self.blobs.file_lock(filename))
+            telegram_files = {}
+            for n, (image, media) in enumerate(prepared):
+                item = {
+                    'type': media['type'],
+                    'caption': self.telegram.get_rendered(image)['album_caption'],
+                    'parse_mode': 'html'
+                }
+                if media['file_id']:
+                    item['media'] = media['file_id']
+                elif self.telegram.local_mode:
+                    item['media'] = self.telegram.local_media_uri(media['media'])
+                    if media['thumbnail']:
+                        item['thumbnail'] = self.telegram.local_media_uri(media['thumbnail'])
+                else:
+                    telegram_files[f"file{n}"] = stack.enter_context(open(media['media'], 'rb'))
+                    item['media'] = f"attach://file{n}"
+                    if media['thumbnail']:
+                        telegram_files[f"thumb{n}"] = stack.enter_context(open(media['thumbnail'], 'rb'))
+                        item['thumbnail'] = f"attach://thumb{n}"
+                media_group.append(item)
+
+            request = self.telegram.build_telegram_api_url('sendMediaGroup', '', False)
+            data = {'chat_id': str(self.config.telegram_channel), 'media': json.dumps(media_group)}
+            sent_messages = self.telegram.send_image(request, telegram_files, f"album of {len(prepared)}", data=data)
+
+        if not isinstance(sent_messages, list):
+            sent_messages = []
+        for n, (image, media) in enumerate(prepared):
+            sent_message = sent_messages[n] if n < len(sent_messages) else None
+            self.finish_media(image, media, sent_message)
 
     def process_queue(self):
         """
-        Processes the queue by posting an image to Telegram.
+        Processes the queue by posting an image, or an album of images, to Telegram.
 
         This method:
         1. Loads the queue data
-        2. Selects a random image
+        2. Takes the next images (post_batch_size of them) from the posting plan
         3. Converts webm to mp4 if needed
-        4. Posts the image to Telegram
-        5. Deletes the image from queue and disk
+        4. Posts the images to Telegram
+        5. Deletes the sent images from queue and disk
 
         Raises:
             Exception: If an error occurs while processing the queue.
@@ -375,6 +1018,9 @@ class QueueManager:
         Note:
             The method handles both image and video files, with special
             processing for webm files including thumbnail generation.
+            The files that are up next are prepared separately, by prepare_upcoming().
+            Nothing is posted while the Telegram circuit breaker is open. Once its
+            cooldown has passed, the breaker probes Telegram and posting resumes.
         """
         # Post next image to Telegram and remove it from the queue.
         self.logger.debug("Processing next image in queue.")
@@ -383,68 +1029,25 @@ class QueueManager:
         if not self.queue_data or "queue" not in self.queue_data:
             self.logger.error("Queue data is missing or invalid.")
             return
-        if not self.queue_data["queue"]:
-            self.logger.warning("Queue is empty.")
-            self.telegram.send_message("Queue is empty.")
+        if not self.snapshot().entries:
+            message = "Queue is empty." if self.channel == 'default' else f"Queue for {self.channel} is empty."
+            self.logger.warning(message)
+            self.telegram.send_message(message)
             return
 
-        # Select a random image from the queue
-        random_index = random.randint(0, len(self.queue_data['queue']) - 1)
-        current_queued_image = self.queue_data['queue'][random_index]
-        path = "queue/" + current_queued_image['path']
-
-        channel = str(self.config.telegram_channel)
-
-        # Determine media type and prepare files for sending.
-        thumb_file = None
-        media_file = None
-        try:
-            if path.endswith(".webm"):
-                # Use ffmpeg to convert webm to mp4
-                subprocess.run(["ffmpeg", "-y", "-i", path, "-c:v", "libx264", "-c:a", "aac", "-strict", "experimental", path + ".mp4"], check=True)
-                # Use ffmpeg to extract thumbnail from mp4
-                subprocess.run(["ffmpeg", "-y", "-i", path + ".mp4", "-vframes", "1", path + ".jpg"], check=True)
-                thumb_file = open(path + ".jpg", 'rb')
-                media_file = open(path + ".mp4", 'rb')
-                telegram_file = {'video': media_file, 'thumbnail': thumb_file}
-                api_method = 'sendVideo'
-            elif path.endswith(".mp4"):
-                # Native mp4 file. Extract thumbnail and send as video.
-                subprocess.run(["ffmpeg", "-y", "-i", path, "-vframes", "1", path + ".jpg"], check=True)
-                thumb_file = open(path + ".jpg", 'rb')
-                media_file = open(path, 'rb')
-                telegram_file = {'video': media_file, 'thumbnail': thumb_file}
-                api_method = 'sendVideo'
-            else:
-                # Ensure image filesize and dimensions are compatible with Telegram API
-                if not self.telegram.reduce_image_size(path):
-                    self.logger.warning(f"Image {path} has invalid dimensions and cannot be sent. Removing from queue.")
-                    self.telegram.send_message(
-                        f"⚠️ Image removed from queue (invalid dimensions):\n`{current_queued_image['path']}`"
-                    )
-                    self.delete_from_queue(path, random_index)
-                    return
-                media_file = open(path, 'rb')
-                telegram_file = {'photo': media_file}
-                api_method = 'sendPhoto'
-
-            # Build Telegram bot API URL.
-            message = self.telegram.get_message_markup(current_queued_image)
-            request = self.telegram.build_telegram_api_url(api_method, '?chat_id=' + str(channel) + message + '&parse_mode=html', False)
-
-            # Post the image to Telegram.
-            success = self.telegram.send_image(request, telegram_file, path)
-        finally:
-            if media_file is not None:
-                media_file.close()
-            if thumb_file is not None:
-                thumb_file.close()
+        breaker = getattr(self.telegram, 'breaker', None)
+        if breaker and not breaker.allow():
+            # Keep the files queued until Telegram recovers. After the cooldown,
+            # allow() probes Telegram and closes the breaker if it answers.
+            self.logger.info("Telegram has been failing. Skipping this post.")
+            return
 
-        if api_method == 'sendVideo' and os.path.exists(path + ".jpg"):
-            os.remove(path + ".jpg")
+        with self.post_lock:
+            with self.mutation():
+                images = self.plan.peek(self.config.post_batch_size)
+            if len(images) > 1:
+                # Post several images together.
+                self.post_album(images)
+            elif images:
+                self.post_image(images[0])
 
-        # Only delete the image from disk and queue if it was sent successfully.
-        if success:
-            self.delete_from_queue(path, random_index)
-        else:
-            self.logger.warning(f"Keeping {path} in queue due to send failure.")
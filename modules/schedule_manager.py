@@ -1,19 +1,81 @@
-import sched
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import math
+import threading
 import time
+import typing as t
 from modules.log_manager import LogManager
 
+MINUTES_PER_DAY = 24 * 60
+# Delays that divide a day evenly, so aligned updates fall on the same times every day.
+DAY_DIVISORS = tuple(minutes for minutes in range(1, MINUTES_PER_DAY + 1) if MINUTES_PER_DAY % minutes == 0)
+
+
+def align_delay(minutes: float, min_delay: int = 1, max_delay: int = MINUTES_PER_DAY) -> int:
+    """
+    Rounds a delay down to one that stays aligned to wall-clock boundaries.
+
+    Delays under a day become a divisor of a day, e.g. 50 minutes becomes 48. Longer
+    delays become whole days.
+
+    Args:
+        minutes (float): The wanted delay in minutes.
+        min_delay (int): The shortest allowed delay in minutes.
+        max_delay (int): The longest allowed delay in minutes.
+
+    Returns:
+        int: The aligned delay in minutes.
+    """
+    max_delay = max(min_delay, max_delay)
+    minutes = max(min_delay, min(max_delay, minutes))
+    if minutes >= MINUTES_PER_DAY:
+        return MINUTES_PER_DAY * int(minutes // MINUTES_PER_DAY)
+    aligned = max(divisor for divisor in DAY_DIVISORS if divisor <= minutes)
+    if aligned < min_delay:
+        # Rounding down went below the minimum. Round up instead, as far as the maximum allows.
+        allowed = [divisor for divisor in DAY_DIVISORS if min_delay <= divisor <= max_delay]
+        aligned = allowed[0] if allowed else int(min_delay)
+    return aligned
+
+
+@dataclass(order=True)
+class ScheduledJob:
+    """
+    A callback due at a point in time.
+
+    Jobs are ordered by due time, then by the order they were scheduled in.
+    """
+
+    time: float
+    sequence: int
+    name: t.Optional[str] = field(compare=False)
+    callback: t.Callable = field(compare=False, repr=False)
+    args: tuple = field(compare=False, default=())
+    cancelled: bool = field(compare=False, default=False)
+
+
 class ScheduleManager:
     """
     Manages scheduled updates for the bot at specified intervals.
 
     This class provides a scheduling system that allows the bot to perform
-    updates at regular intervals. It uses Python's built-in sched module
-    for scheduling and includes timezone support for accurate scheduling.
+    updates at regular intervals, with timezone support for accurate scheduling.
+    Jobs are kept in a heap ordered by due time. run() sleeps on a condition variable
+    until the earliest job is due, and is woken at once when a job is scheduled,
+    cancelled or triggered, or when the scheduler is stopped.
+
+    Jobs may be named, e.g. 'ingest:default' or 'post:art', so independent kinds of
+    work can keep their own cadence. Scheduling a named job replaces any pending job
+    with that name.
 
     Attributes:
         timezone (int): The timezone offset in hours from UTC.
         delay (int): The delay between updates in minutes.
-        scheduler (sched.scheduler): The scheduler instance.
+        jobs (list[ScheduledJob]): The heap of pending jobs.
+        named_jobs (dict): The pending job for each name.
+        condition (threading.Condition): Guards the jobs and wakes run().
+        stopped (bool): Whether stop() was called.
         logger (Logger): The logger instance for this class.
 
     Example:
@@ -33,16 +95,20 @@ class ScheduleManager:
                         This determines how often the scheduled callback will run.
 
         Note:
-            The scheduler uses the system's time.time() function for timing
-            and time.sleep() for waiting between checks.
+            The scheduler uses the system's time.time() function for timing, so
+            updates stay aligned to wall-clock boundaries.
         """
         self.logger = LogManager.setup_logger('SCH')
         self.timezone = timezone
         self.delay = delay
-        self.scheduler = sched.scheduler(time.time, time.sleep)
+        self.jobs = []
+        self.named_jobs = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.stopped = False
         self.logger.debug('Scheduler Module initialized.')
 
-    def get_next_update_time(self) -> float:
+    def get_next_update_time(self, delay: t.Optional[int] = None) -> float:
         """
         Calculates the next scheduled update time.
 
@@ -50,6 +116,9 @@ class ScheduleManager:
         timezone offset, and delay. It ensures updates occur at regular intervals
         aligned with the specified timezone.
 
+        Args:
+            delay (int, optional): The delay between updates in minutes. Defaults to 'delay'.
+
         Returns:
             float: The Unix timestamp for the next scheduled update.
 
@@ -58,10 +127,36 @@ class ScheduleManager:
             >>> next_time = scheduler.get_next_update_time()
             >>> print(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(next_time)))
         """
+        delay = delay or self.delay
         current_time = (time.time() + ((60 * 60) * self.timezone))
-        return (current_time - (current_time % (self.delay * 60))) + (self.delay * 60)
+        return (current_time - (current_time % (delay * 60))) + (delay * 60)
+
+    def schedule_at(self, when: float, callback: t.Callable, args: tuple = (), name: t.Optional[str] = None) -> ScheduledJob:
+        """
+        Schedules a callback at a point in time.
+
+        Args:
+            when (float): The Unix timestamp to run the callback at.
+            callback (callable): The function to call.
+            args (tuple): The arguments to call the callback with.
+            name (str, optional): The job's name. A pending job with the same name is replaced.
+
+        Returns:
+            ScheduledJob: The scheduled job, which can be passed to cancel().
+        """
+        with self.condition:
+            if name is not None:
+                self._cancel(self.named_jobs.get(name))
+            job = ScheduledJob(when, next(self.sequence), name, callback, args)
+            heapq.heappush(self.jobs, job)
+            if name is not None:
+                self.named_jobs[name] = job
+            # Wake run() in case the new job is due before the one it is waiting for.
+            self.condition.notify_all()
+        return job
 
-    def schedule_update(self, callback: callable):
+    def schedule_update(self, callback: callable, delay: t.Optional[int] = None, args: tuple = (),
+                        name: t.Optional[str] = None) -> ScheduledJob:
         """
         Schedules the next update using the provided callback function.
 
@@ -70,36 +165,162 @@ class ScheduleManager:
 
         Args:
             callback (callable): The function to call when the update is scheduled.
-                               This function should not take any arguments.
+            delay (int, optional): The delay between updates in minutes. Defaults to 'delay'.
+                                   Lets each channel keep its own cadence on one scheduler.
+            args (tuple): The arguments to call the callback with.
+            name (str, optional): The job's name. A pending job with the same name is replaced.
+
+        Returns:
+            ScheduledJob: The scheduled job.
 
         Note:
-            The callback function will be called with no arguments when the
+            The callback function will be called with 'args' when the
             scheduled time is reached.
         """
-        next_time = self.get_next_update_time() - (3600 * self.timezone)
-        self.logger.info(f"Next update scheduled for {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(next_time))}.")
-        self.scheduler.enterabs(next_time, 1, callback, ())
+        next_time = self.get_next_update_time(delay) - (3600 * self.timezone)
+        self.logger.info(f"Next {name or 'update'} scheduled for {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(next_time))}.")
+        return self.schedule_at(next_time, callback, args, name)
+
+    def _cancel(self, job: t.Optional[ScheduledJob]):
+        # Cancelled jobs stay in the heap and are skipped when they reach the top.
+        if job is None or job.cancelled:
+            return
+        job.cancelled = True
+        if job.name is not None and self.named_jobs.get(job.name) is job:
+            del self.named_jobs[job.name]
+
+    def cancel(self, job_or_name: t.Union[ScheduledJob, str]) -> bool:
+        """
+        Cancels a pending job.
+
+        Args:
+            job_or_name (ScheduledJob | str): The job, or its name.
+
+        Returns:
+            bool: True if a pending job was cancelled.
+        """
+        with self.condition:
+            job = self.named_jobs.get(job_or_name) if isinstance(job_or_name, str) else job_or_name
+            if job is None or job.cancelled:
+                return False
+            self._cancel(job)
+            self.condition.notify_all()
+        return True
+
+    def trigger(self, name: str) -> bool:
+        """
+        Runs a pending named job now instead of at its due time, e.g. to post now.
+
+        Args:
+            name (str): The job's name.
+
+        Returns:
+            bool: True if a pending job was found.
+        """
+        with self.condition:
+            job = self.named_jobs.get(name)
+            if job is None:
+                return False
+            self.schedule_at(time.time(), job.callback, job.args, name)
+        return True
+
+    def pending(self) -> t.List[ScheduledJob]:
+        """
+        Returns the pending jobs, earliest first.
+        """
+        with self.condition:
+            return sorted(job for job in self.jobs if not job.cancelled)
+
+    def stop(self):
+        """
+        Stops run() at once, without waiting for the next job.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def _next_due_job(self) -> t.Optional[ScheduledJob]:
+        """
+        Waits until a job is due and removes it from the heap.
+
+        Returns:
+            ScheduledJob: The due job, or None once the scheduler is stopped.
+        """
+        with self.condition:
+            while not self.stopped:
+                while self.jobs and self.jobs[0].cancelled:
+                    heapq.heappop(self.jobs)
+                if not self.jobs:
+                    self.condition.wait()
+                    continue
+                remaining = self.jobs[0].time - time.time()
+                if remaining > 0:
+                    # Sleep exactly until the deadline, unless woken by a change first.
+                    self.condition.wait(remaining)
+                    continue
+                job = heapq.heappop(self.jobs)
+                if job.name is not None and self.named_jobs.get(job.name) is job:
+                    del self.named_jobs[job.name]
+                return job
+        return None
+
+    @staticmethod
+    def get_adaptive_delay(queue_depth: int, ingest_per_day: float, batch_size: int, min_delay: int,
+                           max_delay: int, target_days: float) -> int:
+        """
+        Calculates the delay between updates from the queue depth and ingest rate.
+
+        The bot posts fast enough to keep up with new files and to work through the
+        files already queued in 'target_days'. A large batch tagged in Hydrus therefore
+        speeds posting up, and a nearly empty queue slows it down, rather than posting
+        a burst and going quiet.
+
+        Args:
+            queue_depth (int): The number of queued files.
+            ingest_per_day (float): The number of files queued per day, recently.
+            batch_size (int): The number of files posted per update.
+            min_delay (int): The shortest delay in minutes.
+            max_delay (int): The longest delay in minutes.
+            target_days (float): The number of days the queued files should last.
+
+        Returns:
+            int: The delay in minutes, aligned by align_delay().
+
+        Example:
+            >>> ScheduleManager.get_adaptive_delay(140, 0, 1, 15, 1440, 14)
+            144
+        """
+        posts_per_day = queue_depth / target_days + ingest_per_day
+        if posts_per_day <= 0:
+            return align_delay(max_delay, min_delay, max_delay)
+        minutes = MINUTES_PER_DAY * max(1, batch_size) / posts_per_day
+        return align_delay(minutes if math.isfinite(minutes) else max_delay, min_delay, max_delay)
 
     def run(self):
         """
-        Runs the scheduler indefinitely until interrupted.
+        Runs the scheduler until stopped or interrupted.
 
-        This method enters an infinite loop that:
-        1. Runs any pending scheduled events
-        2. Sleeps for 5 seconds
-        3. Repeats until interrupted
+        This method repeatedly:
+        1. Sleeps until the earliest job is due, or until woken by a change
+        2. Runs the due job
 
-        The scheduler can be interrupted by a KeyboardInterrupt (Ctrl+C),
-        at which point it will log the exit and break the loop.
+        The scheduler can be stopped with stop() or interrupted by a KeyboardInterrupt
+        (Ctrl+C), at which point it will log the exit and return. An error raised by a
+        job is logged and does not stop the scheduler.
 
         Note:
-            This method blocks the current thread until interrupted.
+            This method blocks the current thread until stopped.
             It should typically be run in the main thread of the application.
         """
         while True:
             try:
-                self.scheduler.run(blocking=False)
-                time.sleep(5)
+                job = self._next_due_job()
+                if job is None:
+                    break
+                try:
+                    job.callback(*job.args)
+                except Exception as e:
+                    self.logger.error(f"Scheduled job {job.name or job.callback} failed: {e}")
             except KeyboardInterrupt:
-                self.logger.info("Exiting...")
-                break
\ No newline at end of file
+                break
+        self.logger.info("Exiting...")
@@ -0,0 +1,402 @@
+from modules.log_manager import LogManager
+import collections
+import random
+import time
+import typing as t
+
+class WeightedSampler:
+    """
+    A set of keys with weights, supporting weighted random draws.
+
+    Weights are kept in a Fenwick (binary indexed) tree over insertion-ordered slots,
+    so adding, removing or re-weighting a key and drawing a key are all O(log n).
+    Removed keys leave an empty slot until more than half the slots are empty, when
+    the tree is rebuilt in O(n).
+
+    Attributes:
+        keys (list): The key in each slot, or None for an empty slot.
+        weights (list): The weight of each slot.
+        positions (dict): The slot of each key.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.weights = []
+        self.tree = [0.0]
+        self.positions = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, key) -> bool:
+        return key in self.positions
+
+    def _add_to_tree(self, slot: int, delta: float):
+        index = slot + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def _rebuild(self):
+        """
+        Drops empty slots and rebuilds the tree in O(n).
+        """
+        live = [(key, weight) for key, weight in zip(self.keys, self.weights) if key is not None]
+        self.keys = [key for key, _ in live]
+        self.weights = [weight for _, weight in live]
+        self.positions = {key: slot for slot, key in enumerate(self.keys)}
+        self.tree = [0.0] + self.weights[:]
+        for index in range(1, len(self.tree)):
+            parent = index + (index & -index)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[index]
+
+    def add(self, key, weight: float = 1.0):
+        """
+        Adds a key, or re-weights it if it is already present.
+        """
+        if key in self.positions:
+            self.update(key, weight)
+            return
+        slot = len(self.keys)
+        self.keys.append(key)
+        self.weights.append(0.0)
+        self.positions[key] = slot
+        # The new tree node covers the slots below it. Seed it with their sum.
+        index = slot + 1
+        lowest = index - (index & -index)
+        self.tree.append(self.prefix_sum(index - 1) - self.prefix_sum(lowest))
+        self.update(key, weight)
+
+    def extend(self, items: t.Iterable[t.Tuple[t.Any, float]]):
+        """
+        Adds many new keys at once, rebuilding the tree in O(n) rather than O(n log n).
+
+        Args:
+            items (Iterable[tuple]): (key, weight) pairs. Keys must not be present already.
+        """
+        for key, weight in items:
+            self.keys.append(key)
+            self.weights.append(weight)
+        self._rebuild()
+
+    def update(self, key, weight: float):
+        """
+        Changes the weight of a key.
+        """
+        slot = self.positions[key]
+        self._add_to_tree(slot, weight - self.weights[slot])
+        self.weights[slot] = weight
+
+    def remove(self, key):
+        """
+        Removes a key. Does nothing if it is not present.
+        """
+        slot = self.positions.pop(key, None)
+        if slot is None:
+            return
+        self._add_to_tree(slot, -self.weights[slot])
+        self.weights[slot] = 0.0
+        self.keys[slot] = None
+        if len(self.positions) * 2 < len(self.keys):
+            self._rebuild()
+
+    def weight(self, key) -> float:
+        return self.weights[self.positions[key]]
+
+    def prefix_sum(self, count: int) -> float:
+        """
+        Returns the total weight of the first 'count' slots.
+        """
+        total = 0.0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    @property
+    def total(self) -> float:
+        return self.prefix_sum(len(self.keys))
+
+    def find(self, target: float):
+        """
+        Returns the key of the first slot whose cumulative weight exceeds 'target'.
+
+        Args:
+            target (float): A value in [0, total).
+
+        Returns:
+            Any: The key, or None if the sampler is empty or every weight is zero.
+        """
+        index = 0
+        step = 1 << (len(self.keys).bit_length())
+        while step:
+            next_index = index + step
+            if next_index < len(self.tree) and self.tree[next_index] <= target:
+                index = next_index
+                target -= self.tree[next_index]
+            step >>= 1
+        # Skip zero-weight slots that floating point rounding may land on.
+        while index < len(self.keys) and (self.keys[index] is None or self.weights[index] <= 0):
+            index += 1
+        return self.keys[index] if index < len(self.keys) else None
+
+    def first(self):
+        """
+        Returns the oldest key with a positive weight, or None.
+        """
+        return self.find(0.0)
+
+    def sample(self, rng: random.Random):
+        """
+        Draws a key with probability proportional to its weight.
+
+        Returns:
+            Any: The key, or None if the sampler is empty or every weight is zero.
+        """
+        total = self.total
+        if total <= 0:
+            return None
+        return self.find(rng.random() * total)
+
+
+def creator_of(entry) -> str:
+    """
+    Returns the key used to group a queue entry by creator.
+
+    Args:
+        entry (QueueEntry | dict): The queue entry.
+
+    Returns:
+        str: The entry's first creator tag (or rendered creator), or '' if it has none.
+    """
+    creator_tags = getattr(entry, 'creator_tags', None)
+    if creator_tags:
+        return creator_tags[0]
+    creator = entry.get('creator')
+    return creator.split('\n', 1)[0] if creator else ''
+
+
+class SelectionManager:
+    """
+    Chooses which queued files to post next.
+
+    Strategies:
+        uniform: Every queued file is equally likely.
+        fifo:    Files are posted in the order they were queued.
+        age:     Files are drawn with weight doubling for every 'selection_age_half_life'
+                 hours they have waited, so old files are not starved.
+        creator: Every creator with queued files is equally likely, and creators posted
+                 within the last 'selection_creator_window' posts are down-weighted by
+                 'selection_creator_penalty' per recent post. A file is then drawn
+                 uniformly from the chosen creator's files. A bulk import from one
+                 artist therefore gets one creator's share, not one share per file.
+
+    The manager is kept in step with the queue through add(), remove() and posted(),
+    so a draw never scans the queue.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        config (ConfigModel): The bot's configuration settings.
+        strategy (str): The configured strategy.
+        rng (random.Random): The random number generator used for draws.
+        entries (dict): The queued entries, keyed by path.
+        sampler (WeightedSampler): The per-file weights (uniform, fifo and age).
+        creators (WeightedSampler): The per-creator weights (creator).
+        members (dict): The list of paths queued for each creator (creator).
+        recent (deque): The creators of the most recent posts (creator).
+
+    Example:
+        >>> selector = SelectionManager(config)
+        >>> selector.rebuild(queue_data['queue'])
+        >>> selector.select(1)
+        [QueueEntry(hash='...', ...)]
+    """
+
+    strategies = ('uniform', 'fifo', 'age', 'creator')
+
+    def __init__(self, config, rng: t.Optional[random.Random] = None):
+        """
+        Initializes the SelectionManager.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+            rng (random.Random, optional): The random number generator to draw with.
+        """
+        self.logger = LogManager.setup_logger('SEL')
+        self.config = config.config_data
+        self.strategy = self.config.selection_strategy
+        self.rng = rng or random.Random()
+        self.reference_time = time.time()
+        self.recent = collections.deque(maxlen=max(1, self.config.selection_creator_window))
+        self.clear()
+        self.logger.debug('Selection Module initialized.')
+
+    def clear(self):
+        """
+        Forgets every queued entry. Recent creators are kept.
+        """
+        self.entries = {}
+        self.sampler = WeightedSampler()
+        self.creators = WeightedSampler()
+        self.members = {}
+        self.member_positions = {}
+
+    def rebuild(self, entries: t.Iterable):
+        """
+        Replaces the tracked entries, e.g. after the queue is loaded from disk.
+
+        Args:
+            entries (Iterable): The queue entries, oldest first.
+        """
+        self.clear()
+        items = []
+        for entry in entries:
+            path = entry['path']
+            if path in self.entries:
+                continue
+            self.entries[path] = entry
+            if self.strategy == 'creator':
+                members = self.members.setdefault(creator_of(entry), [])
+                self.member_positions[path] = len(members)
+                members.append(path)
+            else:
+                items.append((path, self._age_weight(entry) if self.strategy == 'age' else 1.0))
+        if self.strategy == 'creator':
+            items = [(creator, self._creator_weight(creator)) for creator in self.members]
+            self.creators.extend(items)
+        else:
+            self.sampler.extend(items)
+
+    def _age_weight(self, entry) -> float:
+        added = getattr(entry, 'added', 0.0) or self.reference_time
+        exponent = (self.reference_time - added) / (self.config.selection_age_half_life * 3600)
+        # Relative weights do not change as time passes, so they never need updating.
+        return 2.0 ** max(-512.0, min(512.0, exponent))
+
+    def _creator_weight(self, creator: str) -> float:
+        return self.config.selection_creator_penalty ** self.recent.count(creator)
+
+    def add(self, entry):
+        """
+        Starts tracking a queued entry.
+
+        Args:
+            entry (QueueEntry | dict): The queue entry.
+        """
+        path = entry['path']
+        if path in self.entries:
+            return
+        self.entries[path] = entry
+        if self.strategy == 'creator':
+            creator = creator_of(entry)
+            members = self.members.setdefault(creator, [])
+            self.member_positions[path] = len(members)
+            members.append(path)
+            if creator not in self.creators:
+                self.creators.add(creator, self._creator_weight(creator))
+        else:
+            self.sampler.add(path, self._age_weight(entry) if self.strategy == 'age' else 1.0)
+
+    def remove(self, entry_or_path):
+        """
+        Stops tracking an entry, e.g. after it was removed from the queue.
+
+        Args:
+            entry_or_path (QueueEntry | dict | str): The queue entry, or its path.
+        """
+        path = entry_or_path if isinstance(entry_or_path, str) else entry_or_path['path']
+        entry = self.entries.pop(path, None)
+        if entry is None:
+            return
+        if self.strategy == 'creator':
+            creator = creator_of(entry)
+            members = self.members[creator]
+            # Move the last path into the gap so removal is O(1).
+            position = self.member_positions.pop(path)
+            last = members.pop()
+            if last != path:
+                members[position] = last
+                self.member_positions[last] = position
+            if not members:
+                self.members.pop(creator, None)
+                self.creators.remove(creator)
+        else:
+            self.sampler.remove(path)
+
+    def posted(self, entry):
+        """
+        Records that an entry was posted, or scheduled to be, for the creator strategy's
+        recency penalty.
+
+        Args:
+            entry (QueueEntry | dict): The posted queue entry.
+        """
+        if self.strategy != 'creator':
+            return
+        creator = creator_of(entry)
+        dropped = self.recent[0] if len(self.recent) == self.recent.maxlen else None
+        self.recent.append(creator)
+        for changed in {creator, dropped}:
+            if changed is not None and changed in self.creators:
+                self.creators.update(changed, self._creator_weight(changed))
+
+    def _draw(self, taken: dict):
+        """
+        Draws one entry that is not in 'taken'.
+        """
+        if self.strategy == 'creator':
+            creator = self.creators.sample(self.rng)
+            if creator is None:
+                return None
+            members = self.members[creator]
+            while True:
+                path = members[self.rng.randrange(len(members))]
+                if path not in taken:
+                    return path
+        if self.strategy == 'fifo':
+            return self.sampler.first()
+        return self.sampler.sample(self.rng)
+
+    def select(self, count: int = 1, exclude: t.Iterable[str] = ()) -> list:
+        """
+        Chooses the next entries to post.
+
+        Args:
+            count (int): The number of distinct entries to choose.
+            exclude (Iterable[str]): Paths that must not be chosen, e.g. files already planned.
+
+        Returns:
+            list: Up to 'count' queue entries.
+        """
+        taken = dict.fromkeys(path for path in exclude if path in self.entries)
+        chosen = []
+        picked = {}
+        hidden = []
+
+        def hide(path):
+            # Hide a path (or an exhausted creator) so later draws pick something else.
+            if self.strategy == 'creator':
+                creator = creator_of(self.entries[path])
+                picked[creator] = picked.get(creator, 0) + 1
+                if picked[creator] == len(self.members[creator]):
+                    hidden.append((self.creators, creator, self.creators.weight(creator)))
+                    self.creators.update(creator, 0.0)
+            else:
+                hidden.append((self.sampler, path, self.sampler.weight(path)))
+                self.sampler.update(path, 0.0)
+
+        try:
+            for path in taken:
+                hide(path)
+            while len(chosen) < count and len(taken) < len(self.entries):
+                path = self._draw(taken)
+                if path is None:
+                    break
+                taken[path] = None
+                chosen.append(path)
+                hide(path)
+        finally:
+            for sampler, key, weight in reversed(hidden):
+                sampler.update(key, weight)
+        return [self.entries[path] for path in chosen]
@@ -0,0 +1,135 @@
+from modules.log_manager import LogManager
+import hydrus_api
+import hydrus_api.utils
+import threading
+import time
+import typing as t
+
+class SessionManager:
+    """
+    Caches what the bot learns about its Hydrus client: whether the access key has
+    the required permissions, and the keys of the tag services.
+
+    The permission check is an API round trip, so its result is kept for 'ttl'
+    seconds rather than repeated on every ingest. Service keys are discovered once,
+    through get_services, the first time one is needed. Both are forgotten when
+    Hydrus refuses the access key (hydrus_api.InsufficientAccess), e.g. after the
+    key's permissions were changed, so the next check asks Hydrus again.
+
+    Attributes:
+        client (hydrus_api.Client): The Hydrus API client.
+        permissions (tuple): The permissions the access key needs.
+        ttl (float): How long a successful permission check is trusted, in seconds.
+        default_keys (dict): The service keys to use when discovery finds no service by that name.
+        verified_until (float): When the permission check must be repeated, on the clock.
+        service_keys (dict): The discovered service keys by name, or None until discovered.
+
+    Example:
+        >>> session = SessionManager(client, permissions, 3600, {'my_tags': '6c6f63616c2074616773'})
+        >>> if session.check():
+        ...     key = session.service_key('my_tags')
+    """
+
+    def __init__(self, client, permissions: t.Iterable, ttl: float, default_keys: t.Optional[dict] = None,
+                 clock: t.Callable[[], float] = time.monotonic):
+        self.logger = LogManager.setup_logger('SES')
+        self.client = client
+        self.permissions = tuple(permissions)
+        self.ttl = ttl
+        self.default_keys = dict(default_keys or {})
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.verified_until = 0.0
+        self.service_keys = None
+
+    def check(self) -> bool:
+        """
+        Checks that the access key has the required permissions, asking Hydrus at most once per TTL.
+
+        Returns:
+            bool: True if the permissions are granted.
+
+        Raises:
+            hydrus_api.HydrusAPIException: If Hydrus cannot be asked.
+        """
+        with self.lock:
+            if self.clock() < self.verified_until:
+                return True
+        try:
+            granted = hydrus_api.utils.verify_permissions(self.client, self.permissions)
+        except hydrus_api.InsufficientAccess:
+            self.invalidate()
+            raise
+        if granted:
+            with self.lock:
+                self.verified_until = self.clock() + self.ttl
+        return granted
+
+    def service_key(self, name: str) -> t.Optional[str]:
+        """
+        Returns the key of a tag service, discovering the services on first use.
+
+        Args:
+            name (str): The service's name with underscores for spaces, e.g. 'my_tags'.
+
+        Returns:
+            str: The service key, or the default key if Hydrus has no service by that name.
+        """
+        with self.lock:
+            service_keys = self.service_keys
+        if service_keys is None:
+            service_keys = self.discover()
+        return service_keys.get(name, self.default_keys.get(name))
+
+    def discover(self) -> dict:
+        """
+        Asks Hydrus for its services and caches their keys by name.
+
+        Returns:
+            dict: The service keys by name. Empty if Hydrus could not be asked,
+                  in which case discovery is tried again on the next lookup.
+        """
+        try:
+            response = self.client.get_services()
+        except hydrus_api.InsufficientAccess:
+            self.invalidate()
+            raise
+        except hydrus_api.HydrusAPIException as e:
+            self.logger.warning(f"Could not discover the Hydrus services. Using the default keys: {e}")
+            return {}
+        service_keys = self.parse_services(response)
+        with self.lock:
+            self.service_keys = service_keys
+        self.logger.debug(f"Discovered {len(service_keys)} Hydrus service(s).")
+        return service_keys
+
+    @staticmethod
+    def parse_services(response: dict) -> dict:
+        """
+        Maps the service names in a get_services response to their keys.
+
+        Handles both the 'services' mapping of current clients and the lists by
+        service type of older ones. Names are lower-cased, with underscores for spaces.
+        """
+        services = []
+        if isinstance(response.get('services'), dict):
+            services = [dict(service, service_key=key) for key, service in response['services'].items()]
+        else:
+            for value in response.values():
+                if isinstance(value, list):
+                    services.extend(value)
+        service_keys = {}
+        for service in services:
+            if not isinstance(service, dict) or 'name' not in service or 'service_key' not in service:
+                continue
+            service_keys.setdefault(service['name'].lower().replace(' ', '_'), service['service_key'])
+        return service_keys
+
+    def invalidate(self):
+        """
+        Forgets the permission check and the discovered services.
+        """
+        with self.lock:
+            self.verified_until = 0.0
+            self.service_keys = None
+        self.logger.warning("Hydrus refused the access key. Checking permissions and services again.")
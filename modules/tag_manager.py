@@ -0,0 +1,252 @@
+from modules.log_manager import LogManager
+import functools
+import string
+import typing as t
+import urllib.parse
+
+class TagRule:
+    """
+    A compiled namespace -> caption template rule.
+
+    Attributes:
+        namespace (str): The Hydrus tag namespace the rule applies to, e.g. 'creator'.
+        field (str): The caption field the rendered tag is added to.
+        render (callable): Renders the value of a tag (the part after the namespace).
+    """
+
+    __slots__ = ('namespace', 'field', 'render')
+
+    def __init__(self, namespace: str, field: str, render: t.Callable[[str], str]):
+        self.namespace = namespace
+        self.field = field
+        self.render = render
+
+
+def proper_title(text: str) -> str:
+    """
+    Converts text to title case while properly handling apostrophes.
+
+    This function fixes the issue with Python's .title() method which
+    incorrectly capitalizes letters after apostrophes (e.g., "don't" -> "Don'T").
+
+    Args:
+        text (str): The text to convert to title case.
+
+    Returns:
+        str: The text in proper title case.
+    """
+    if not text:
+        return text
+
+    # Split by spaces and handle each word
+    words = text.split()
+    title_words = []
+
+    for word in words:
+        # Handle apostrophes by splitting on them and capitalizing each part
+        if "'" in word:
+            parts = word.split("'")
+            title_parts = []
+            for i, part in enumerate(parts):
+                if part:  # Only capitalize non-empty parts
+                    if i == 0:  # First part gets title case
+                        title_parts.append(part.capitalize())
+                    else:  # Parts after apostrophe stay lowercase
+                        title_parts.append(part.lower())
+            title_words.append("'".join(title_parts))
+        else:
+            # No apostrophe, just capitalize normally
+            title_words.append(word.capitalize())
+
+    return " ".join(title_words)
+
+
+class TagManager:
+    """
+    Renders Hydrus tags into caption markup using configurable templates.
+
+    Rules from the config (namespace -> field/template) are compiled once into a
+    dispatch table keyed by namespace. A file's whole tag list is then rendered in a
+    single pass: each tag costs one dictionary lookup, and each caption field is
+    joined once at the end.
+
+    Templates may use these placeholders:
+        {name}:  The tag value with the rule's 'remove' text dropped, in title case.
+        {query}: The tag value with spaces as underscores, URL-quoted for use in links.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        config (ConfigModel): The bot's configuration settings.
+        rules (dict): The compiled rules, keyed by namespace.
+        fields (tuple): The caption fields, in the order they were configured.
+
+    Example:
+        >>> tags = TagManager(config)
+        >>> tags.render_tags(["creator:some artist (artist)", "title:a series", "meta:ignored"])
+        {'creator': '<a href="https://e621.net/posts?tags=some_artist_%28artist%29">Some Artist</a>', 'title': 'A Series'}
+    """
+
+    # Rendered values kept per rule. Creators and characters recur across files.
+    render_cache_size = 4096
+
+    def __init__(self, config):
+        """
+        Initializes the TagManager and compiles the configured tag rules.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+        """
+        self.logger = LogManager.setup_logger('TAG')
+        self.config = config.config_data
+        self.rules, self.fields = self.compile(self.config.tag_rules)
+        self.logger.debug('Tag Module initialized.')
+
+    @staticmethod
+    def replace_html_entities(text: str) -> str:
+        """
+        Replaces characters that break Telegram's HTML parse mode.
+
+        Args:
+            text (str): The text to clean.
+
+        Returns:
+            str: The cleaned text.
+
+        Note:
+            Chained replace() is several times faster than str.translate() for
+            short strings with non-ASCII replacements.
+        """
+        if '&' in text:
+            text = text.replace("&", "+")
+        if '<' in text:
+            text = text.replace("<", "≺")
+        if '>' in text:
+            text = text.replace(">", "≻")
+        return text
+
+    @classmethod
+    def compile_rule(cls, rule) -> TagRule:
+        """
+        Compiles a single configured rule into a render function.
+
+        The template is split into literal text and placeholders once, and rendered
+        values are memoized, since the same creators and characters recur across files.
+
+        Args:
+            rule (TagRuleModel): The configured rule.
+
+        Returns:
+            TagRule: The compiled rule.
+
+        Raises:
+            ValueError: If the template uses an unknown placeholder.
+        """
+        pieces = []
+        for literal, placeholder, format_spec, conversion in string.Formatter().parse(rule.template):
+            if placeholder is not None and (placeholder not in ('name', 'query') or format_spec or conversion):
+                raise ValueError(f"Unknown placeholder '{{{placeholder}}}' in tag template for '{rule.namespace}'.")
+            pieces.append((literal, placeholder))
+
+        remove = rule.remove
+        ascii_only = rule.ascii_only
+        needs_name = any(placeholder == 'name' for _, placeholder in pieces)
+        needs_query = any(placeholder == 'query' for _, placeholder in pieces)
+        replace_html_entities = cls.replace_html_entities
+        quote = urllib.parse.quote
+
+        @functools.lru_cache(maxsize=cls.render_cache_size)
+        def render(value: str) -> str:
+            value = replace_html_entities(value)
+            values = {None: ''}
+            if needs_name:
+                name = proper_title(value.replace(remove, '') if remove else value)
+                values['name'] = name.encode('ascii', 'ignore').decode('ascii') if ascii_only else name
+            if needs_query:
+                values['query'] = quote(value.replace(' ', '_'))
+            return ''.join([literal + values[placeholder] for literal, placeholder in pieces])
+
+        return TagRule(rule.namespace, rule.field, render)
+
+    @classmethod
+    def compile(cls, rules: list) -> t.Tuple[dict, tuple]:
+        """
+        Compiles the configured rules into a dispatch table.
+
+        Args:
+            rules (list[TagRuleModel]): The configured rules.
+
+        Returns:
+            tuple: The compiled rules keyed by namespace, and the caption fields in order.
+
+        Note:
+            If a namespace is configured more than once, the last rule wins.
+        """
+        compiled = {}
+        fields = []
+        for rule in rules:
+            compiled[rule.namespace] = cls.compile_rule(rule)
+            if rule.field not in fields:
+                fields.append(rule.field)
+        return compiled, tuple(fields)
+
+    def select_tags(self, tags: t.Iterable[str]) -> dict:
+        """
+        Picks out the tags that have a rule, grouped by caption field.
+
+        Args:
+            tags (Iterable[str]): The file's tags, e.g. 'creator:some artist'.
+
+        Returns:
+            dict: The matching tags for each caption field that had any, in their original order.
+        """
+        rules = self.rules
+        parts = {field: [] for field in self.fields}
+        for tag in tags:
+            namespace, separator, value = tag.partition(':')
+            if not separator:
+                continue
+            rule = rules.get(namespace)
+            if rule is not None:
+                parts[rule.field].append(tag)
+        return {field: selected for field, selected in parts.items() if selected}
+
+    def render_field(self, tags: t.Iterable[str]) -> str:
+        """
+        Renders tags selected for one caption field, one tag per line.
+
+        Args:
+            tags (Iterable[str]): Tags returned by select_tags() for a single field.
+
+        Returns:
+            str: The rendered markup.
+        """
+        rules = self.rules
+        lines = []
+        for tag in tags:
+            namespace, _, value = tag.partition(':')
+            rule = rules.get(namespace)
+            if rule is not None:
+                lines.append(rule.render(value))
+        return "\n".join(lines)
+
+    def render_tags(self, tags: t.Iterable[str]) -> dict:
+        """
+        Renders a file's tags into caption fields.
+
+        Args:
+            tags (Iterable[str]): The file's tags, e.g. 'creator:some artist'.
+
+        Returns:
+            dict: The rendered markup for each caption field that had matching tags,
+                  one tag per line.
+        """
+        rules = self.rules
+        parts = {field: [] for field in self.fields}
+        for tag in tags:
+            namespace, separator, value = tag.partition(':')
+            if not separator:
+                continue
+            rule = rules.get(namespace)
+            if rule is not None:
+                parts[rule.field].append(rule.render(value))
+        return {field: "\n".join(lines) for field, lines in parts.items() if lines}
@@ -1,14 +1,20 @@
+import html
 import re
 from urllib.parse import urlparse
 import urllib.parse
 from wand.image import Image
 import os
+import pathlib
 import requests
 import math
 from requests.adapters import HTTPAdapter
 from requests.exceptions import ReadTimeout, ConnectionError, RequestException
 from urllib3.util.retry import Retry
 from modules.log_manager import LogManager
+from modules.async_telegram_manager import AsyncTelegramManager
+from modules.breaker_manager import BreakerManager
+from modules.dispatch_manager import DispatchManager
+from modules.tag_manager import TagManager
 import json
 import time
 
@@ -20,19 +26,41 @@ class TelegramManager:
         logger (Logger): The logger for the TelegramManager.
         config (ConfigManager): The configuration settings for the bot.
         token (str): The Telegram bot access token.
+        engine (AsyncTelegramManager): The asyncio network engine, or None when using blocking requests.
+        dispatcher (DispatchManager): The worker pool that handles incoming admin messages.
+        breaker (CircuitBreaker): Skips uploads while Telegram is failing.
+        api_base (str): The Bot API server's base URL.
+        local_mode (bool): Whether the Bot API server is a local one that reads media from the bot's disk.
 
     Methods:
         build_telegram_api_url(method, payload, is_file): Constructs a Telegram API url for bot communication.
+        local_media_uri(path): Returns the file:// URI a local Bot API server reads a file from.
         concatenate_sauce(known_urls): Return source URLs.
         replace_html_entities(tag): Replace HTML entities in tags.
         build_caption_buttons(caption): Assembles buttons to display under the Telegram post.
-        reduce_image_size(path): Telegram has limits on image file size and dimensions. We resize large things here.
+        check_dead_links(urls): Checks Furaffinity links for removed submissions.
+        reduce_image_size(path, output): Telegram has limits on image file size and dimensions. We resize large things here.
+        build_caption(image, keyboard): Build the caption text for the Telegram post.
+        render_message(image): Render the caption and keyboard into their final wire form.
+        get_rendered(image): Return the stored render for a queue entry, re-rendering stale ones.
         get_message_markup(image): Build the message markup for the Telegram post.
         api_request(api_call, payload): Send messages or images to Telegram bot.
         send_message(message): Sends a message to all admin users.
-        send_image(api_call, image, path): Attempt to send the image to our Telegram bot.
+        send_image(api_call, image, path, data): Attempt to send the image (or album) to our Telegram bot.
+        record_outcome(ok): Reports an upload attempt to the Telegram circuit breaker.
+        dispatch_update(update): Hands an incoming update to the dispatcher's worker pool.
+        register_command(command, handler): Adds an admin command.
+        close(): Stops the dispatcher and the asyncio network engine, if running.
     """
     subreddit_regex = "/(r/[a-z0-9][_a-z0-9]{2,20})/"
+    # Bump when caption or keyboard formatting changes so stored renders are rebuilt.
+    render_version = 2
+    engine = None
+    dispatcher = None
+    commands = None
+    breaker = None
+    api_base = "https://api.telegram.org"
+    local_mode = False
 
     def __init__(self, config):
         """
@@ -47,6 +75,9 @@ class TelegramManager:
             self.logger.error('No Telegram token was provided.')
             return
         self.token = self.config.telegram_access_token
+        if self.config.telegram_api_url:
+            self.api_base = self.config.telegram_api_url.rstrip('/')
+        self.local_mode = self.config.telegram_local_mode
         self.polling_session = requests.Session()
         retry_strategy = Retry(
             total=3,
@@ -57,8 +88,35 @@ class TelegramManager:
         adapter = HTTPAdapter(max_retries=retry_strategy)
         self.polling_session.mount("https://", adapter)
         self.polling_session.mount("http://", adapter)
+        # While Telegram is failing, uploads are skipped at once. Recovery is probed with getMe.
+        self.breaker = BreakerManager.from_config(self.config, 'telegram', probe=self.probe_telegram)
+        self.dispatcher = DispatchManager(self.process_incoming_message, self.config.dispatch_workers, self.config.dispatch_queue_size)
+        self.dispatcher.start()
+        if self.config.telegram_async:
+            self.engine = AsyncTelegramManager(self)
+            self.engine.start()
         self.logger.debug('Telegram Module initialized.')
 
+    def probe_telegram(self):
+        """
+        Checks cheaply whether the Bot API is answering.
+
+        Raises:
+            requests.exceptions.RequestException: If Telegram cannot be reached or returns a server error.
+        """
+        response = requests.get(self.build_telegram_api_url('getMe', ''), timeout=5)
+        if response.status_code >= 500:
+            response.raise_for_status()
+
+    def close(self):
+        """
+        Stops the dispatcher and the asyncio network engine, if running.
+        """
+        if self.dispatcher:
+            self.dispatcher.stop()
+        if self.engine:
+            self.engine.stop()
+
     def _redact_token(self, text):
         """Redacts the bot token from a string to prevent it from appearing in logs."""
         return str(text).replace(self.token, "[REDACTED]")
@@ -75,13 +133,28 @@ class TelegramManager:
         Returns:
             str: The Telegram API url
         """
-        url = f"https://api.telegram.org/{'file/' if is_file else ''}bot{self.token}"
+        url = f"{self.api_base}/{'file/' if is_file else ''}bot{self.token}"
         if not is_file and method:
             url += f"/{method}"
         if payload:
             url += f"?{payload.lstrip('?')}" # Make sure payload starts with a ?.
         return url
 
+    # noinspection PyMethodMayBeStatic
+    def local_media_uri(self, path: str) -> str:
+        """
+        Returns the URI a local Bot API server reads a file from, instead of it being uploaded.
+
+        Args:
+            path (str): The path to the file, relative to the bot's directory.
+
+        Returns:
+            str: The absolute file:// URI.
+
+        Note:
+            The server must run on the same machine (or share the queue directory at the same path).
+        """
+        return pathlib.Path(path).resolve().as_uri()
 
     # noinspection PyMethodMayBeStatic
     def concatenate_sauce(self, known_urls: list):
@@ -112,10 +185,7 @@ class TelegramManager:
         Returns:
             str: The cleaned tag.
         """
-        tag = tag.replace("&", "+")
-        tag = tag.replace("<", "≺")
-        tag = tag.replace(">", "≻")
-        return tag
+        return TagManager.replace_html_entities(tag)
 
     def build_caption_buttons(self, caption: str):
         """
@@ -131,56 +201,78 @@ class TelegramManager:
             keyboard = {'inline_keyboard': []}
             url_column = 0
             url_row = -1
-            for line in caption.split(','):
-                line = line.strip()
-                if 'http' in line:
-                    link = urlparse(line)
-                    skip_link = False
-
-                    # Pretty print known site names.
-                    if 'furaffinity' in link.netloc:
-                        website = 'Furaffinity'
-
-                        if 'user' in link.path:
-                            skip_link = True
-
-                        # Check if the link is dead on Furaffinity.
-                        fa_url = link.geturl()
-                        try:
-                            response = requests.get(fa_url, timeout=10)
-                            if "The submission you are trying to find is not in our database." in response.text:
-                                skip_link = True
-                        except requests.exceptions.RequestException as e:
-                            self.logger.error(f"An error occurred when checking the Furaffinity link: {e}")
-                    elif 'e621' in link.netloc:
-                        website = 'e621'
-                    elif 'reddit' in link.netloc:
-                        subreddit_match = re.search(self.subreddit_regex, link.geturl(), re.IGNORECASE)
-                        website = 'Reddit (' + subreddit_match.group(1) + ')' if subreddit_match else 'Reddit'
-                    else:
-                        website = link.netloc
-
-                    # Only add the button if the link is not dead.
-                    if not skip_link:
-                        if url_column == 0:
-                            keyboard['inline_keyboard'].append([])
-                            url_row += 1
-                        url = link.geturl()
-                        keyboard['inline_keyboard'][url_row].append({
-                            'text': website,
-                            'url': url
-                        })
-                        url_column = url_column == 0 and 1 or 0
+            links = [urlparse(line.strip()) for line in caption.split(',') if 'http' in line]
+
+            # Check all Furaffinity links for dead submissions up front, so they can run concurrently.
+            dead_links = self.check_dead_links([
+                link.geturl() for link in links if 'furaffinity' in link.netloc and 'user' not in link.path
+            ])
+
+            for link in links:
+                skip_link = False
+
+                # Pretty print known site names.
+                if 'furaffinity' in link.netloc:
+                    website = 'Furaffinity'
+
+                    if 'user' in link.path or link.geturl() in dead_links:
+                        skip_link = True
+                elif 'e621' in link.netloc:
+                    website = 'e621'
+                elif 'reddit' in link.netloc:
+                    subreddit_match = re.search(self.subreddit_regex, link.geturl(), re.IGNORECASE)
+                    website = 'Reddit (' + subreddit_match.group(1) + ')' if subreddit_match else 'Reddit'
+                else:
+                    website = link.netloc
+
+                # Only add the button if the link is not dead.
+                if not skip_link:
+                    if url_column == 0:
+                        keyboard['inline_keyboard'].append([])
+                        url_row += 1
+                    url = link.geturl()
+                    keyboard['inline_keyboard'][url_row].append({
+                        'text': website,
+                        'url': url
+                    })
+                    url_column = url_column == 0 and 1 or 0
             return keyboard
         else:
             return None
 
-    def reduce_image_size(self, path):
+    def check_dead_links(self, urls: list) -> set:
+        """
+        Checks Furaffinity links for submissions that no longer exist.
+
+        Args:
+            urls (list): The submission URLs to check.
+
+        Returns:
+            set: The URLs that no longer exist.
+        """
+        if not urls:
+            return set()
+        if self.engine:
+            return self.engine.run(self.engine.check_dead_links(urls))
+
+        dead_links = set()
+        for url in urls:
+            try:
+                response = requests.get(url, timeout=10)
+                if AsyncTelegramManager.dead_link_marker in response.text:
+                    dead_links.add(url)
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"An error occurred when checking the Furaffinity link: {e}")
+        return dead_links
+
+    def reduce_image_size(self, path, output=None):
         """
         Reduces image filesize and dimensions as needed for Telegram compatability.
 
         Args:
             path (str): The path to the image file.
+            output (str, optional): Where to save a resized image. Defaults to path. Nothing
+                is saved there if the image needs no resizing.
 
         Returns:
             bool: True if the image is valid or successfully resized, False otherwise.
@@ -188,6 +280,7 @@ class TelegramManager:
         Raises:
             Exception: Could not open the image.
         """
+        output = output or path
         try:
             with Image(filename=path) as img:
                 # Wand can return None for unknown formats; guard before lower()
@@ -208,41 +301,37 @@ class TelegramManager:
                     return False
 
                 # Pass 1: Resize if dimensions exceed Telegram limits
+                current = path
                 if img.width > self.config.max_image_dimension or img.height > self.config.max_image_dimension:
                     scale = self.config.max_image_dimension / max(img.width, img.height)
                     img.resize(round(img.width * scale), round(img.height * scale))
-                    img.save(filename=path)
+                    img.save(filename=output)
+                    current = output
 
                 # Pass 2: Scale down further if file size exceeds Telegram limits. Uses os.path.getsize() to
                 # check file size even if the pass 1 resized it.
-                if os.path.getsize(path) > self.config.max_file_size:
-                    size_ratio = os.path.getsize(path) / self.config.max_file_size
+                if os.path.getsize(current) > self.config.max_file_size:
+                    size_ratio = os.path.getsize(current) / self.config.max_file_size
                     img.resize(round(img.width / math.sqrt(size_ratio)), round(img.height / math.sqrt(size_ratio)))
-                    img.save(filename=path)
+                    img.save(filename=output)
             
             return True
         except Exception as e:
             self.logger.error(f"Could not open the image: {e}")
             return False
 
-    def get_message_markup(self, image):
+    def build_caption(self, image, keyboard: dict = None):
         """
-        Build the message markup for the Telegram post.
+        Build the caption text for the Telegram post.
 
         Args:
             image (dict): The image data to post.
+            keyboard (dict, optional): The source buttons to write into the caption as links.
+                                       Used for albums, which cannot carry inline keyboards.
 
         Returns:
-            str: The message markup for the Telegram post.
+            str: The caption, limited to 1024 characters.
         """
-        message_markup = ''
-
-        # Sauce Buttons
-        sauce = self.build_caption_buttons(image['sauce']) if "sauce" in image else None
-        if sauce:
-            # URL-encode the JSON to prevent "can't parse reply keyboard markup" errors
-            message_markup = message_markup + '&reply_markup=' + urllib.parse.quote(json.dumps(sauce))
-        # Caption Text
         caption_parts = []
         #     Title
         if "title" in image and image["title"]:
@@ -253,34 +342,105 @@ class TelegramManager:
         #     Character
         if "character" in image and image["character"]:
             caption_parts.append('Character(s):\n' + str(image['character']))
+        #     Sauce
+        if keyboard:
+            links = [f"<a href=\"{html.escape(button['url'], quote=True)}\">{html.escape(button['text'], quote=False)}</a>"
+                     for row in keyboard['inline_keyboard'] for button in row]
+            if links:
+                caption_parts.append('Source(s):\n' + " | ".join(links))
         caption = "\n\n".join(caption_parts) if caption_parts else "No info."
         # Do not let captions be longer than 1024 characters (max Telegram bot limit).
         if len(caption) > 1024:
             caption = caption[:1021].rsplit('\n', 1)[0] + "..."
+        return caption
+
+    def render_message(self, image):
+        """
+        Renders the caption and keyboard for a queue entry into their final wire form.
+
+        Args:
+            image (dict): The image data to post.
+
+        Returns:
+            dict: The render, with 'version', 'markup' (the query string fragment for
+                  sendPhoto/sendVideo), 'album_caption' and 'checked' (when the source
+                  links were checked) keys.
+        """
+        message_markup = ''
+
+        # Sauce Buttons
+        sauce = self.build_caption_buttons(image['sauce']) if "sauce" in image else None
+        if sauce:
+            # URL-encode the JSON to prevent "can't parse reply keyboard markup" errors
+            message_markup = message_markup + '&reply_markup=' + urllib.parse.quote(json.dumps(sauce))
+        # Caption Text
+        caption = self.build_caption(image)
         message_markup += f"&caption={urllib.parse.quote(caption)}"
 
-        return message_markup
+        return {
+            'version': self.render_version,
+            'markup': message_markup,
+            'album_caption': self.build_caption(image, sauce),
+            'checked': time.time()
+        }
+
+    def get_rendered(self, image, max_age=None):
+        """
+        Returns the stored render for a queue entry, rendering it again if it is missing or stale.
+
+        Args:
+            image (dict): The image data to post. A fresh render is stored on it under 'rendered'.
+            max_age (float, optional): Renders whose source links were checked more than this
+                many seconds ago are rendered again, so links removed since are dropped.
+
+        Returns:
+            dict: The render returned by render_message().
+        """
+        rendered = image.get('rendered')
+        if (not rendered or rendered.get('version') != self.render_version
+                or (max_age is not None and time.time() - rendered.get('checked', 0) > max_age)):
+            rendered = self.render_message(image)
+            image['rendered'] = rendered
+        return rendered
+
+    def get_message_markup(self, image):
+        """
+        Build the message markup for the Telegram post.
+
+        Args:
+            image (dict): The image data to post.
+
+        Returns:
+            str: The message markup for the Telegram post.
+        """
+        return self.get_rendered(image)['markup']
 
     def api_request(self, api_call, payload):
         """
-        Send messages or images to Telegram bot.
+        Send messages or other simple requests to Telegram bot.
 
         Args:
             api_call (str): The API call to make.
             payload (dict): The payload to send to the API.
 
+        Returns:
+            dict: The decoded Telegram response, or None if Telegram could not be reached.
+
         Raises:
             requests.exceptions.RequestException: Could not communicate with Telegram.
         """
-        if api_call == 'sendMessage':
-            try:
-                url = self.build_telegram_api_url(api_call, "?" + urllib.parse.urlencode(payload))
-                response = requests.get(url, timeout=10)
-                response_json = response.json()
-                if not response_json.get("ok", False):
-                    self.logger.error(f"Failed to send message: {response_json}")
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"Could not communicate with Telegram: {self._redact_token(e)}")
+        if self.engine:
+            return self.engine.run(self.engine.api_request(api_call, payload))
+        try:
+            url = self.build_telegram_api_url(api_call, "?" + urllib.parse.urlencode(payload))
+            response = requests.get(url, timeout=10)
+            response_json = response.json()
+            if not response_json.get("ok", False):
+                self.logger.error(f"Telegram {api_call} request failed: {response_json}")
+            return response_json
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Could not communicate with Telegram: {self._redact_token(e)}")
+            return None
 
     def send_message(self, message):
         """
@@ -291,12 +451,16 @@ class TelegramManager:
         """
         if not message:
             return
+        if self.engine:
+            # Fan out to all admins concurrently.
+            self.engine.run(self.engine.send_message(message))
+            return
 
         for admin in self.config.admins:
             payload = {'chat_id': str(admin), 'text': message, 'parse_mode': 'Markdown'}
             self.api_request('sendMessage', payload)
 
-    def send_image(self, api_call, image, path):
+    def send_image(self, api_call, image, path, data=None):
         """
         Sends an image to a Telegram bot with retry logic.
 
@@ -304,10 +468,24 @@ class TelegramManager:
             api_call (str): The API call to make.
             image (dict): The image data to send.
             path (str): The path to the image file.
+            data (dict, optional): Form fields to send alongside the files, e.g. the
+                                   media list for sendMediaGroup.
 
         Returns:
-            bool: True if the image was sent successfully, False otherwise.
+            dict: The sent Telegram message on success (empty if Telegram omitted it), None otherwise.
+                  sendMediaGroup returns a list of messages instead.
+
+        Note:
+            The returned message carries the file_id Telegram assigned to the upload.
+            Nothing is sent while the Telegram circuit breaker is open, and retries
+            stop as soon as it opens.
         """
+        if self.breaker and not self.breaker.allow():
+            self.logger.warning(f"Skipping {path}: Telegram has been failing. Waiting for it to recover.")
+            return None
+        if self.engine:
+            return self.engine.run(self.engine.send_image(api_call, image, path, data))
+
         max_retries = 3
         timeouts = [10, 20, 30]
         
@@ -322,40 +500,83 @@ class TelegramManager:
                         file_obj.seek(0)
                 
                 self.logger.debug(f"Attempting to send {path} (attempt {attempt + 1}/{max_retries}, timeout={timeout}s)")
-                sent_file = requests.post(api_call, files=image, timeout=timeout)
+                sent_file = requests.post(api_call, data=data, files=image, timeout=timeout)
                 
                 if sent_file.status_code != 200:
                     self.logger.error(f"{path} failed to send. Telegram API returned {sent_file.status_code} - {sent_file.text}")
                     if 400 <= sent_file.status_code < 500:
+                        self.record_outcome(True)
                         self.send_message(f"❌ Image failed to send (Client Error): `{path}`\nStatus: {sent_file.status_code}")
-                        return False
+                        return None
+
+                    if self.record_outcome(False):
+                        return None
 
                     if attempt == max_retries - 1:
                         self.send_message(f"❌ Image failed to send after {max_retries} attempts: `{path}`\nStatus: {sent_file.status_code}")
-                        return False
+                        return None
                     continue
                 
+                self.record_outcome(True)
                 content_type = sent_file.headers.get('Content-Type', '')
                 response_json = sent_file.json() if 'application/json' in content_type else {}
 
                 if response_json.get("ok"):
                     self.logger.debug("Image sent successfully.")
-                    return True
+                    return response_json.get("result") or {}
                 else:
                     self.logger.error(f"{path} failed to send. Response: {response_json}")
                     if attempt == max_retries - 1:
                         self.send_message(f"❌ Image failed to send after {max_retries} attempts: `{path}`\nResponse: {response_json.get('description', 'Unknown error')}")
-                        return False
+                        return None
                         
             except requests.exceptions.RequestException as e:
                 self.logger.error(f"Could not communicate with the Telegram bot (attempt {attempt + 1}/{max_retries}): {self._redact_token(e)}")
+                if self.record_outcome(False):
+                    return None
                 if attempt == max_retries - 1:
                     self.send_message(f"❌ Network error sending image after {max_retries} attempts: `{path}`\nError: {type(e).__name__}")
-                    return False
+                    return None
                 # Wait before retrying (exponential backoff)
                 time.sleep(2 ** attempt)
         
-        return False
+        return None
+
+    def record_outcome(self, ok: bool) -> bool:
+        """
+        Reports an upload attempt to the Telegram circuit breaker.
+
+        Args:
+            ok (bool): Whether Telegram answered normally. Client errors count as answers.
+
+        Returns:
+            bool: True if the breaker is now open, so the caller should stop retrying.
+        """
+        if not self.breaker:
+            return False
+        if ok:
+            self.breaker.record_success()
+            return False
+        self.breaker.record_failure()
+        return self.breaker.state == self.breaker.OPEN
+
+    def dispatch_update(self, update: dict) -> bool:
+        """
+        Hands a Telegram update to the dispatcher's worker pool.
+
+        Args:
+            update (dict): The Telegram update.
+
+        Returns:
+            bool: True if the update was accepted (or dropped as a duplicate),
+                  False if the workers are saturated and it should be delivered again.
+        """
+        if self.dispatcher:
+            return self.dispatcher.submit(update)
+        message = update.get('message')
+        if message:
+            self.process_incoming_message(message)
+        return True
 
     def process_incoming_message(self, message: dict):
         """
@@ -370,6 +591,24 @@ class TelegramManager:
         if user_id in self.config.admins:
             if text == 'test':
                 self.logger.debug('test')
+                return
+            command, _, argument = text.partition(' ')
+            handler = (self.commands or {}).get(command)
+            if handler:
+                self.logger.info(f"Admin {user_id} sent {command}.")
+                handler(argument.strip())
+
+    def register_command(self, command: str, handler):
+        """
+        Adds an admin command.
+
+        Args:
+            command (str): The command, e.g. '/post'.
+            handler (callable): Called with the text after the command when an admin sends it.
+        """
+        if self.commands is None:
+            self.commands = {}
+        self.commands[command.lower()] = handler
 
     def poll_telegram_updates(self, is_shutting_down_func):
         """
@@ -385,7 +624,7 @@ class TelegramManager:
         while not is_shutting_down_func():
             start_time = time.monotonic()
             try:
-                url = f"https://api.telegram.org/bot{self.token}/getUpdates"
+                url = self.build_telegram_api_url('getUpdates', '')
                 params = {'timeout': 30, 'offset': offset}
                 response = self.polling_session.get(url, params=params, timeout=(5, 35))
                 elapsed = time.monotonic() - start_time
@@ -398,10 +637,11 @@ class TelegramManager:
                         # Long polls often return empty when no messages exist. Keep it quiet but traceable.
                         self.logger.debug(f"Polling completed in {elapsed:.2f}s with no updates. Offset {offset}.")
                     for update in data.get('result', []):
+                        if not self.dispatch_update(update):
+                            # Workers are saturated. Leave the offset here so Telegram redelivers the rest.
+                            time.sleep(1)
+                            break
                         offset = update['update_id'] + 1
-                        message = update.get('message')
-                        if message:
-                            self.process_incoming_message(message)
                     consecutive_timeouts = 0
                     consecutive_errors = 0
                 else:
@@ -0,0 +1,250 @@
+from modules.log_manager import LogManager
+from modules.file_manager import FileManager
+import concurrent.futures
+import hashlib
+import mmap
+import os
+import threading
+import time
+import typing as t
+
+class VerifyManager:
+    """
+    Checks that the stored queue files are intact, and re-fetches those that are not.
+
+    Stored files are named '<hash><ext>' after the SHA256 hash Hydrus gave their
+    content, so a file is intact if its content hashes to its name. A file truncated
+    by a failed download or a full disk would otherwise only be noticed when
+    Telegram rejects it at post time.
+
+    Files are hashed in parallel on a thread pool ('verify_workers'), through mmap,
+    so hashing does not copy them into memory and runs without the GIL. A run checks
+    one slice of 'verify_slice_size' files in name order, and records the last file
+    checked in a checkpoint, so a large queue is verified over several runs and a
+    run stopped by shutdown resumes where it stopped.
+
+    A file that does not match its hash is moved to the 'quarantine/' directory,
+    and a missing or mismatched file is fetched again from Hydrus by its hash.
+    The file keeps its queue entries while it is re-fetched. If Hydrus cannot
+    return the right content, it stays quarantined and the run reports it. Posting
+    skips its entries until a later pass stores it again.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        config (ConfigModel): The bot's configuration settings.
+        blobs (BlobManager): The file store to verify.
+        hydrus (HydrusManager): The Hydrus manager instance.
+        checkpoint_file (str): The path to the checkpoint file.
+        checkpoint (dict): The last file checked ('cursor'), and the number of full passes.
+        quarantine_dir (str): The directory mismatched files are moved to.
+        report (dict): The running or last run's results, or None.
+
+    Example:
+        >>> verifier = VerifyManager(config, channels.blobs, hydrus)
+        >>> verifier.run()
+        {'checked': 1000, 'intact': 999, 'refetched': 1, 'failed': [], ...}
+    """
+
+    INTACT = 'intact'
+    MISSING = 'missing'
+    MISMATCH = 'mismatch'
+
+    # Files checked between checkpoint saves.
+    checkpoint_every = 100
+
+    def __init__(self, config, blobs, hydrus, checkpoint_file: str = 'verify.json'):
+        """
+        Initializes the VerifyManager and loads the checkpoint from disk.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+            blobs (BlobManager): The file store to verify.
+            hydrus (HydrusManager): The Hydrus manager instance.
+            checkpoint_file (str): The name of the checkpoint file.
+
+        Note:
+            The checkpoint file will be stored in the 'queue/' directory.
+        """
+        self.logger = LogManager.setup_logger('VFY')
+        self.config = config.config_data
+        self.blobs = blobs
+        self.hydrus = hydrus
+        self.files = FileManager()
+        self.checkpoint_file = 'queue/' + checkpoint_file
+        self.checkpoint = self.files.operation(self.checkpoint_file, 'r', {"cursor": "", "passes": 0}) or {}
+        self.checkpoint.setdefault("cursor", "")
+        self.checkpoint.setdefault("passes", 0)
+        self.quarantine_dir = os.path.join(blobs.directory, 'quarantine')
+        self.lock = threading.Lock()
+        self.running = False
+        self.report = None
+        self.logger.debug('Verify Module initialized.')
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """
+        Returns the SHA256 hash of a file's content.
+
+        Args:
+            path (str): The file's path.
+
+        Returns:
+            str: The hex digest.
+
+        Raises:
+            OSError: If the file could not be read.
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            # mmap cannot map an empty file.
+            if os.fstat(file.fileno()).st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                    digest.update(content)
+        return digest.hexdigest()
+
+    @staticmethod
+    def expected_hash(filename: str) -> str:
+        return filename.split('.', 1)[0].lower()
+
+    def check(self, filename: str) -> t.Optional[str]:
+        """
+        Checks that a stored file's content matches its name.
+
+        Args:
+            filename (str): The file name.
+
+        Returns:
+            str: 'intact', 'missing' or 'mismatch', or None if the file could not be read.
+        """
+        try:
+            # Not while the file is stored, replaced or uploaded.
+            with self.blobs.file_lock(filename):
+                digest = self.hash_file(self.blobs.path(filename))
+        except FileNotFoundError:
+            return self.MISSING
+        except OSError as e:
+            self.logger.error(f"Could not read {filename}: {e}")
+            return None
+        return self.INTACT if digest == self.expected_hash(filename) else self.MISMATCH
+
+    def repair(self, filename: str, status: str) -> bool:
+        """
+        Quarantines a mismatched file, and fetches the file again from Hydrus.
+
+        Args:
+            filename (str): The file name.
+            status (str): The result of check(): 'missing' or 'mismatch'.
+
+        Returns:
+            bool: True if the file was stored again with the right content.
+        """
+        if not self.blobs.refs.get(filename):
+            # Posted and deleted while it was being checked.
+            return True
+        if status == self.MISMATCH:
+            target = self.blobs.quarantine(filename, self.quarantine_dir)
+            self.logger.warning(f"{filename} does not match its hash. Moved it to {target}.")
+        else:
+            self.logger.warning(f"{filename} is queued but missing.")
+        file_hash = self.expected_hash(filename)
+        try:
+            content = self.hydrus.get_file_content_by_hash(file_hash)
+        except Exception as e:
+            self.logger.error(f"Could not fetch {filename} from Hydrus again: {e}")
+            return False
+        if not content or hashlib.sha256(content).hexdigest() != file_hash:
+            self.logger.error(f"Hydrus returned different content for {filename}. Leaving it quarantined.")
+            return False
+        try:
+            self.blobs.replace(filename, content)
+        except OSError as e:
+            self.logger.error(f"Could not store {filename} again: {e}")
+            return False
+        self.logger.info(f"Fetched {filename} from Hydrus again.")
+        return True
+
+    def run(self, should_stop: t.Callable[[], bool] = lambda: False) -> t.Optional[dict]:
+        """
+        Verifies the next slice of stored files, resuming from the checkpoint.
+
+        Args:
+            should_stop (callable): Returns True to stop early, e.g. on shutdown.
+
+        Returns:
+            dict: The run's results, or None if a run is already in progress.
+        """
+        with self.lock:
+            if self.running:
+                return None
+            self.running = True
+        try:
+            return self._run(should_stop)
+        finally:
+            with self.lock:
+                self.running = False
+
+    def _run(self, should_stop: t.Callable[[], bool]) -> dict:
+        remaining = [name for name in self.blobs.names() if name > self.checkpoint['cursor']]
+        names = remaining[:self.config.verify_slice_size]
+        self.report = report = {'started': time.time(), 'finished': None, 'total': len(names), 'checked': 0,
+                                self.INTACT: 0, 'refetched': 0, 'unreadable': 0, 'failed': []}
+        self.logger.info(f"Verifying {len(names)} of {len(remaining)} remaining stored file(s).")
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.config.verify_workers,
+                                                         thread_name_prefix='verify')
+        try:
+            futures = [executor.submit(self.check, name) for name in names]
+            # Results are taken in name order, so the checkpoint never skips a file.
+            for name, future in zip(names, futures):
+                if should_stop():
+                    break
+                status = future.result()
+                if status is None:
+                    report['unreadable'] += 1
+                elif status == self.INTACT:
+                    report[self.INTACT] += 1
+                elif self.repair(name, status):
+                    report['refetched'] += 1
+                else:
+                    report['failed'].append(name)
+                report['checked'] += 1
+                self.checkpoint['cursor'] = name
+                if report['checked'] % self.checkpoint_every == 0:
+                    self.save_checkpoint()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if report['checked'] == len(remaining):
+            # Every file was checked. The next run starts a new pass.
+            self.checkpoint['cursor'] = ''
+            self.checkpoint['passes'] += 1
+        self.save_checkpoint()
+        report['finished'] = time.time()
+        self.logger.info(self.format_report(report))
+        return report
+
+    def save_checkpoint(self):
+        """
+        Saves the checkpoint to the checkpoint file.
+        """
+        self.files.operation(self.checkpoint_file, 'w+', self.checkpoint)
+
+    def format_report(self, report: t.Optional[dict] = None) -> str:
+        """
+        Describes a run's results, for the log or the admins.
+
+        Args:
+            report (dict, optional): The results. Defaults to the running or last run's.
+
+        Returns:
+            str: The description.
+        """
+        report = report or self.report
+        if not report:
+            return "No verification has run yet."
+        state = 'Verified' if report['finished'] else 'Verifying'
+        text = (f"{state} {report['checked']} of {report['total']} stored file(s): {report[self.INTACT]} intact, "
+                f"{report['refetched']} fetched again, {len(report['failed'])} not repaired.")
+        if report['unreadable']:
+            text += f" {report['unreadable']} could not be read."
+        if report['failed']:
+            text += f" Not repaired: {', '.join(report['failed'])}."
+        return text
@@ -0,0 +1,190 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from modules.log_manager import LogManager
+import hmac
+import json
+import secrets
+import threading
+import typing as t
+
+class WebhookManager:
+    """
+    Receives Telegram updates through a webhook instead of long polling.
+
+    This class runs a small local HTTP server that accepts the updates Telegram
+    POSTs to the configured webhook URL. Requests are only accepted if they carry
+    the secret token that was handed to Telegram when the webhook was registered.
+
+    Attributes:
+        logger (Logger): The logger instance for this class.
+        config (ConfigModel): The bot's configuration settings.
+        telegram (TelegramManager): The Telegram manager that processes updates.
+        secret (str): The secret token Telegram must send with every update.
+        server (ThreadingHTTPServer): The HTTP server, once started.
+        thread (Thread): The thread serving requests, once started.
+
+    Example:
+        >>> webhook = WebhookManager(config, telegram)
+        >>> webhook.start()
+        >>> webhook.register()
+        >>> ...
+        >>> webhook.deregister()
+        >>> webhook.stop()
+    """
+
+    secret_header = 'X-Telegram-Bot-Api-Secret-Token'
+    max_body_size = 1024 * 1024
+
+    def __init__(self, config, telegram):
+        """
+        Initializes the WebhookManager.
+
+        Args:
+            config (ConfigManager): The bot's configuration manager.
+            telegram (TelegramManager): The Telegram manager that processes updates.
+
+        Note:
+            If no webhook_secret is configured, a random one is generated for this run.
+        """
+        self.logger = LogManager.setup_logger('WEB')
+        self.config = config.config_data
+        self.telegram = telegram
+        self.secret = self.config.webhook_secret or secrets.token_urlsafe(32)
+        self.server = None
+        self.thread = None
+        self.logger.debug('Webhook Module initialized.')
+
+    @property
+    def port(self) -> t.Optional[int]:
+        """
+        The port the server is listening on, or None if it is not running.
+        """
+        return self.server.server_address[1] if self.server else None
+
+    def handle_update(self, update: dict) -> bool:
+        """
+        Hands a Telegram update to the Telegram manager's dispatcher.
+
+        Args:
+            update (dict): The update received from Telegram.
+
+        Returns:
+            bool: True if the update was accepted, False if it should be delivered again.
+        """
+        return self.telegram.dispatch_update(update)
+
+    def _build_handler(self):
+        """
+        Builds the request handler class bound to this manager.
+
+        Returns:
+            type: A BaseHTTPRequestHandler subclass.
+        """
+        manager = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            """
+            Accepts update POSTs from Telegram.
+            """
+
+            def _respond(self, status: int):
+                body = b'{}'
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                token = self.headers.get(manager.secret_header, '')
+                if not hmac.compare_digest(token.encode(), manager.secret.encode()):
+                    manager.logger.warning(f"Rejected webhook request from {self.client_address[0]} with a bad secret token.")
+                    self._respond(403)
+                    return
+
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                except ValueError:
+                    length = -1
+                if length <= 0 or length > manager.max_body_size:
+                    self._respond(400)
+                    return
+
+                try:
+                    update = json.loads(self.rfile.read(length))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    self._respond(400)
+                    return
+                if not isinstance(update, dict):
+                    self._respond(400)
+                    return
+
+                try:
+                    accepted = manager.handle_update(update)
+                except Exception as e:
+                    manager.logger.error(f"An error occurred while processing webhook update {update.get('update_id')}: {e}")
+                    accepted = True
+                # Ask Telegram to redeliver when the workers are saturated. Acknowledge everything else,
+                # including updates that failed here, so they are not retried forever.
+                self._respond(200 if accepted else 503)
+
+            def log_message(self, format, *args):
+                manager.logger.debug(f"{self.client_address[0]} - {format % args}")
+
+        return WebhookHandler
+
+    def start(self):
+        """
+        Starts the HTTP server in a background thread.
+
+        Raises:
+            OSError: If the server could not listen, e.g. the port is in use.
+        """
+        if self.server:
+            return
+        self.server = ThreadingHTTPServer((self.config.webhook_host, self.config.webhook_port), self._build_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='webhook', daemon=True)
+        self.thread.start()
+        self.logger.info(f"Webhook server listening on {self.config.webhook_host}:{self.port}.")
+
+    def stop(self):
+        """
+        Stops the HTTP server.
+        """
+        if not self.server:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        self.thread = None
+        self.logger.info("Webhook server stopped.")
+
+    def register(self) -> bool:
+        """
+        Registers the webhook URL and secret token with Telegram.
+
+        Returns:
+            bool: True if Telegram accepted the webhook, False otherwise.
+        """
+        response = self.telegram.api_request('setWebhook', {
+            'url': self.config.webhook_url,
+            'secret_token': self.secret,
+            'allowed_updates': json.dumps(['message'])
+        })
+        if response and response.get('ok'):
+            self.logger.info("Webhook registered with Telegram.")
+            return True
+        return False
+
+    def deregister(self) -> bool:
+        """
+        Removes the webhook from Telegram so long polling can be used again.
+
+        Returns:
+            bool: True if Telegram removed the webhook, False otherwise.
+        """
+        response = self.telegram.api_request('deleteWebhook', {})
+        if response and response.get('ok'):
+            self.logger.info("Webhook removed from Telegram.")
+            return True
+        return False
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Compares the size of a large queue held as dicts of rendered HTML with the
+compact QueueEntry representation, in memory and as queue.json.
+
+Compact entries carry the wire-form render a file gets when it is prepared for
+posting. queue.json does not store it; the 'with r' column shows the size the
+file would be if every render were written alongside its entry.
+
+Usage:
+    python3 scripts/benchmark_queue_entries.py
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import urllib.parse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_manager import default_tag_rules
+from modules.entry_manager import EntryManager
+from modules.tag_manager import TagManager
+
+SIZES = [1000, 10000]
+ARTISTS = 200
+CHARACTERS = 500
+
+
+def make_file(n, rng):
+    tags = [f"creator:artist {rng.randrange(ARTISTS)} (artist)", "title:original (series)"]
+    tags += [f"character:character {rng.randrange(CHARACTERS)}" for _ in range(rng.randint(1, 3))]
+    sauce = f"https://www.furaffinity.net/view/{n}/, https://e621.net/posts/{n}"
+    return f"{n:064x}", tags, sauce
+
+
+def legacy_entry(tags_manager, file_hash, tags, sauce):
+    """The dict previously built by QueueManager.save_image_to_queue."""
+    entry = {'path': file_hash + '.jpg', 'sauce': sauce}
+    entry.update(tags_manager.render_tags(tags))
+    return entry
+
+
+def render(entry):
+    """
+    The render TelegramManager.render_message() stores on an entry, built the same
+    way, but without importing Wand or checking the links over the network.
+    """
+    keyboard = {'inline_keyboard': [[{'text': 'Furaffinity', 'url': url.strip()} if 'furaffinity' in url
+                                      else {'text': 'e621', 'url': url.strip()} for url in entry['sauce'].split(',')]]}
+    parts = [f"{label}:\n{entry[key]}" for key, label in (('title', 'Title(s)'), ('creator', 'Uploader'),
+                                                           ('character', 'Character(s)')) if entry[key]]
+    caption = "\n\n".join(parts)
+    links = " | ".join(f"<a href=\"{button['url']}\">{button['text']}</a>" for button in keyboard['inline_keyboard'][0])
+    return {
+        'version': 1,
+        'markup': '&reply_markup=' + urllib.parse.quote(json.dumps(keyboard)) + '&caption=' + urllib.parse.quote(caption),
+        'album_caption': caption + "\n\nSource(s):\n" + links,
+        'checked': time.time(),
+    }
+
+
+def compact_entry(entries, file_hash, tags, sauce):
+    entry = entries.create(file_hash, '.jpg', tags=tags, sauce=sauce)
+    entry['rendered'] = render(entry)
+    return entry
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    config = SimpleNamespace(config_data=SimpleNamespace(tag_rules=default_tag_rules()))
+    tags_manager = TagManager(config)
+
+    print("Resident size of a queue loaded from queue.json, and the size of queue.json, in KiB.")
+    print(f"{'entries':>8} {'dict mem':>9} {'entry mem':>10} {'dict json':>10} {'entry json':>11} {'with r':>8}")
+    for size in SIZES:
+        rng = random.Random(size)
+        files = [make_file(n, rng) for n in range(size)]
+        entries = EntryManager(tags_manager)
+
+        legacy_json = json.dumps({'queue': [legacy_entry(tags_manager, *file) for file in files]})
+        queue = [compact_entry(entries, *file) for file in files]
+        encoded = entries.encode({'queue': queue})
+        compact_json = json.dumps(encoded)
+        for item, entry in zip(encoded['queue'], queue):
+            item['r'] = entry.rendered
+        rendered_json = json.dumps(encoded)
+
+        legacy, legacy_memory = measure(lambda: json.loads(legacy_json))
+        compact, compact_memory = measure(lambda: entries.decode(json.loads(compact_json)))
+        assert all(old['creator'] == new['creator'] for old, new in zip(legacy['queue'], compact['queue'])), \
+            "Entries disagree."
+
+        print(f"{size:>8} {legacy_memory / 1024:>9.0f} {compact_memory / 1024:>10.0f} "
+              f"{len(legacy_json) / 1024:>10.0f} {len(compact_json) / 1024:>11.0f} {len(rendered_json) / 1024:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for caption rendering of files with many tags.
+
+Compares the compiled TagManager against the previous per-tag startswith chain
+with string concatenation.
+
+Usage:
+    python3 scripts/benchmark_tag_manager.py
+"""
+import os
+import sys
+import timeit
+import urllib.parse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_manager import default_tag_rules
+from modules.tag_manager import TagManager, proper_title
+
+SIZES = [500, 1000, 2000]
+REPEATS = 5
+
+
+def make_tags(count):
+    namespaces = ['creator', 'character', 'title', 'species', 'meta', '']
+    tags = []
+    for n in range(count):
+        namespace = namespaces[n % len(namespaces)]
+        value = f"tag number {n} & friends (artist)"
+        tags.append(f"{namespace}:{value}" if namespace else value)
+    return tags
+
+
+def legacy_render(tags):
+    """The tag loop previously inlined in QueueManager.save_image_to_queue."""
+    def replace_html_entities(tag):
+        return tag.replace("&", "+").replace("<", "≺").replace(">", "≻")
+
+    creator = title = character = None
+    for tag in tags:
+        if tag.startswith("creator:"):
+            tag = replace_html_entities(tag)
+            creator_tag = tag.split(":", 1)[1]
+            creator_name = proper_title(creator_tag.replace(" (artist)", ""))
+            creator_urlencoded = urllib.parse.quote(creator_tag.replace(" ", "_"))
+            creator_markup = f"<a href=\"https://e621.net/posts?tags={creator_urlencoded}\">{creator_name}</a>"
+            creator = creator_markup if creator is None else creator + "\n" + creator_markup
+        elif tag.startswith("title:"):
+            tag = replace_html_entities(tag)
+            title_name = proper_title(tag.split(":", 1)[1].replace(" (series)", ""))
+            title_name = ''.join(c for c in title_name if ord(c) < 128)
+            title = title_name if title is None else title + "\n" + title_name
+        elif tag.startswith("character:"):
+            tag = replace_html_entities(tag)
+            character_tag = tag.split(":", 1)[1]
+            character_name = proper_title(character_tag.replace(" (character)", ""))
+            character_urlencoded = urllib.parse.quote(character_tag.replace(" ", "_"))
+            character_markup = f"<a href=\"https://e621.net/posts?tags={character_urlencoded}\">{character_name}</a>"
+            character = character_markup if character is None else character + "\n" + character_markup
+    return {'creator': creator, 'title': title, 'character': character}
+
+
+def best_time(func, number):
+    return min(timeit.repeat(func, number=number, repeat=REPEATS)) / number
+
+
+def main():
+    config = SimpleNamespace(config_data=SimpleNamespace(tag_rules=default_tag_rules()))
+    manager = TagManager(config)
+
+    def render_cold(tags):
+        # Clear the memoized renders to measure a file whose tags were never seen.
+        for rule in manager.rules.values():
+            rule.render.cache_clear()
+        return manager.render_tags(tags)
+
+    print("Per file, times in ms. 'cold' = no memoized tags, 'warm' = tags seen on earlier files.")
+    print(f"{'tags':>6} {'legacy':>9} {'cold':>9} {'warm':>9} {'cold x':>7} {'warm x':>7}")
+    for size in SIZES:
+        tags = make_tags(size)
+        legacy = legacy_render(tags)
+        compiled = render_cold(tags)
+        assert all(legacy[field] == compiled.get(field) for field in legacy), "Renderers disagree."
+
+        number = max(1, 20000 // size)
+        legacy_time = best_time(lambda: legacy_render(tags), number)
+        cold_time = best_time(lambda: render_cold(tags), number)
+        warm_time = best_time(lambda: manager.render_tags(tags), number)
+        print(f"{size:>6} {legacy_time * 1000:>9.3f} {cold_time * 1000:>9.3f} {warm_time * 1000:>9.3f} "
+              f"{legacy_time / cold_time:>6.2f}x {legacy_time / warm_time:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
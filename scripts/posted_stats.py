@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Prints posting statistics from the local posted ledger (queue/posted.db).
+
+Usage:
+    python3 scripts/posted_stats.py            # totals for the last day, week and month
+    python3 scripts/posted_stats.py --days 14  # also a per-day breakdown for the last 14 days
+    python3 scripts/posted_stats.py --hash <sha256>
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.ledger_manager import LedgerManager
+
+DAY = 86400
+WINDOWS = [('24h', 1), ('7d', 7), ('30d', 30), ('all', None)]
+
+
+def format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M') if timestamp else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, help='Print a per-day breakdown for this many days.')
+    parser.add_argument('--hash', help='Print every post of this content hash.')
+    args = parser.parse_args()
+
+    if not os.path.exists('queue/posted.db'):
+        print("No ledger found at queue/posted.db. Run this from the bot's directory.")
+        return 1
+    ledger = LedgerManager('posted.db')
+    now = time.time()
+
+    if args.hash:
+        for post in ledger.get(args.hash) or []:
+            print(f"{format_time(post['posted_at'])}  chat {post['chat_id']}  message {post['message_id']}  {post['bytes']} bytes")
+        return 0
+
+    print(f"{'window':>6} {'posts':>7} {'MiB sent':>9} {'last post':>17}")
+    for label, days in WINDOWS:
+        stats = ledger.stats(since=now - days * DAY if days else None)
+        print(f"{label:>6} {stats['posts']:>7} {stats['bytes'] / 2 ** 20:>9.1f} {format_time(stats['last']):>17}")
+
+    if args.days:
+        print()
+        for bucket in ledger.histogram(DAY, since=now - args.days * DAY):
+            print(f"{format_time(bucket['start'])[:10]} {bucket['posts']:>5} posts {bucket['bytes'] / 2 ** 20:>8.1f} MiB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -27,6 +27,8 @@ PY_MODULES = [
     ('hydrus_api', 'hydrus_api'),
     ('wand.image', 'wand'),
     ('requests', 'requests'),
+    ('aiohttp', 'aiohttp'),
+    ('numpy', 'numpy'),
     ('pydantic', 'pydantic'),
 ]
 
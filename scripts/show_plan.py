@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Prints the bot's posting plan: the files that will be posted next, in order.
+
+Usage:
+    python3 scripts/show_plan.py [channel]
+"""
+import json
+import os
+import sys
+
+
+def main(channel='default'):
+    plan_file = 'queue/plan.json' if channel == 'default' else f"queue/plan-{channel}.json"
+    if not os.path.exists(plan_file):
+        print(f"No plan found at {plan_file}. Run this from the bot's directory.")
+        return 1
+    with open(plan_file, 'r') as file:
+        plan = json.load(file)
+    print(f"Strategy: {plan.get('strategy')}")
+    for position, path in enumerate(plan.get('upcoming', []), start=1):
+        print(f"{position:>3}. {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:2]))
@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import urllib.parse
+import threading
+import tempfile
+import json
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.async_telegram_manager import AsyncTelegramManager
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Bot API that records requests."""
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        self.server.requests.append(('GET', url.path, urllib.parse.parse_qs(url.query)))
+        if url.path.startswith('/fa/'):
+            text = AsyncTelegramManager.dead_link_marker if 'dead' in url.path else 'ok'
+            body = text.encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._reply({'ok': True, 'result': {}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.server.requests.append(('POST', self.path, body))
+        if self.server.failures:
+            self.server.failures -= 1
+            self._reply({'ok': False, 'description': 'Internal Server Error'}, status=500)
+            return
+        self._reply({'ok': True, 'result': {'photo': [{'file_id': 'abc'}]}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestAsyncTelegramManager(unittest.TestCase):
+    """Tests for AsyncTelegramManager against a local fake Bot API."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTelegramHandler)
+        cls.server.requests = []
+        cls.server.failures = 0
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    @patch('modules.async_telegram_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        self.server.requests.clear()
+        telegram = MagicMock()
+        telegram.config.admins = [1, 2, 3]
+        telegram._redact_token.side_effect = str
+        telegram.record_outcome.return_value = False
+        telegram.build_telegram_api_url.side_effect = (
+            lambda method, payload, is_file=False: f"{self.base_url}/botTOKEN/{method}?{payload.lstrip('?')}"
+        )
+        self.engine = AsyncTelegramManager(telegram)
+        self.engine.start()
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def test_send_message_fans_out_to_all_admins(self):
+        self.engine.run(self.engine.send_message("hello"), timeout=10)
+        chat_ids = sorted(query['chat_id'][0] for _, _, query in self.server.requests)
+        self.assertEqual(['1', '2', '3'], chat_ids)
+
+    def test_send_image_uploads_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as f:
+            f.write(b'image-bytes')
+        try:
+            with open(f.name, 'rb') as image:
+                result = self.engine.run(self.engine.send_image(f"{self.base_url}/botTOKEN/sendPhoto", {'photo': image}, f.name), timeout=10)
+        finally:
+            os.remove(f.name)
+        self.assertEqual('abc', result['photo'][0]['file_id'])
+        method, path, body = self.server.requests[0]
+        self.assertEqual('POST', method)
+        self.assertIn(b'image-bytes', body)
+
+    def test_send_image_retries_with_the_whole_file(self):
+        self.server.failures = 1
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as f:
+            f.write(b'image-bytes')
+        try:
+            with open(f.name, 'rb') as image:
+                result = self.engine.run(self.engine.send_image(f"{self.base_url}/botTOKEN/sendPhoto", {'photo': image}, f.name), timeout=10)
+        finally:
+            os.remove(f.name)
+        self.assertEqual('abc', result['photo'][0]['file_id'])
+        self.assertEqual(2, len(self.server.requests))
+        for _, _, body in self.server.requests:
+            self.assertIn(b'image-bytes', body)
+
+    def test_check_dead_links(self):
+        urls = [f"{self.base_url}/fa/dead/1", f"{self.base_url}/fa/alive/2"]
+        dead = self.engine.run(self.engine.check_dead_links(urls), timeout=10)
+        self.assertEqual({urls[0]}, dead)
+
+    def test_run_from_loop_thread_is_rejected(self):
+        async def nested():
+            self.engine.run(self.engine.send_message("x"))
+
+        with self.assertRaises(RuntimeError):
+            self.engine.run(nested(), timeout=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
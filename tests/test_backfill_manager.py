@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.backfill_manager import BackfillManager, Budget
+from modules.blob_manager import FetchError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestBudget(unittest.TestCase):
+    """Tests for Budget"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_paces_files(self):
+        budget = Budget(files_per_second=2, clock=self.clock, sleep=self.clock.sleep)
+        for _ in range(4):
+            budget.spend(1)
+        self.assertEqual(2.0, budget.elapsed())
+
+    def test_paces_bytes(self):
+        budget = Budget(files_per_second=10, bytes_per_second=1000, clock=self.clock, sleep=self.clock.sleep)
+        budget.spend(1, 5000)
+        self.assertEqual(5.0, budget.elapsed())
+
+    def test_unlimited(self):
+        sleep = MagicMock()
+        budget = Budget(clock=self.clock, sleep=sleep)
+        budget.spend(100, 10 ** 9)
+        sleep.assert_not_called()
+
+    def test_stops_waiting_on_shutdown(self):
+        budget = Budget(files_per_second=0.01, clock=self.clock, sleep=self.clock.sleep)
+        budget.spend(1, should_stop=lambda: True)
+        self.assertEqual(0.0, budget.elapsed())
+
+
+class TestBackfillManager(unittest.TestCase):
+    """Tests for BackfillManager"""
+
+    @patch('modules.backfill_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        config = SimpleNamespace(config_data=SimpleNamespace(
+            backfill_files_per_second=None, backfill_bytes_per_second=None, backfill_progress_interval=30.0))
+        self.hydrus = MagicMock()
+        self.hydrus.check_hydrus_permissions.return_value = True
+        self.hydrus.hydrus_client.search_files.return_value = {'file_ids': [1, 2, 3]}
+        self.backfill = BackfillManager(config, self.hydrus, ':memory:')
+        self.queue = MagicMock()
+        self.queue.quota_exceeded.return_value = None
+        self.queue.save_image_to_queue.side_effect = lambda file_id, on_download: on_download(100) or 1
+        self.channel = SimpleNamespace(name='default', queue=self.queue, queue_tag='to_post')
+
+    def tearDown(self):
+        self.backfill.close()
+
+    def retagged(self):
+        return [call.args[0] for call in self.hydrus.retag_queued.call_args_list]
+
+    def test_runs_every_file_through_every_phase(self):
+        self.assertTrue(self.backfill.run(self.channel))
+        self.assertEqual([1, 2, 3], [call.args[0] for call in self.queue.save_image_to_queue.call_args_list])
+        self.assertEqual([1, 2, 3], self.retagged())
+        self.assertFalse(self.backfill.has_pending('default'))
+        self.queue.phash.save.assert_called_once()
+
+    def test_stopped_backfill_resumes_without_searching_again(self):
+        # Stop once the first file is retagged.
+        self.assertFalse(self.backfill.run(self.channel, lambda: self.hydrus.retag_queued.called))
+        self.assertEqual([1], self.retagged())
+        self.assertIn('paused', self.backfill.format_progress('default'))
+
+        self.assertTrue(self.backfill.run(self.channel))
+        self.hydrus.hydrus_client.search_files.assert_called_once()
+        self.assertEqual([1, 2, 3], self.retagged())
+
+    def test_enqueued_file_is_only_retagged_after_a_crash(self):
+        self.hydrus.retag_queued.side_effect = [None, RuntimeError('hydrus down')]
+        with self.assertRaises(RuntimeError):
+            self.backfill.run(self.channel)
+        counts = self.backfill.counts('default')
+        self.assertEqual((1, 1, 1), (counts['retagged'], counts['enqueued'], counts['planned']))
+        self.assertEqual(200, counts['bytes'])
+
+        self.hydrus.retag_queued.side_effect = None
+        self.queue.save_image_to_queue.reset_mock()
+        self.assertTrue(self.backfill.run(self.channel))
+        self.assertEqual([3], [call.args[0] for call in self.queue.save_image_to_queue.call_args_list])
+        self.assertEqual([1, 2, 2, 3], self.retagged())
+
+    def test_pauses_when_queue_is_over_quota(self):
+        self.queue.quota_exceeded.side_effect = [None, 'the queue is full']
+        self.assertFalse(self.backfill.run(self.channel))
+        self.assertTrue(self.queue.ingest_paused)
+        self.assertEqual([1], self.retagged())
+        self.assertEqual(2, self.backfill.counts('default')['planned'])
+
+    def test_file_that_failed_to_fetch_is_not_retagged(self):
+        def save(file_id, on_download):
+            if file_id == 2:
+                raise FetchError("Could not fetch the metadata of file_id 2.")
+            return 1
+        self.queue.save_image_to_queue.side_effect = save
+        self.assertFalse(self.backfill.run(self.channel))
+        self.assertEqual([1, 3], self.retagged())
+        counts = self.backfill.counts('default')
+        self.assertEqual((2, 1), (counts['retagged'], counts['planned']))
+
+        # The next run tries only the failed file again.
+        self.queue.save_image_to_queue.side_effect = lambda file_id, on_download: 1
+        self.queue.save_image_to_queue.reset_mock()
+        self.assertTrue(self.backfill.run(self.channel))
+        self.assertEqual([2], [call.args[0] for call in self.queue.save_image_to_queue.call_args_list])
+        self.assertEqual([1, 3, 2], self.retagged())
+
+    def test_nothing_to_backfill(self):
+        self.hydrus.hydrus_client.search_files.return_value = {'file_ids': []}
+        self.assertTrue(self.backfill.run(self.channel))
+        self.queue.save_image_to_queue.assert_not_called()
+        self.assertEqual("No backfill for default.", self.backfill.format_progress('default'))
+
+
+if __name__ == '__main__':
+    unittest.main()
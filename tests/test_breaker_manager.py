@@ -0,0 +1,138 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.breaker_manager import BreakerManager, BreakerOpenError, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@patch('modules.breaker_manager.LogManager.setup_logger', MagicMock())
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for CircuitBreaker"""
+
+    def make_breaker(self, **kwargs):
+        self.clock = FakeClock()
+        options = dict(window=4, failure_rate=0.5, min_calls=4, cooldown=10.0, max_cooldown=40.0, clock=self.clock)
+        options.update(kwargs)
+        return CircuitBreaker('hydrus', **options)
+
+    def test_opens_when_failure_rate_is_reached(self):
+        breaker = self.make_breaker()
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        breaker.record_failure()
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+
+    def test_needs_min_calls_to_open(self):
+        breaker = self.make_breaker()
+        for _ in range(3):
+            breaker.record_failure()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+
+    def test_probes_after_cooldown_and_closes(self):
+        probe = MagicMock()
+        breaker = self.make_breaker(probe=probe, min_calls=1)
+        breaker.record_failure()
+        self.clock.now += 9
+        self.assertFalse(breaker.allow())
+        probe.assert_not_called()
+        self.clock.now += 1
+        self.assertTrue(breaker.allow())
+        probe.assert_called_once()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+
+    def test_failed_probe_doubles_cooldown(self):
+        probe = MagicMock(side_effect=ConnectionError('down'))
+        breaker = self.make_breaker(probe=probe, min_calls=1)
+        breaker.record_failure()
+        for cooldown in (20.0, 40.0, 40.0):
+            self.clock.now += breaker.cooldown
+            self.assertFalse(breaker.allow())
+            self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+            self.assertEqual(cooldown, breaker.cooldown)
+
+    def test_one_call_is_let_through_while_half_open(self):
+        breaker = self.make_breaker(min_calls=1)
+        breaker.record_failure()
+        self.clock.now += 10
+        self.assertTrue(breaker.allow())
+        self.assertEqual(CircuitBreaker.HALF_OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        self.assertEqual(10.0, breaker.cooldown)
+
+    def test_call_raises_while_open(self):
+        breaker = self.make_breaker(min_calls=1)
+        breaker.record_failure()
+        func = MagicMock()
+        with self.assertRaises(BreakerOpenError):
+            breaker.call(func)
+        func.assert_not_called()
+
+    def test_only_failure_types_count(self):
+        breaker = self.make_breaker(min_calls=1, failure_types=(ConnectionError,))
+        with self.assertRaises(KeyError):
+            breaker.call(MagicMock(side_effect=KeyError('missing')))
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        with self.assertRaises(ConnectionError):
+            breaker.call(MagicMock(side_effect=ConnectionError('down')))
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+
+    def test_guarded_client(self):
+        breaker = self.make_breaker(min_calls=1)
+        client = SimpleNamespace(version=3, search_files=MagicMock(return_value=[1, 2]))
+        guarded = breaker.guard(client)
+        self.assertEqual(3, guarded.version)
+        self.assertEqual([1, 2], guarded.search_files(['tag']))
+        breaker.record_failure()
+        with self.assertRaises(BreakerOpenError):
+            guarded.search_files(['tag'])
+        client.search_files.assert_called_once_with(['tag'])
+
+
+@patch('modules.breaker_manager.LogManager.setup_logger', MagicMock())
+class TestBreakerManager(unittest.TestCase):
+    """Tests for BreakerManager"""
+
+    def test_from_config(self):
+        config = SimpleNamespace(breaker_window=8, breaker_failure_rate=0.25, breaker_min_calls=2,
+                                 breaker_cooldown=5.0, breaker_max_cooldown=50.0)
+        breaker = BreakerManager.from_config(config, 'telegram')
+        self.assertEqual('telegram', breaker.name)
+        self.assertEqual(8, breaker.outcomes.maxlen)
+        self.assertEqual(0.25, breaker.failure_rate)
+        self.assertEqual(5.0, breaker.cooldown)
+        self.assertEqual(50.0, breaker.max_cooldown)
+
+    def test_format_status(self):
+        clock = FakeClock()
+        hydrus = CircuitBreaker('hydrus', min_calls=1, cooldown=30.0, clock=clock)
+        telegram = CircuitBreaker('telegram', clock=clock)
+        hydrus.record_failure()
+        clock.now += 10
+        telegram.record_success()
+        manager = BreakerManager([hydrus, telegram, None])
+        self.assertEqual(
+            "hydrus: open (0/0 failed, opened 1x), probing in 20s\n"
+            "telegram: closed (0/1 failed, opened 0x)",
+            manager.format_status())
+
+
+if __name__ == '__main__':
+    unittest.main()
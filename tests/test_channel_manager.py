@@ -0,0 +1,242 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import tempfile
+import errno
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock wand before importing queue_manager
+sys.modules['wand'] = MagicMock()
+sys.modules['wand.image'] = MagicMock()
+
+from modules.blob_manager import BlobManager, FileTooLargeError, QuotaExceededError
+from modules.channel_manager import ChannelManager
+from modules.config_manager import ConfigManager, ConfigModel
+
+
+def make_config(**overrides):
+    settings = dict(
+        telegram_access_token='123:abc', telegram_channel=-100, telegram_bot_id=1, hydrus_api_key='key',
+        queue_tag='to_post', posted_tag='posted', admins=[1], delay=60, timezone=0,
+        max_image_dimension=10000, max_file_size=10000000, log_level=20,
+    )
+    settings.update(overrides)
+    config = ConfigManager.__new__(ConfigManager)
+    config.config_data = ConfigModel(**settings)
+    return config
+
+
+class TempQueueDirectory(unittest.TestCase):
+    """Runs each test in an empty directory with a 'queue/' folder."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        os.mkdir('queue')
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.directory.cleanup()
+
+
+@patch('modules.blob_manager.LogManager.setup_logger', MagicMock())
+class TestBlobManager(TempQueueDirectory):
+    """Tests for BlobManager"""
+
+    def test_file_is_fetched_once_and_shared(self):
+        blobs = BlobManager()
+        fetch = MagicMock(return_value=b'content')
+        self.assertTrue(blobs.acquire('a.jpg', fetch))
+        self.assertTrue(blobs.acquire('a.jpg', fetch))
+        fetch.assert_called_once()
+        self.assertEqual(2, blobs.refs['a.jpg'])
+
+    def test_file_is_deleted_with_last_reference(self):
+        blobs = BlobManager()
+        blobs.acquire('a.webm', lambda: b'content')
+        blobs.acquire('a.webm', lambda: b'content')
+        with open('queue/a.webm.mp4', 'wb') as file:
+            file.write(b'converted')
+        self.assertFalse(blobs.release('a.webm'))
+        self.assertTrue(os.path.exists('queue/a.webm'))
+        self.assertTrue(blobs.release('a.webm'))
+        self.assertFalse(os.path.exists('queue/a.webm'))
+        self.assertFalse(os.path.exists('queue/a.webm.mp4'))
+
+    def test_missing_content_is_not_referenced(self):
+        blobs = BlobManager()
+        self.assertFalse(blobs.acquire('a.jpg', lambda: None))
+        self.assertNotIn('a.jpg', blobs.refs)
+        self.assertFalse(os.path.exists('queue/a.jpg'))
+
+    def test_rebuild_counts_entries_across_queues(self):
+        blobs = BlobManager()
+        blobs.rebuild([[{'path': 'a.jpg'}, {'path': 'b.jpg'}], [{'path': 'a.jpg'}]])
+        self.assertEqual({'a.jpg': 2, 'b.jpg': 1}, blobs.refs)
+
+    def test_usage_is_tracked_as_files_are_stored_and_deleted(self):
+        blobs = BlobManager()
+        blobs.acquire('a.jpg', lambda: b'12345')
+        blobs.acquire('b.jpg', lambda: b'123')
+        self.assertEqual(8, blobs.bytes)
+        blobs.release('a.jpg')
+        self.assertEqual(3, blobs.bytes)
+        blobs.rebuild([[{'path': 'b.jpg'}]])
+        self.assertEqual(3, blobs.bytes)
+
+    def test_rebuild_counts_stored_files_without_entries(self):
+        # E.g. downloaded by a backfill stopped before it queued them.
+        orphan = 'f' * 64 + '.png'
+        for filename, content in ((orphan, b'1234'), (orphan + '.mp4', b'converted'), ('queue.json', b'{}')):
+            with open(os.path.join('queue', filename), 'wb') as file:
+                file.write(content)
+        blobs = BlobManager(max_bytes=6)
+        blobs.acquire('b.jpg', lambda: b'12')
+        blobs.rebuild([[{'path': 'b.jpg'}]])
+        self.assertEqual(6, blobs.bytes)
+        self.assertIsNotNone(blobs.quota_exceeded(1))
+        # Queueing the stored file shares it, and releasing it frees its bytes.
+        fetch = MagicMock()
+        self.assertTrue(blobs.acquire(orphan, fetch))
+        fetch.assert_not_called()
+        self.assertEqual(6, blobs.bytes)
+        blobs.release(orphan)
+        self.assertEqual(2, blobs.bytes)
+
+    def test_byte_quota(self):
+        blobs = BlobManager(max_bytes=6)
+        blobs.acquire('a.jpg', lambda: b'12345')
+        self.assertIsNone(blobs.quota_exceeded())
+        self.assertIsNotNone(blobs.quota_exceeded(2))
+        with self.assertRaises(QuotaExceededError):
+            blobs.acquire('b.jpg', lambda: b'123')
+        self.assertFalse(os.path.exists('queue/b.jpg'))
+        self.assertNotIn('b.jpg', blobs.refs)
+
+    def test_quota_is_checked_before_fetching(self):
+        blobs = BlobManager(max_bytes=6)
+        blobs.acquire('a.jpg', lambda: b'12345')
+        fetch = MagicMock(return_value=b'123')
+        with self.assertRaises(QuotaExceededError):
+            blobs.acquire('b.jpg', fetch, size=3)
+        # A file that could never fit is refused, rather than waited for.
+        with self.assertRaises(FileTooLargeError):
+            blobs.acquire('c.jpg', fetch, size=7)
+        fetch.assert_not_called()
+        # A stored file is shared whatever its size.
+        self.assertTrue(blobs.acquire('a.jpg', fetch, size=5))
+
+    @patch('modules.blob_manager.shutil.disk_usage')
+    def test_free_space_is_checked_at_most_once_per_interval(self, disk_usage):
+        disk_usage.return_value = SimpleNamespace(free=1000)
+        blobs = BlobManager(min_free_bytes=500, free_check_interval=60.0)
+        blobs.acquire('a.jpg', lambda: b'x' * 300)
+        self.assertEqual(700, blobs.free_bytes())
+        self.assertIsNotNone(blobs.quota_exceeded(300))
+        disk_usage.assert_called_once()
+
+    def test_full_disk_raises_quota_error(self):
+        blobs = BlobManager()
+        with patch('builtins.open', side_effect=OSError(errno.ENOSPC, 'No space left on device')):
+            with self.assertRaises(QuotaExceededError):
+                blobs.acquire('a.jpg', lambda: b'content')
+        self.assertNotIn('a.jpg', blobs.refs)
+
+
+class TestChannelConfig(unittest.TestCase):
+    """Tests for the channel settings of ConfigModel and ConfigManager"""
+
+    def test_default_channel_from_top_level_settings(self):
+        channels = make_config().config_data.get_channels()
+        self.assertEqual(['default'], [channel.name for channel in channels])
+        self.assertEqual(('to_post', -100, 60), (channels[0].queue_tag, channels[0].telegram_channel, channels[0].delay))
+
+    def test_channel_view_overrides_only_set_values(self):
+        config = make_config(post_batch_size=3, channels=[
+            {'name': 'art', 'telegram_channel': -200, 'queue_tag': 'art', 'selection_strategy': 'fifo'},
+        ])
+        view = config.for_channel(config.config_data.channels[0])
+        self.assertEqual((-200, 'art', 'fifo'), (view.config_data.telegram_channel, view.config_data.queue_tag, view.config_data.selection_strategy))
+        self.assertEqual((60, 3), (view.config_data.delay, view.config_data.post_batch_size))
+        self.assertEqual(-100, config.config_data.telegram_channel)
+
+    def test_channel_names_must_be_unique(self):
+        channel = {'name': 'art', 'telegram_channel': -200, 'queue_tag': 'art'}
+        with self.assertRaises(ValueError):
+            make_config(channels=[channel, channel])
+
+
+@patch('modules.blob_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.channel_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.queue_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.ledger_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.media_cache_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.phash_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.plan_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.selection_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.tag_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.file_manager.LogManager.setup_logger', MagicMock())
+class TestChannelManager(TempQueueDirectory):
+    """Tests for ChannelManager"""
+
+    def make_channels(self):
+        return ChannelManager(make_config(channels=[
+            {'name': 'default', 'telegram_channel': -100, 'queue_tag': 'to_post'},
+            {'name': 'art', 'telegram_channel': -200, 'queue_tag': 'art', 'delay': 30},
+        ]))
+
+    def test_channels_share_services_but_not_queues(self):
+        channels = self.make_channels()
+        default, art = channels.default, channels.get('art')
+        self.assertEqual('queue/queue.json', default.queue.queue_file)
+        self.assertEqual('queue/queue-art.json', art.queue.queue_file)
+        self.assertEqual('queue/plan-art.json', art.queue.plan.plan_file)
+        self.assertIs(default.queue.blobs, art.queue.blobs)
+        self.assertIs(default.queue.ledger, art.queue.ledger)
+        self.assertEqual((60, 30), (default.delay, art.delay))
+        self.assertEqual(-200, art.queue.config.telegram_channel)
+        channels.ledger.close()
+
+    def test_deleting_from_one_channel_keeps_the_shared_file(self):
+        channels = self.make_channels()
+        for channel in channels:
+            queue = channel.queue
+            channels.blobs.acquire('a.jpg', lambda: b'content')
+            queue.queue_data = {'queue': [queue.entries.create('a', '.jpg')]}
+            queue.queue_loaded = True
+        channels.default.queue.delete_from_queue('queue/a.jpg', 0)
+        self.assertTrue(os.path.exists('queue/a.jpg'))
+        channels.get('art').queue.delete_from_queue('queue/a.jpg', 0)
+        self.assertFalse(os.path.exists('queue/a.jpg'))
+        channels.ledger.close()
+
+    def test_load_counts_references_from_saved_queues(self):
+        channels = self.make_channels()
+        for channel in channels:
+            channel.queue.queue_data = {'queue': [channel.queue.entries.create('a', '.jpg')]}
+            channel.queue.save_queue()
+        channels.load()
+        self.assertEqual({'a.jpg': 2}, channels.blobs.refs)
+        channels.ledger.close()
+
+    def test_adaptive_delay_follows_queue_depth(self):
+        channels = ChannelManager(make_config(cadence_mode='adaptive', cadence_target_days=1.0))
+        queue = channels.default.queue
+        queue.queue_data = {'queue': [queue.entries.create(str(n), '.jpg') for n in range(24)]}
+        queue.queue_loaded = True
+        self.assertEqual(60, channels.default.get_delay())
+        channels.ledger.close()
+
+    def test_fixed_delay_by_default(self):
+        channels = self.make_channels()
+        self.assertEqual(30, channels.get('art').get_delay())
+        channels.ledger.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import threading
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.dispatch_manager import DispatchManager
+
+
+def make_update(update_id, chat_id, text='x'):
+    return {'update_id': update_id, 'message': {'chat': {'id': chat_id}, 'from': {'id': chat_id}, 'text': text}}
+
+
+class TestDispatchManager(unittest.TestCase):
+    """Tests for DispatchManager"""
+
+    @patch('modules.dispatch_manager.LogManager.setup_logger', MagicMock())
+    def make_dispatcher(self, handler, **kwargs):
+        return DispatchManager(handler, **kwargs)
+
+    def test_messages_from_one_chat_keep_their_order(self):
+        handled = []
+        dispatcher = self.make_dispatcher(lambda message: handled.append(message['text']), workers=3)
+        dispatcher.start()
+        for n in range(20):
+            self.assertTrue(dispatcher.submit(make_update(n, chat_id=42, text=str(n))))
+        dispatcher.stop()
+        self.assertEqual([str(n) for n in range(20)], handled)
+
+    def test_duplicate_update_is_dropped(self):
+        handler = MagicMock()
+        dispatcher = self.make_dispatcher(handler)
+        dispatcher.start()
+        self.assertTrue(dispatcher.submit(make_update(1, chat_id=1)))
+        self.assertTrue(dispatcher.submit(make_update(1, chat_id=1)))
+        dispatcher.stop()
+        handler.assert_called_once()
+
+    def test_full_queue_rejects_and_accepts_redelivery(self):
+        release = threading.Event()
+        dispatcher = self.make_dispatcher(lambda message: release.wait(5), workers=1, queue_size=1)
+        dispatcher.start()
+        self.assertTrue(dispatcher.submit(make_update(1, chat_id=1)))
+        # Give the worker time to take update 1, then fill its queue with update 2.
+        for _ in range(100):
+            if dispatcher.pending() == 0:
+                break
+            threading.Event().wait(0.01)
+        self.assertTrue(dispatcher.submit(make_update(2, chat_id=1)))
+        self.assertFalse(dispatcher.submit(make_update(3, chat_id=1)))
+        release.set()
+        dispatcher.stop()
+        # The rejected update was forgotten, so its redelivery is accepted.
+        self.assertTrue(dispatcher.submit(make_update(3, chat_id=1)))
+
+    def test_handler_errors_do_not_stop_the_worker(self):
+        handled = []
+
+        def handler(message):
+            if message['text'] == 'boom':
+                raise ValueError('boom')
+            handled.append(message['text'])
+
+        dispatcher = self.make_dispatcher(handler, workers=1)
+        dispatcher.start()
+        dispatcher.submit(make_update(1, chat_id=1, text='boom'))
+        dispatcher.submit(make_update(2, chat_id=1, text='ok'))
+        dispatcher.stop()
+        self.assertEqual(['ok'], handled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import json
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_manager import default_tag_rules
+from modules.entry_manager import EntryManager, QueueEntry
+from modules.tag_manager import TagManager
+
+
+class TestEntryManager(unittest.TestCase):
+    """Tests for EntryManager and QueueEntry"""
+
+    @patch('modules.entry_manager.LogManager.setup_logger', MagicMock())
+    @patch('modules.tag_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        config = SimpleNamespace(config_data=SimpleNamespace(tag_rules=default_tag_rules()))
+        self.tags = TagManager(config)
+        self.entries = EntryManager(self.tags)
+
+    def make_entry(self, file_hash='abc', creator='creator:some artist (artist)'):
+        return self.entries.create(
+            file_hash, '.jpg',
+            tags=[creator, 'title:a series', 'meta:ignored'],
+            sauce='https://www.furaffinity.net/view/1/, https://e621.net/posts/2',
+            size=1234, added=1.5,
+        )
+
+    def test_entry_reads_like_a_queue_dict(self):
+        entry = self.make_entry()
+        self.assertEqual('abc.jpg', entry['path'])
+        self.assertEqual('https://www.furaffinity.net/view/1/, https://e621.net/posts/2', entry['sauce'])
+        self.assertEqual(self.tags.render_tags(['creator:some artist (artist)'])['creator'], entry['creator'])
+        self.assertEqual('A Series', entry.get('title'))
+        self.assertNotIn('character', entry)
+        self.assertIsNone(entry.get('rendered'))
+        with self.assertRaises(KeyError):
+            entry['character']
+
+    def test_only_rendered_can_be_assigned(self):
+        entry = self.make_entry()
+        entry['rendered'] = {'version': 1, 'markup': '&caption=x'}
+        self.assertEqual('&caption=x', entry['rendered']['markup'])
+        with self.assertRaises(KeyError):
+            entry['title'] = 'x'
+
+    def test_shared_strings_are_interned(self):
+        first = self.make_entry('a')
+        second = self.make_entry('b')
+        self.assertIs(first.creator_tags[0], second.creator_tags[0])
+        self.assertIs(first.ext, second.ext)
+
+    def test_round_trip_writes_each_string_once(self):
+        queue_data = {'queue': [self.make_entry('a'), self.make_entry('b')]}
+        queue_data['queue'][0]['rendered'] = {'version': 1, 'markup': '&caption=x', 'album_caption': 'x'}
+        encoded = json.loads(json.dumps(self.entries.encode(queue_data)))
+
+        self.assertEqual(2, encoded['version'])
+        self.assertEqual(1, encoded['strings'].count('creator:some artist (artist)'))
+
+        decoded = self.entries.decode(encoded)['queue']
+        self.assertEqual(['a.jpg', 'b.jpg'], [entry['path'] for entry in decoded])
+        self.assertEqual(queue_data['queue'][0]['creator'], decoded[0]['creator'])
+        self.assertEqual(1234, decoded[1].size)
+        # Renders are rebuilt when needed rather than stored.
+        self.assertNotIn('r', encoded['queue'][0])
+        self.assertIsNone(decoded[0].rendered)
+
+    def test_legacy_queue_is_converted(self):
+        legacy = {'queue': [{
+            'path': 'abc.webm',
+            'creator': '<a href="x">Old</a>',
+            'sauce': 'https://www.one/, https://www.two/',
+            'rendered': {'version': 1, 'markup': 'm', 'album_caption': 'c'},
+        }]}
+        entry = self.entries.decode(legacy)['queue'][0]
+        self.assertIsInstance(entry, QueueEntry)
+        self.assertEqual(('abc', '.webm'), (entry.hash, entry.ext))
+        self.assertEqual('<a href="x">Old</a>', entry['creator'])
+        self.assertEqual('https://www.one/, https://www.two/', entry['sauce'])
+        self.assertIsNone(entry.rendered)
+
+        # Saving writes the converted entry in the compact format.
+        again = self.entries.decode(json.loads(json.dumps(self.entries.encode({'queue': [entry]}))))['queue'][0]
+        self.assertEqual('<a href="x">Old</a>', again['creator'])
+
+    def test_update_reports_caption_changes_only(self):
+        entry = self.make_entry()
+        self.assertFalse(self.entries.update(entry, ['creator:some artist (artist)', 'title:a series', 'meta:new'],
+                                             entry.sauce, 'digest'))
+        self.assertEqual('digest', entry.digest)
+        self.assertTrue(self.entries.update(entry, ['creator:other artist'], entry.sauce, 'digest2'))
+        self.assertEqual(('creator:other artist',), entry.creator_tags)
+        self.assertEqual((), entry.title_tags)
+
+    def test_digest_and_refresh_time_round_trip(self):
+        entry = self.make_entry()
+        entry.digest = 'abcd'
+        entry.refreshed = 9.0
+        decoded = self.entries.decode(json.loads(json.dumps(self.entries.encode({'queue': [entry]}))))['queue'][0]
+        self.assertEqual(('abcd', 9.0), (decoded.digest, decoded.refreshed))
+
+    def test_empty_file_decodes_to_empty_queue(self):
+        self.assertEqual({'queue': []}, self.entries.decode({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.ledger_manager import LedgerManager
+
+
+class TestLedgerManager(unittest.TestCase):
+    """Tests for LedgerManager"""
+
+    @patch('modules.ledger_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        self.ledger = LedgerManager(':memory:')
+        self.ledger.record('a', -100, 1, 1000, posted_at=100.0)
+        self.ledger.record('b', -100, 2, 0, posted_at=200.0)
+        self.ledger.record('a', -200, 3, 500, posted_at=86400.0 + 50)
+
+    def tearDown(self):
+        self.ledger.close()
+
+    def test_was_posted(self):
+        self.assertTrue(self.ledger.was_posted('a'))
+        self.assertFalse(self.ledger.was_posted('c'))
+
+    def test_was_posted_to_chat(self):
+        self.assertTrue(self.ledger.was_posted('b', -100))
+        self.assertFalse(self.ledger.was_posted('b', -200))
+
+    def test_queued_count_over_window(self):
+        self.ledger.record_queued('a', -100, queued_at=100.0)
+        self.ledger.record_queued('b', -100, queued_at=200.0)
+        self.ledger.record_queued('c', -200, queued_at=300.0)
+        self.assertEqual(3, self.ledger.queued_count())
+        self.assertEqual(1, self.ledger.queued_count(since=150.0, chat_id=-100))
+
+    def test_get_returns_every_post_oldest_first(self):
+        posts = self.ledger.get('a')
+        self.assertEqual([1, 3], [post['message_id'] for post in posts])
+        self.assertEqual('-200', posts[1]['chat_id'])
+        self.assertEqual([], self.ledger.get('c'))
+
+    def test_stats_over_window(self):
+        self.assertEqual({'posts': 3, 'bytes': 1500, 'first': 100.0, 'last': 86450.0}, self.ledger.stats())
+        window = self.ledger.stats(since=150.0, until=86400.0)
+        self.assertEqual((1, 0), (window['posts'], window['bytes']))
+        self.assertEqual(2, self.ledger.stats(chat_id=-100)['posts'])
+
+    def test_empty_window(self):
+        self.assertEqual({'posts': 0, 'bytes': 0, 'first': None, 'last': None}, self.ledger.stats(since=10 ** 9))
+
+    def test_histogram_by_day(self):
+        days = self.ledger.histogram(86400)
+        self.assertEqual([(0, 2, 1000), (86400, 1, 500)], [(day['start'], day['posts'], day['bytes']) for day in days])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import threading
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.lock_manager import ReadWriteLock
+
+
+class TestReadWriteLock(unittest.TestCase):
+    """Tests for ReadWriteLock"""
+
+    def setUp(self):
+        self.lock = ReadWriteLock()
+
+    def in_thread(self, func):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func()))
+        thread.start()
+        thread.join(5)
+        return result[0]
+
+    def test_readers_share_the_lock(self):
+        with self.lock.read():
+            self.lock.acquire_read()
+            self.lock.release_read()
+            self.assertTrue(self.in_thread(lambda: (self.lock.acquire_read(), self.lock.release_read()) and True))
+
+    def test_writer_excludes_readers_and_writers(self):
+        with self.lock.read():
+            self.assertFalse(self.in_thread(lambda: self.lock.acquire_write(0.05)))
+        with self.lock.write():
+            self.assertFalse(self.in_thread(lambda: self.lock.acquire_write(0.05)))
+        self.assertTrue(self.lock.acquire_write(0.05))
+        self.lock.release_write()
+
+    def test_writer_is_reentrant_and_may_read(self):
+        with self.lock.write():
+            with self.lock.write():
+                with self.lock.read():
+                    self.assertTrue(self.lock.write_held())
+            self.assertTrue(self.lock.write_held())
+        self.assertFalse(self.lock.write_held())
+        self.assertFalse(self.lock.read_held())
+
+    def test_reader_cannot_start_writing(self):
+        with self.lock.read():
+            with self.assertRaises(RuntimeError):
+                self.lock.acquire_write()
+
+    def test_waiting_writer_goes_before_new_readers(self):
+        order = []
+        self.lock.acquire_read()
+        writer = threading.Thread(target=lambda: (self.lock.acquire_write(), order.append('writer'), self.lock.release_write()))
+        writer.start()
+        while not self.lock.writers_waiting:
+            pass
+        reader = threading.Thread(target=lambda: (self.lock.acquire_read(), order.append('reader'), self.lock.release_read()))
+        reader.start()
+        self.lock.release_read()
+        writer.join(5)
+        reader.join(5)
+        self.assertEqual(['writer', 'reader'], order)
+
+    def test_readers_go_ahead_when_a_writer_gives_up(self):
+        self.lock.acquire_read()
+        self.assertFalse(self.in_thread(lambda: self.lock.acquire_write(0.05)))
+        self.assertTrue(self.in_thread(lambda: (self.lock.acquire_read(), self.lock.release_read()) and True))
+        self.lock.release_read()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.media_cache_manager import MediaCacheManager
+
+
+class TestExtractFileIds(unittest.TestCase):
+    """Tests for MediaCacheManager.extract_file_ids()"""
+
+    def test_photo_uses_largest_size(self):
+        message = {'photo': [
+            {'file_id': 'small', 'file_unique_id': 'u1'},
+            {'file_id': 'large', 'file_unique_id': 'u2'},
+        ]}
+        result = MediaCacheManager.extract_file_ids(message, 'photo')
+        self.assertEqual({'file_id': 'large', 'file_unique_id': 'u2'}, result)
+
+    def test_video(self):
+        message = {'video': {'file_id': 'vid', 'file_unique_id': 'u3'}}
+        result = MediaCacheManager.extract_file_ids(message, 'video')
+        self.assertEqual('vid', result['file_id'])
+
+    def test_missing_media_returns_none(self):
+        self.assertIsNone(MediaCacheManager.extract_file_ids({}, 'photo'))
+        self.assertIsNone(MediaCacheManager.extract_file_ids({'photo': []}, 'photo'))
+        self.assertIsNone(MediaCacheManager.extract_file_ids(None, 'video'))
+
+
+class TestRememberAndForget(unittest.TestCase):
+    """Tests for MediaCacheManager.remember() / get() / forget()"""
+
+    @patch.object(MediaCacheManager, '__init__', lambda self, cache_file: None)
+    def setUp(self):
+        self.cache = MediaCacheManager(None)
+        self.cache.logger = MagicMock()
+        self.cache.files = MagicMock()
+        self.cache.cache_file = 'queue/media_cache.json'
+        self.cache.cache_data = {"media": {}}
+
+    def test_remember_then_get(self):
+        message = {'photo': [{'file_id': 'abc', 'file_unique_id': 'u'}]}
+        self.assertTrue(self.cache.remember('hash1', 'photo', message))
+        entry = self.cache.get('hash1')
+        self.assertEqual('photo', entry['type'])
+        self.assertEqual('abc', entry['file_id'])
+        self.cache.files.operation.assert_called_once()
+
+    def test_remember_without_file_id_is_ignored(self):
+        self.assertFalse(self.cache.remember('hash1', 'photo', {}))
+        self.assertIsNone(self.cache.get('hash1'))
+        self.cache.files.operation.assert_not_called()
+
+    def test_unknown_media_type_is_ignored(self):
+        self.assertFalse(self.cache.remember('hash1', 'document', {'document': {'file_id': 'x'}}))
+
+    def test_forget(self):
+        self.cache.remember('hash1', 'video', {'video': {'file_id': 'v'}})
+        self.cache.forget('hash1')
+        self.assertIsNone(self.cache.get('hash1'))
+
+
+if __name__ == "__main__":
+    unittest.main()
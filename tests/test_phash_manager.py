@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import tempfile
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock wand before importing phash_manager
+sys.modules['wand'] = MagicMock()
+sys.modules['wand.image'] = MagicMock()
+
+from modules.phash_manager import PhashManager
+
+
+def file_hash(n):
+    return f"{n:064x}"
+
+
+class TestPhashManager(unittest.TestCase):
+    """Tests for PhashManager"""
+
+    @patch('modules.phash_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        self.phash = PhashManager('phash_index.npz')
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.directory.cleanup()
+
+    def test_dhash_pixels_sets_a_bit_per_brighter_neighbour(self):
+        # Every row increases left to right, so every bit is set.
+        self.assertEqual(2 ** 64 - 1, PhashManager.dhash_pixels(list(range(9)) * 8))
+        self.assertEqual(0, PhashManager.dhash_pixels([5] * 72))
+        # Only the first pixel pair of the first row brightens: the most significant bit.
+        self.assertEqual(1 << 63, PhashManager.dhash_pixels([0, 1] + [1] * 70))
+
+    def test_find_closest_within_threshold(self):
+        self.phash.add(file_hash(1), 0b1111)
+        self.phash.add(file_hash(2), 0b0000)
+        self.assertEqual((file_hash(2), 1), self.phash.find(0b0001, threshold=2))
+        self.assertIsNone(self.phash.find(0xFF00, threshold=2))
+
+    def test_find_can_exclude_the_file_itself(self):
+        self.phash.add(file_hash(1), 42)
+        self.assertIsNone(self.phash.find(42, threshold=0, exclude=file_hash(1)))
+
+    def test_grows_past_initial_capacity(self):
+        for n in range(PhashManager.initial_capacity + 5):
+            self.phash.add(file_hash(n), n)
+        self.assertEqual(PhashManager.initial_capacity + 5, self.phash.count)
+        self.assertEqual((file_hash(1027), 0), self.phash.find(1027, threshold=0))
+
+    def test_remove_keeps_other_entries(self):
+        for n in range(3):
+            self.phash.add(file_hash(n), n << 8)
+        self.phash.remove(file_hash(0))
+        self.assertEqual(2, self.phash.count)
+        self.assertIsNone(self.phash.find(0, threshold=0))
+        self.assertEqual((file_hash(2), 0), self.phash.find(2 << 8, threshold=0))
+
+    @patch('modules.phash_manager.LogManager.setup_logger', MagicMock())
+    def test_save_and_load(self):
+        # A key ending in zero bytes must survive the round trip.
+        key = 'ab' + '00' * 31
+        self.phash.add(key, 2 ** 63 + 7)
+        self.phash.save()
+        loaded = PhashManager('phash_index.npz')
+        self.assertEqual((key, 0), loaded.find(2 ** 63 + 7, threshold=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
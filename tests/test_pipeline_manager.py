@@ -0,0 +1,147 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import threading
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.pipeline_manager import PipelineManager, RetryPolicy, Stage
+from modules.breaker_manager import BreakerOpenError
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Tests for RetryPolicy"""
+
+    @patch('modules.pipeline_manager.time.sleep')
+    def test_retries_until_success(self, sleep):
+        func = MagicMock(side_effect=[RuntimeError('a'), RuntimeError('b'), 'done'])
+        self.assertEqual('done', RetryPolicy(3, 1.0, 1.5).run(func, MagicMock(), 'job'))
+        self.assertEqual([((1.0,),), ((1.5,),)], sleep.call_args_list)
+
+    @patch('modules.pipeline_manager.time.sleep')
+    def test_raises_after_last_attempt(self, sleep):
+        func = MagicMock(side_effect=RuntimeError('down'))
+        with self.assertRaises(RuntimeError):
+            RetryPolicy(2).run(func, MagicMock(), 'job')
+        self.assertEqual(2, func.call_count)
+
+    @patch('modules.pipeline_manager.time.sleep')
+    def test_open_breaker_is_not_retried(self, sleep):
+        func = MagicMock(side_effect=BreakerOpenError('open'))
+        with self.assertRaises(BreakerOpenError):
+            RetryPolicy(3).run(func, MagicMock(), 'job')
+        self.assertEqual(1, func.call_count)
+        sleep.assert_not_called()
+
+
+class TestStage(unittest.TestCase):
+    """Tests for Stage"""
+
+    def test_waiting_key_is_not_queued_twice(self):
+        stage = Stage('ingest', RetryPolicy(1), 2, MagicMock())
+        self.assertTrue(stage.submit('ingest:a', MagicMock()))
+        self.assertFalse(stage.submit('ingest:a', MagicMock()))
+        self.assertTrue(stage.submit('ingest:b', MagicMock()))
+        # The queue is full.
+        self.assertFalse(stage.submit('ingest:c', MagicMock()))
+
+    def test_worker_runs_tasks(self):
+        stage = Stage('prepare', RetryPolicy(1), 2, MagicMock())
+        done = threading.Event()
+        stage.start()
+        stage.submit('prepare:a', MagicMock(side_effect=RuntimeError('fails')))
+        stage.submit('prepare:b', done.set)
+        self.assertTrue(done.wait(1))
+        stage.stop()
+        self.assertFalse(stage.thread.is_alive())
+
+
+@patch('modules.pipeline_manager.LogManager.setup_logger', MagicMock())
+class TestPipelineManager(unittest.TestCase):
+    """Tests for PipelineManager"""
+
+    def setUp(self):
+        self.channel = SimpleNamespace(name='default', queue=MagicMock(), queue_tag='to_post', delay=60,
+                                       config=SimpleNamespace(config_data=SimpleNamespace(ingest_delay=15)),
+                                       get_delay=MagicMock(return_value=60))
+        self.channels = MagicMock()
+        self.channels.__len__.return_value = 1
+        self.channels.__iter__.side_effect = lambda: iter([self.channel])
+        self.channels.default = self.channel
+        self.config = SimpleNamespace(config_data=SimpleNamespace(ingest_retries=2, post_retries=2))
+        self.hydrus = MagicMock()
+        self.scheduler = MagicMock()
+        self.pipeline = PipelineManager(self.config, self.channels, self.hydrus, self.scheduler)
+
+    @patch('modules.pipeline_manager.time.sleep')
+    def test_failed_post_is_retried_without_ingest(self, sleep):
+        self.channel.queue.process_queue.side_effect = [RuntimeError('telegram down'), None]
+        self.pipeline.on_post(self.channel)
+        # The retry is scheduled, not waited for on the scheduler thread.
+        sleep.assert_not_called()
+        self.scheduler.schedule_update.assert_not_called()
+        when, callback, args, name = self.scheduler.schedule_at.call_args.args
+        self.assertEqual((self.pipeline.on_post, (self.channel, 2), 'post:default'), (callback, args, name))
+        callback(*args)
+        self.assertEqual(2, self.channel.queue.process_queue.call_count)
+        self.hydrus.get_new_hydrus_files.assert_not_called()
+        self.scheduler.schedule_update.assert_called_once_with(self.pipeline.on_post, 60, (self.channel,), 'post:default')
+
+    def test_open_breaker_is_not_retried(self):
+        self.channel.queue.process_queue.side_effect = BreakerOpenError('open')
+        self.pipeline.on_post(self.channel)
+        self.scheduler.schedule_at.assert_not_called()
+        self.scheduler.schedule_update.assert_called_once()
+
+    def test_post_is_rescheduled_after_giving_up(self):
+        self.pipeline.post_retry = RetryPolicy(1)
+        self.channel.queue.process_queue.side_effect = RuntimeError('telegram down')
+        self.pipeline.on_post(self.channel)
+        self.scheduler.schedule_update.assert_called_once()
+
+    def test_ingest_runs_on_its_own_stage_and_cadence(self):
+        self.pipeline.on_ingest(self.channel)
+        self.hydrus.get_new_hydrus_files.assert_not_called()
+        self.assertIn('ingest:default', self.pipeline.ingest.waiting)
+        self.scheduler.schedule_update.assert_called_once_with(self.pipeline.on_ingest, 15, (self.channel,), 'ingest:default')
+
+    def test_ingest_hands_off_to_prepare(self):
+        self.pipeline.run_ingest(self.channel)
+        self.hydrus.get_new_hydrus_files.assert_called_once_with(self.channel.queue, 'to_post')
+        self.assertIn('prepare:default', self.pipeline.prepare.waiting)
+
+    def test_ingest_resumes_pending_backfill(self):
+        self.pipeline.backfill = MagicMock()
+        self.pipeline.backfill.has_pending.return_value = True
+        self.pipeline.run_ingest(self.channel)
+        self.pipeline.backfill.run.assert_called_once()
+        self.hydrus.get_new_hydrus_files.assert_not_called()
+
+    def test_post_that_makes_room_resumes_paused_ingest(self):
+        self.channel.queue.ingest_paused = True
+        self.channel.queue.quota_exceeded.return_value = None
+        self.pipeline.on_post(self.channel)
+        self.scheduler.trigger.assert_called_once_with('ingest:default')
+
+    def test_post_now_triggers_the_post_job(self):
+        self.scheduler.trigger.return_value = True
+        self.assertTrue(self.pipeline.post_now())
+        self.scheduler.trigger.assert_called_once_with('post:default')
+
+    def test_verify_runs_on_its_own_stage(self):
+        self.assertFalse(self.pipeline.verify_now())
+        self.pipeline.verifier = MagicMock()
+        self.pipeline.verifier.run.return_value = {'checked': 1}
+        on_done = MagicMock()
+        self.assertTrue(self.pipeline.verify_now(on_done))
+        self.assertFalse(self.pipeline.verify_now(on_done))
+        _key, run_verify = self.pipeline.verify.tasks.get_nowait()
+        run_verify()
+        on_done.assert_called_once_with({'checked': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
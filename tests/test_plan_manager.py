@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import tempfile
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.plan_manager import PlanManager
+from modules.selection_manager import SelectionManager
+
+
+@patch('modules.file_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.plan_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.selection_manager.LogManager.setup_logger', MagicMock())
+class TestPlanManager(unittest.TestCase):
+    """Tests for PlanManager"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        os.mkdir('queue')
+        self.queue = [{'path': f"{n}.jpg"} for n in range(20)]
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.directory.cleanup()
+
+    def make_plan(self, strategy='uniform', lookahead=5, seed=1):
+        config = SimpleNamespace(config_data=SimpleNamespace(
+            selection_strategy=strategy, selection_age_half_life=1.0,
+            selection_creator_window=2, selection_creator_penalty=0.25))
+        selector = SelectionManager(config)
+        plan = PlanManager(selector, 'plan.json', lookahead=lookahead, seed=seed)
+        selector.rebuild(self.queue)
+        return plan
+
+    def test_refresh_fills_lookahead_with_distinct_files(self):
+        plan = self.make_plan()
+        plan.refresh()
+        self.assertEqual(5, len(set(plan.upcoming)))
+
+    def test_same_seed_gives_same_order(self):
+        first = self.make_plan()
+        first.refresh()
+        os.remove('queue/plan.json')
+        second = self.make_plan()
+        second.refresh()
+        self.assertEqual(first.upcoming, second.upcoming)
+
+    def test_plan_and_generator_survive_restart(self):
+        uninterrupted = self.make_plan()
+        uninterrupted.refresh()
+        planned = list(uninterrupted.upcoming)
+        for path in planned[:2]:
+            self.queue = [entry for entry in self.queue if entry['path'] != path]
+            uninterrupted.selector.remove(path)
+            uninterrupted.remove(path)
+
+        # A restarted bot loads the saved plan and draws the same files next.
+        restarted = self.make_plan(seed=999)
+        self.assertEqual(planned[2:], restarted.upcoming)
+        uninterrupted.refresh()
+        restarted.refresh()
+        self.assertEqual(uninterrupted.upcoming, restarted.upcoming)
+
+    def test_removed_files_leave_the_plan(self):
+        plan = self.make_plan()
+        head = plan.peek(1)[0]['path']
+        plan.selector.remove(head)
+        self.assertNotIn(head, [entry['path'] for entry in plan.peek()])
+        self.assertEqual(5, len(plan.upcoming))
+
+    def test_defer_moves_file_to_the_back(self):
+        plan = self.make_plan(strategy='fifo')
+        self.assertEqual(['0.jpg', '1.jpg'], [entry['path'] for entry in plan.peek(2)])
+        plan.defer('0.jpg')
+        self.assertEqual(['1.jpg', '2.jpg', '3.jpg', '4.jpg', '0.jpg'], plan.upcoming)
+
+    def test_plan_for_another_strategy_is_discarded(self):
+        self.make_plan(strategy='fifo').refresh()
+        plan = self.make_plan(strategy='uniform')
+        self.assertEqual([], plan.upcoming)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import subprocess
+import threading
+import time
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.process_manager import ProcessManager, ProcessError, ProcessTimeoutError, resource
+
+
+def python(code: str) -> list:
+    return [sys.executable, '-c', code]
+
+
+class TestProcessManager(unittest.TestCase):
+    """Tests for ProcessManager"""
+
+    @patch('modules.process_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        self.config = SimpleNamespace(config_data=SimpleNamespace(
+            media_tool_timeout=10.0, media_tool_cpu_seconds=None, media_tool_stderr_lines=3))
+        self.processes = ProcessManager(self.config)
+
+    def tearDown(self):
+        self.processes.stop()
+
+    def test_successful_run(self):
+        result = self.processes.run(python("import sys; sys.stderr.write('note\\n')"))
+        self.assertEqual(0, result.returncode)
+        self.assertEqual('note\n', result.stderr)
+        self.assertEqual(1, self.processes.metrics[os.path.basename(sys.executable)]['runs'])
+
+    def test_failure_keeps_the_last_stderr_lines(self):
+        code = "import sys\nfor n in range(100): sys.stderr.write(f'line {n}\\n')\nsys.exit(3)"
+        with self.assertRaises(ProcessError) as raised:
+            self.processes.run(python(code))
+        self.assertIsInstance(raised.exception, subprocess.CalledProcessError)
+        self.assertEqual(3, raised.exception.returncode)
+        self.assertEqual('line 97\nline 98\nline 99\n', raised.exception.stderr)
+        self.assertIn('line 99', str(raised.exception))
+
+    def test_timeout_kills_the_tool(self):
+        started = time.monotonic()
+        with self.assertRaises(ProcessTimeoutError):
+            self.processes.run(python("import time; time.sleep(30)"), timeout=0.5)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(set(), self.processes.children)
+
+    @unittest.skipUnless(hasattr(resource, 'prlimit'), "prlimit() is only available on Linux")
+    def test_cpu_limit_kills_the_tool(self):
+        self.config.config_data.media_tool_cpu_seconds = 1
+        with self.assertRaises(ProcessError) as raised:
+            self.processes.run(python("while True: pass"))
+        self.assertIn('CPU time', str(raised.exception))
+
+    def test_progress_is_parsed(self):
+        code = "print('fps=10.0\\nspeed=1.0x\\nprogress=continue\\nfps=24.0\\nspeed=2.5x\\nout_time_us=4000000\\ntotal_size=2500000\\nprogress=end')"
+        result = self.processes.run(python(code), progress=True)
+        self.assertEqual('24.0', result.progress['fps'])
+        self.assertEqual('end', result.progress['progress'])
+        self.assertEqual('24.0 fps, 2.5x realtime, 2.5 MB written.', ProcessManager.format_progress(result.progress))
+        self.assertEqual(4.0, self.processes.metrics[os.path.basename(sys.executable)]['media_seconds'])
+
+    def test_stop_kills_running_tools(self):
+        errors = []
+
+        def run():
+            try:
+                self.processes.run(python("import time; time.sleep(30)"))
+            except ProcessError as e:
+                errors.append(e)
+        thread = threading.Thread(target=run)
+        thread.start()
+        while not self.processes.children:
+            time.sleep(0.01)
+        self.processes.stop()
+        thread.join(10)
+        self.assertIn('stopped at shutdown', str(errors[0]))
+        with self.assertRaises(ProcessError):
+            self.processes.run(python("pass"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,30 @@
 import unittest
 from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import urllib.parse
+import threading
+import tempfile
+import hashlib
+import json
 import sys
 import os
 
 # Add the project root to the path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Mock wand before importing queue_manager
+sys.modules['wand'] = MagicMock()
+sys.modules['wand.image'] = MagicMock()
+
 from modules.queue_manager import QueueManager
+from modules.entry_manager import QueueEntry
+from modules.telegram_manager import TelegramManager
+from modules.lock_manager import ReadWriteLock
+from modules.breaker_manager import BreakerOpenError, CircuitBreaker
+from modules.blob_manager import BlobManager, FetchError, FileTooLargeError
+from modules.config_manager import ConfigModel
+from modules.verify_manager import VerifyManager
 
 
 class TestProperTitle(unittest.TestCase):
@@ -53,5 +71,528 @@ class TestProperTitle(unittest.TestCase):
         self.assertIn("Night", result)
 
 
+class TestPostAlbum(unittest.TestCase):
+    """Tests for QueueManager.post_album()"""
+
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock(telegram_channel=-100)
+        self.manager.telegram = MagicMock()
+        self.manager.telegram.get_rendered.return_value = {'album_caption': "caption"}
+        self.manager.media_cache = MagicMock()
+        self.manager.media_cache.get.side_effect = lambda file_hash: {'type': 'photo', 'file_id': 'id-' + file_hash}
+        self.manager.ledger = MagicMock()
+        self.manager.plan = MagicMock()
+        self.manager.queue_data = {'queue': [{'path': 'a.jpg'}, {'path': 'b.jpg'}, {'path': 'c.jpg'}]}
+        self.manager.queue_lock = ReadWriteLock()
+        self.manager.blobs = MagicMock()
+        self.manager.delete_from_queue = MagicMock(side_effect=lambda path, index: self.manager.queue_data['queue'].pop(index))
+
+    def test_sends_cached_items_by_file_id(self):
+        self.manager.telegram.send_image.return_value = [{'photo': []}, {'photo': []}]
+        self.manager.post_album(self.manager.queue_data['queue'][:2])
+        data = self.manager.telegram.send_image.call_args.kwargs['data']
+        self.assertIn('id-a', data['media'])
+        self.assertIn('id-b', data['media'])
+        self.assertEqual({}, self.manager.telegram.send_image.call_args.args[1])
+
+    def test_only_sent_items_are_dequeued(self):
+        self.manager.telegram.send_image.return_value = [{'photo': []}]
+        self.manager.post_album(self.manager.queue_data['queue'][:2])
+        self.assertEqual(['b.jpg', 'c.jpg'], [entry['path'] for entry in self.manager.queue_data['queue']])
+
+    def test_sent_items_are_recorded_in_ledger(self):
+        self.manager.telegram.send_image.return_value = [{'message_id': 7, 'photo': []}]
+        self.manager.post_album(self.manager.queue_data['queue'][:2])
+        # Sent by cached file_id, so nothing was uploaded.
+        self.manager.ledger.record.assert_called_once_with('a', -100, 7, 0)
+
+    def test_failed_album_keeps_all_items(self):
+        self.manager.telegram.send_image.return_value = None
+        self.manager.post_album(self.manager.queue_data['queue'][:2])
+        self.assertEqual(3, len(self.manager.queue_data['queue']))
+        self.manager.ledger.record.assert_not_called()
+        # Failed items move to the back of the plan.
+        self.assertEqual(['a.jpg', 'b.jpg'], [call.args[0] for call in self.manager.plan.defer.call_args_list])
+
+
+
+@patch('modules.verify_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.blob_manager.LogManager.setup_logger', MagicMock())
+class TestPostQuarantinedFile(unittest.TestCase):
+    """Tests for posting a file the verifier could not repair"""
+
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        os.mkdir('queue')
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock(telegram_channel=-100)
+        self.manager.telegram = MagicMock()
+        self.manager.media_cache = MagicMock()
+        self.manager.media_cache.get.return_value = None
+        self.manager.plan = MagicMock()
+        self.manager.queue_lock = ReadWriteLock()
+        self.manager.blobs = BlobManager()
+        self.manager.delete_image = MagicMock()
+        self.hydrus = MagicMock()
+        self.hydrus.get_file_content_by_hash.side_effect = ConnectionError('refused')
+        self.verifier = VerifyManager(SimpleNamespace(config_data=None), self.manager.blobs, self.hydrus)
+        self.images = []
+        for content, ext in ((b'broken', '.jpg'), (b'video', '.webm')):
+            path = hashlib.sha256(content).hexdigest() + ext
+            self.manager.blobs.acquire(path, lambda: b'other content')
+            self.assertFalse(self.verifier.repair(path, VerifyManager.MISMATCH))
+            self.images.append({'path': path})
+        self.manager.queue_data = {'queue': list(self.images)}
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.directory.cleanup()
+
+    def test_quarantined_file_stays_queued(self):
+        for image in self.images:
+            self.manager.post_image(image)
+        self.manager.delete_image.assert_not_called()
+        self.manager.telegram.send_image.assert_not_called()
+        self.assertEqual([image['path'] for image in self.images],
+                         [call.args[0] for call in self.manager.plan.defer.call_args_list])
+
+    def test_quarantined_file_is_left_out_of_an_album(self):
+        self.manager.post_album(self.images)
+        self.manager.delete_image.assert_not_called()
+        self.manager.telegram.send_image.assert_not_called()
+        self.assertEqual(2, self.manager.plan.defer.call_count)
+
+
+class TestCheckNearDuplicate(unittest.TestCase):
+    """Tests for QueueManager.check_near_duplicate()"""
+
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock(near_duplicate_threshold=6, near_duplicate_action='skip')
+        self.manager.telegram = MagicMock()
+        self.manager.hydrus = MagicMock()
+        self.manager.hydrus.get_thumbnail.return_value = b'thumbnail'
+        self.manager.phash = MagicMock()
+        self.manager.phash.dhash.return_value = 99
+        self.file_info = {'hash': 'new', 'file_id': 1, 'mime': 'image/png'}
+
+    def test_unique_file_is_kept(self):
+        self.manager.phash.find.return_value = None
+        self.assertEqual((99, False), self.manager.check_near_duplicate(self.file_info))
+        self.manager.phash.find.assert_called_once_with(99, 6, exclude='new')
+
+    def test_near_duplicate_is_skipped(self):
+        self.manager.phash.find.return_value = ('old', 3)
+        self.assertEqual((99, True), self.manager.check_near_duplicate(self.file_info))
+        self.manager.telegram.send_message.assert_not_called()
+
+    def test_near_duplicate_is_flagged(self):
+        self.manager.config.near_duplicate_action = 'flag'
+        self.manager.phash.find.return_value = ('old', 3)
+        self.assertEqual((99, False), self.manager.check_near_duplicate(self.file_info))
+        self.manager.telegram.send_message.assert_called_once()
+
+    def test_videos_and_missing_thumbnails_are_not_hashed(self):
+        self.assertEqual((None, False), self.manager.check_near_duplicate(dict(self.file_info, mime='video/mp4')))
+        self.manager.hydrus.get_thumbnail.return_value = None
+        self.assertEqual((None, False), self.manager.check_near_duplicate(self.file_info))
+        self.manager.phash.find.assert_not_called()
+
+class TestSaveImageToQueue(unittest.TestCase):
+    """Tests for QueueManager.save_image_to_queue()"""
+
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock(skip_posted=False, near_duplicate_threshold=None)
+        self.manager.hydrus = MagicMock()
+        self.manager.image_is_queued = MagicMock(return_value=False)
+        self.manager.blobs = MagicMock()
+        self.manager.hydrus.get_metadata.return_value = {'metadata': [
+            {'hash': 'abc', 'ext': '.jpg', 'file_id': 1, 'tags': {}}]}
+
+    def test_failed_metadata_fetch_raises(self):
+        self.manager.hydrus.get_metadata.return_value = None
+        with self.assertRaises(FetchError):
+            self.manager.save_image_to_queue(1)
+        self.manager.blobs.acquire.assert_not_called()
+
+    def test_failed_download_raises(self):
+        self.manager.blobs.acquire.side_effect = ConnectionError('refused')
+        with self.assertRaises(FetchError):
+            self.manager.save_image_to_queue(1)
+
+    def test_file_too_large_for_the_quota_is_reported_once(self):
+        self.manager.telegram = MagicMock()
+        self.manager.blobs.too_large = set()
+        self.manager.blobs.acquire.side_effect = FileTooLargeError('Not storing abc.jpg: it is too large.')
+        for _ in range(2):
+            with self.assertRaises(FileTooLargeError):
+                self.manager.save_image_to_queue(1)
+        self.manager.telegram.send_message.assert_called_once()
+
+    def test_queued_file_is_skipped(self):
+        self.manager.image_is_queued.return_value = True
+        self.assertEqual(0, self.manager.save_image_to_queue(1))
+
+    def test_near_duplicate_is_queued_by_default(self):
+        self.manager.config = ConfigModel(
+            telegram_access_token='123:abc', telegram_channel=-100, telegram_bot_id=1, hydrus_api_key='key',
+            queue_tag='to_post', posted_tag='posted', admins=[1], delay=60, timezone=0,
+            max_image_dimension=10000, max_file_size=10000000, log_level=20, skip_posted=False)
+        self.manager.phash = MagicMock()
+        self.manager.phash.find.return_value = ('def', 0)
+        self.manager.hydrus.get_service_key.return_value = 'downloader'
+        self.manager.hydrus.get_metadata.return_value = {'metadata': [
+            {'hash': 'abc', 'ext': '.jpg', 'file_id': 1, 'tags': {'downloader': {}}}]}
+        self.manager.storage_tags = MagicMock(return_value=[])
+        self.manager.telegram = MagicMock()
+        self.manager.entries = MagicMock()
+        self.manager.queue_lock = ReadWriteLock()
+        self.manager.queue_data = {'queue': []}
+        self.manager.selector = MagicMock()
+        self.manager.ledger = MagicMock()
+        self.manager.save_queue = MagicMock()
+        self.assertEqual(1, self.manager.save_image_to_queue(1))
+        self.manager.phash.find.assert_not_called()
+
+    def test_failure_after_download_releases_the_file(self):
+        self.manager.hydrus.get_service_key.side_effect = BreakerOpenError('Hydrus is unavailable.')
+        with self.assertRaises(FetchError):
+            self.manager.save_image_to_queue(1)
+        self.manager.blobs.release.assert_called_once_with('abc.jpg')
+
+    def test_unexpected_error_raises_rather_than_skipping(self):
+        # Returning 0 would have the file retagged as queued.
+        self.manager.hydrus.get_metadata.side_effect = BreakerOpenError('Hydrus is unavailable.')
+        with self.assertRaises(FetchError):
+            self.manager.save_image_to_queue(1)
+        self.manager.blobs.release.assert_not_called()
+
+
+class TestResizeImage(unittest.TestCase):
+    """Tests for QueueManager.resize_image()"""
+
+    @patch('modules.blob_manager.LogManager.setup_logger', MagicMock())
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manager = QueueManager(None, None)
+        self.manager.blobs = BlobManager(self.directory.name)
+        self.manager.telegram = MagicMock()
+        self.manager.telegram.reduce_image_size.return_value = True
+        self.path = self.manager.blobs.path('abc.png')
+        with open(self.path, 'wb') as file:
+            file.write(b'original')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def shrink(self, path, output):
+        with open(output, 'wb') as file:
+            file.write(b'small')
+        return True
+
+    def test_stored_file_is_not_changed(self):
+        self.manager.telegram.reduce_image_size.side_effect = self.shrink
+        resized = self.manager.resize_image(self.path)
+        self.assertEqual(self.path + '.resized.png', resized)
+        with open(self.path, 'rb') as file:
+            self.assertEqual(b'original', file.read())
+        # The resized copy is reused, and deleted with the stored file.
+        self.assertEqual(resized, self.manager.resize_image(self.path))
+        self.manager.telegram.reduce_image_size.assert_called_once()
+        self.assertIn(resized, self.manager.blobs.derived_paths('abc.png'))
+
+    def test_small_image_is_sent_as_stored(self):
+        self.assertEqual(self.path, self.manager.resize_image(self.path))
+
+    def test_invalid_image(self):
+        self.manager.telegram.reduce_image_size.return_value = False
+        self.assertIsNone(self.manager.resize_image(self.path))
+
+
+class TestRefreshUpcoming(unittest.TestCase):
+    """Tests for QueueManager.refresh_upcoming()"""
+
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock(metadata_refresh_ttl=3600)
+        self.manager.queue_lock = ReadWriteLock()
+        self.manager.queue_data = {'queue': []}
+        self.manager.save_queue = MagicMock()
+        self.manager.telegram = MagicMock()
+        self.manager.telegram.concatenate_sauce.side_effect = ", ".join
+        self.manager.entries = MagicMock()
+        self.manager.entries.update.return_value = True
+        self.manager.hydrus = MagicMock()
+        self.manager.hydrus.get_service_key.return_value = 'downloader'
+        digest = QueueManager.metadata_digest(['creator:a'], ['https://www.a'])
+        self.fresh = QueueEntry('fresh', '.jpg', digest=digest, refreshed=10 ** 12)
+        self.same = QueueEntry('same', '.jpg', digest=digest)
+        self.changed = QueueEntry('changed', '.jpg', digest=digest)
+        self.manager.plan = MagicMock()
+        self.manager.plan.peek.return_value = [self.fresh, self.same, self.changed]
+        self.manager.hydrus.get_metadata_batch.return_value = [
+            self.metadata('same', ['creator:a'], ['https://www.a']),
+            self.metadata('changed', ['creator:a', 'creator:b'], ['https://www.a']),
+        ]
+
+    def metadata(self, file_hash, tags, urls):
+        return {'hash': file_hash, 'file_id': 1, 'known_urls': urls,
+                'tags': {'downloader': {'storage_tags': {'0': tags}}}}
+
+    def test_stale_entries_are_fetched_in_one_request(self):
+        self.assertEqual(1, self.manager.refresh_upcoming())
+        self.manager.hydrus.get_metadata_batch.assert_called_once_with(['same', 'changed'])
+        # Only the entry whose digest changed is compared and rendered again.
+        self.assertEqual([self.changed], [call.args[0] for call in self.manager.entries.update.call_args_list])
+        self.manager.telegram.render_message.assert_called_once_with(self.changed)
+        self.assertGreater(self.same.refreshed, 0)
+
+    def test_nothing_is_fetched_while_entries_are_fresh(self):
+        self.manager.plan.peek.return_value = [self.fresh]
+        self.assertEqual(0, self.manager.refresh_upcoming())
+        self.manager.hydrus.get_metadata_batch.assert_not_called()
+
+    def test_digest_ignores_order(self):
+        self.assertEqual(QueueManager.metadata_digest(['a', 'b'], ['u']), QueueManager.metadata_digest(['b', 'a'], ['u']))
+        self.assertNotEqual(QueueManager.metadata_digest(['a'], ['u']), QueueManager.metadata_digest(['a'], ['v']))
+
+
+class LocalBotApiHandler(BaseHTTPRequestHandler):
+    """Stand-in for a local Bot API server that records requests."""
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append((url.path, urllib.parse.parse_qs(url.query), body))
+        result = [{'message_id': 1}, {'message_id': 2}] if url.path.endswith('sendMediaGroup') else {'message_id': 1}
+        payload = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestLocalBotApi(unittest.TestCase):
+    """Tests for posting through a local Bot API server"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), LocalBotApiHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    @patch.object(TelegramManager, '__init__', lambda self, config: None)
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.server.requests.clear()
+        telegram = TelegramManager(None)
+        telegram.logger = MagicMock()
+        telegram.token = 'TOKEN'
+        telegram.api_base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        telegram.local_mode = True
+        telegram.get_message_markup = MagicMock(return_value='&caption=hi')
+        telegram.get_rendered = MagicMock(return_value={'album_caption': 'hi'})
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock(telegram_channel=-100)
+        self.manager.telegram = telegram
+        self.manager.blobs = MagicMock()
+        self.manager.finish_media = MagicMock()
+
+    def media(self, name, media_type='photo', thumbnail=None):
+        return {'path': 'queue/' + name, 'hash': name.split('.')[0], 'type': media_type, 'file_id': None,
+                'media': 'queue/' + name, 'thumbnail': thumbnail}
+
+    def test_single_file_is_sent_by_path(self):
+        self.manager.post_image({'path': 'a.jpg'}, self.media('a.jpg'))
+        path, query, body = self.server.requests[0]
+        self.assertEqual('/botTOKEN/sendPhoto', path)
+        self.assertEqual([self.manager.telegram.local_media_uri('queue/a.jpg')], query['photo'])
+        self.assertTrue(query['photo'][0].startswith('file:///'))
+        self.assertEqual(b'', body)
+        self.assertEqual({'message_id': 1}, self.manager.finish_media.call_args.args[2])
+
+    def test_video_thumbnail_is_sent_by_path(self):
+        self.manager.post_image({'path': 'a.mp4'}, self.media('a.mp4', 'video', 'queue/a.mp4.jpg'))
+        path, query, body = self.server.requests[0]
+        self.assertEqual('/botTOKEN/sendVideo', path)
+        self.assertTrue(query['thumbnail'][0].endswith('/queue/a.mp4.jpg'))
+
+    def test_album_items_are_sent_by_path(self):
+        self.manager.prepare_media = MagicMock(side_effect=[self.media('a.jpg'), self.media('b.jpg')])
+        self.manager.post_album([{'path': 'a.jpg'}, {'path': 'b.jpg'}])
+        path, query, body = self.server.requests[0]
+        self.assertEqual('/botTOKEN/sendMediaGroup', path)
+        media = json.loads(urllib.parse.parse_qs(body.decode())['media'][0])
+        self.assertEqual([self.manager.telegram.local_media_uri('queue/a.jpg'),
+                          self.manager.telegram.local_media_uri('queue/b.jpg')], [item['media'] for item in media])
+        self.assertEqual(2, self.manager.finish_media.call_count)
+
+
+class TestQueueConcurrency(unittest.TestCase):
+    """Tests for QueueManager.mutation() / snapshot() / save_queue() / flush()"""
+
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.queue_lock = ReadWriteLock()
+        self.manager.save_lock = threading.Lock()
+        self.manager.queue_data = {'queue': [{'path': 'a.jpg'}]}
+        self.manager.queue_loaded = True
+        self.manager.queue_file = 'queue/queue.json'
+        self.manager.entries = MagicMock()
+        self.manager.entries.encode.side_effect = lambda queue_data: [entry['path'] for entry in queue_data['queue']]
+        self.manager.files = MagicMock()
+
+    def saved(self):
+        return self.manager.files.operation.call_args.args[2]
+
+    def test_snapshot_is_shared_until_the_queue_changes(self):
+        snapshot = self.manager.snapshot()
+        self.assertIs(snapshot, self.manager.snapshot())
+        self.assertEqual(frozenset({'a.jpg'}), snapshot.paths)
+        with self.manager.mutation() as queue_data:
+            queue_data['queue'].append({'path': 'b.jpg'})
+        self.assertEqual(1, len(snapshot.entries))
+        self.assertEqual(frozenset({'a.jpg', 'b.jpg'}), self.manager.snapshot().paths)
+
+    def test_older_version_is_not_saved_over_a_newer_one(self):
+        self.manager.save_queue()
+        self.assertEqual(1, self.manager.files.operation.call_count)
+        self.manager.saved_version = self.manager.version + 1
+        self.manager.save_queue()
+        self.assertEqual(1, self.manager.files.operation.call_count)
+
+    def test_flush_waits_for_the_change_in_progress(self):
+        started, release = threading.Event(), threading.Event()
+
+        def change():
+            with self.manager.mutation() as queue_data:
+                started.set()
+                release.wait(5)
+                queue_data['queue'].append({'path': 'b.jpg'})
+        thread = threading.Thread(target=change)
+        thread.start()
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+        self.assertTrue(self.manager.flush())
+        thread.join(5)
+        self.assertEqual(['a.jpg', 'b.jpg'], self.saved())
+        # Nothing is written after the flush.
+        self.manager.save_queue()
+        self.assertEqual(1, self.manager.files.operation.call_count)
+
+    def test_flush_during_own_change_runs_after_it(self):
+        with self.manager.mutation() as queue_data:
+            self.assertFalse(self.manager.flush())
+            queue_data['queue'].append({'path': 'b.jpg'})
+            self.manager.files.operation.assert_not_called()
+        self.assertEqual(['a.jpg', 'b.jpg'], self.saved())
+        self.assertTrue(self.manager.closed)
+
+    @patch('modules.blob_manager.LogManager.setup_logger', MagicMock())
+    def test_warming_does_not_hold_up_posting(self):
+        self.manager.post_lock = threading.RLock()
+        self.manager.config = MagicMock(link_check_ttl=None)
+        self.manager.blobs = BlobManager()
+        self.manager.telegram = MagicMock()
+        self.manager.media_cache = MagicMock()
+        self.manager.plan = MagicMock()
+        self.manager.plan.peek.return_value = [{'path': 'a.webm'}, {'path': 'b.webm'}]
+        posted = []
+
+        def convert(path):
+            # A post on another thread goes ahead while a video converts.
+            posted.append(self.in_thread(lambda: self.manager.post_lock.acquire(timeout=1) and
+                                         (self.manager.post_lock.release() or True)))
+        self.manager.convert_video = convert
+        self.manager.save_queue = MagicMock()
+        self.manager.warm_upcoming()
+        self.assertEqual([True, True], posted)
+
+    @staticmethod
+    def in_thread(func):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func()))
+        thread.start()
+        thread.join(5)
+        return result[0]
+
+    def test_delete_image_finds_entry_by_path(self):
+        self.manager.delete_from_queue = MagicMock()
+        self.manager.delete_image({'path': 'a.jpg'})
+        self.manager.delete_from_queue.assert_called_once_with('queue/a.jpg', 0)
+
+
+class TestProcessQueueBreaker(unittest.TestCase):
+    """Tests for QueueManager.process_queue() with the Telegram circuit breaker"""
+
+    @patch('modules.breaker_manager.LogManager.setup_logger', MagicMock())
+    @patch.object(QueueManager, '__init__', lambda self, config, queue_file: None)
+    def setUp(self):
+        self.now = 0.0
+        self.probe = MagicMock()
+        self.breaker = CircuitBreaker('telegram', min_calls=1, cooldown=30.0, probe=self.probe,
+                                      clock=lambda: self.now)
+        self.manager = QueueManager(None, None)
+        self.manager.logger = MagicMock()
+        self.manager.channel = 'default'
+        self.manager.config = MagicMock(post_batch_size=1)
+        self.manager.queue_lock = ReadWriteLock()
+        self.manager.post_lock = threading.RLock()
+        self.manager.queue_data = {'queue': [{'path': 'a.jpg'}]}
+        self.manager.queue_loaded = True
+        self.manager.telegram = MagicMock(breaker=self.breaker)
+        self.manager.plan = MagicMock()
+        self.manager.plan.peek.return_value = [{'path': 'a.jpg'}]
+        self.manager.post_image = MagicMock()
+
+    def test_posting_resumes_after_the_cooldown(self):
+        self.breaker.record_failure()
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        self.manager.process_queue()
+        self.manager.post_image.assert_not_called()
+        self.probe.assert_not_called()
+
+        self.now = 31.0
+        self.manager.process_queue()
+        self.probe.assert_called_once()
+        self.manager.post_image.assert_called_once_with({'path': 'a.jpg'})
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
+    def test_failed_probe_keeps_the_files_queued(self):
+        self.breaker.record_failure()
+        self.probe.side_effect = ConnectionError('down')
+        self.now = 31.0
+        self.manager.process_queue()
+        self.manager.post_image.assert_not_called()
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+
+
 if __name__ == "__main__":
     unittest.main()
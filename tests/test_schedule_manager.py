@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import threading
+import time
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.schedule_manager import ScheduleManager, align_delay
+
+
+class TestAlignDelay(unittest.TestCase):
+    """Tests for align_delay()"""
+
+    def test_rounds_down_to_a_divisor_of_a_day(self):
+        self.assertEqual(48, align_delay(50))
+        self.assertEqual(60, align_delay(60))
+
+    def test_long_delays_become_whole_days(self):
+        self.assertEqual(2880, align_delay(3000, max_delay=5000))
+
+    def test_stays_within_bounds(self):
+        self.assertEqual(15, align_delay(7, 15, 100))
+        self.assertEqual(60, align_delay(50, 49, 70))
+        self.assertEqual(96, align_delay(500, 15, 100))
+
+
+class TestAdaptiveDelay(unittest.TestCase):
+    """Tests for ScheduleManager.get_adaptive_delay()"""
+
+    def test_backlog_lasts_target_days(self):
+        # 140 files over 14 days is 10 posts a day: every 144 minutes.
+        self.assertEqual(144, ScheduleManager.get_adaptive_delay(140, 0, 1, 15, 1440, 14))
+
+    def test_ingest_rate_speeds_posting_up(self):
+        # 10 backlog posts and 14 new files a day: 24 posts a day, every hour.
+        self.assertEqual(60, ScheduleManager.get_adaptive_delay(140, 14, 1, 15, 1440, 14))
+
+    def test_albums_post_less_often(self):
+        self.assertEqual(288, ScheduleManager.get_adaptive_delay(140, 0, 2, 15, 1440, 14))
+
+    def test_empty_queue_uses_max_delay(self):
+        self.assertEqual(1440, ScheduleManager.get_adaptive_delay(0, 0, 1, 15, 1440, 14))
+
+    def test_huge_backlog_uses_min_delay(self):
+        self.assertEqual(15, ScheduleManager.get_adaptive_delay(100000, 0, 1, 15, 1440, 14))
+
+    @patch('modules.schedule_manager.LogManager.setup_logger', MagicMock())
+    @patch('modules.schedule_manager.time.time', MagicMock(return_value=1000 * 60 + 5))
+    def test_next_update_aligned_to_delay(self):
+        scheduler = ScheduleManager(timezone=0, delay=60)
+        self.assertEqual(1020 * 60, scheduler.get_next_update_time(20))
+        self.assertEqual(1020 * 60, scheduler.get_next_update_time())
+
+
+@patch('modules.schedule_manager.LogManager.setup_logger', MagicMock())
+class TestScheduler(unittest.TestCase):
+    """Tests for ScheduleManager.run() and its jobs"""
+
+    def start(self, scheduler):
+        thread = threading.Thread(target=scheduler.run, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 1)
+        self.addCleanup(scheduler.stop)
+        return thread
+
+    def test_job_runs_at_its_deadline(self):
+        scheduler = ScheduleManager(timezone=0, delay=60)
+        ran = threading.Event()
+        self.start(scheduler)
+        scheduled = time.time()
+        scheduler.schedule_at(scheduled + 0.1, lambda: ran.set())
+        self.assertTrue(ran.wait(1))
+        self.assertLess(time.time() - scheduled, 0.5)
+
+    def test_stop_wakes_run_immediately(self):
+        scheduler = ScheduleManager(timezone=0, delay=60)
+        scheduler.schedule_at(time.time() + 3600, MagicMock())
+        thread = self.start(scheduler)
+        scheduler.stop()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+
+    def test_named_job_is_replaced_and_triggered(self):
+        scheduler = ScheduleManager(timezone=0, delay=60)
+        first, second = MagicMock(), threading.Event()
+        scheduler.schedule_at(time.time() + 3600, first, name='post:default')
+        scheduler.schedule_at(time.time() + 3600, second.set, name='post:default')
+        self.assertEqual(1, len(scheduler.pending()))
+        self.start(scheduler)
+        self.assertTrue(scheduler.trigger('post:default'))
+        self.assertTrue(second.wait(1))
+        first.assert_not_called()
+        self.assertFalse(scheduler.trigger('post:default'))
+
+    def test_cancelled_job_does_not_run(self):
+        scheduler = ScheduleManager(timezone=0, delay=60)
+        cancelled, ran = MagicMock(), threading.Event()
+        job = scheduler.schedule_at(time.time() + 0.05, cancelled)
+        self.assertTrue(scheduler.cancel(job))
+        scheduler.schedule_at(time.time() + 0.1, ran.set)
+        self.start(scheduler)
+        self.assertTrue(ran.wait(1))
+        cancelled.assert_not_called()
+
+    def test_failing_job_does_not_stop_the_scheduler(self):
+        scheduler = ScheduleManager(timezone=0, delay=60)
+        ran = threading.Event()
+        scheduler.schedule_at(time.time(), MagicMock(side_effect=RuntimeError('boom')))
+        scheduler.schedule_at(time.time(), ran.set)
+        self.start(scheduler)
+        self.assertTrue(ran.wait(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import collections
+import random
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.selection_manager import SelectionManager, WeightedSampler
+
+
+class DictEntry(dict):
+    """A dict queue entry with the 'added' attribute of a QueueEntry."""
+
+    def __init__(self, data, added):
+        super().__init__(data)
+        self.added = added
+
+
+def make_entry(path, creator=None, added=0.0):
+    entry = {'path': path}
+    if creator:
+        entry['creator'] = creator
+    return DictEntry(entry, added)
+
+
+class TestWeightedSampler(unittest.TestCase):
+    """Tests for WeightedSampler"""
+
+    def test_prefix_sums_after_updates_and_removals(self):
+        sampler = WeightedSampler()
+        for n in range(10):
+            sampler.add(n, n + 1.0)
+        sampler.update(3, 0.0)
+        sampler.remove(7)
+        expected = sum(n + 1.0 for n in range(10) if n not in (3, 7))
+        self.assertAlmostEqual(expected, sampler.total)
+        self.assertEqual(9, len(sampler))
+
+    def test_find_follows_cumulative_weights(self):
+        sampler = WeightedSampler()
+        for key, weight in (('a', 1.0), ('b', 0.0), ('c', 2.0)):
+            sampler.add(key, weight)
+        self.assertEqual('a', sampler.find(0.5))
+        self.assertEqual('c', sampler.find(1.0))
+        self.assertEqual('c', sampler.find(2.9))
+
+    def test_first_skips_zero_weights_and_removed_keys(self):
+        sampler = WeightedSampler()
+        for key in 'abcd':
+            sampler.add(key)
+        sampler.remove('a')
+        sampler.update('b', 0.0)
+        self.assertEqual('c', sampler.first())
+
+    def test_rebuild_after_many_removals_keeps_order(self):
+        sampler = WeightedSampler()
+        for n in range(100):
+            sampler.add(n)
+        for n in range(60):
+            sampler.remove(n)
+        # Empty slots were dropped once more than half the slots were empty.
+        self.assertLess(len(sampler.keys), 60)
+        self.assertEqual(40, len(sampler))
+        self.assertEqual(60, sampler.first())
+        self.assertAlmostEqual(40.0, sampler.total)
+
+    def test_sampling_matches_weights(self):
+        sampler = WeightedSampler()
+        sampler.add('light', 1.0)
+        sampler.add('heavy', 3.0)
+        rng = random.Random(1)
+        counts = collections.Counter(sampler.sample(rng) for _ in range(4000))
+        self.assertAlmostEqual(0.75, counts['heavy'] / 4000, delta=0.03)
+
+
+class TestSelectionManager(unittest.TestCase):
+    """Tests for SelectionManager"""
+
+    @patch('modules.selection_manager.LogManager.setup_logger', MagicMock())
+    def make_selector(self, strategy, **overrides):
+        settings = dict(selection_strategy=strategy, selection_age_half_life=1.0,
+                        selection_creator_window=2, selection_creator_penalty=0.25)
+        settings.update(overrides)
+        config = SimpleNamespace(config_data=SimpleNamespace(**settings))
+        return SelectionManager(config, rng=random.Random(7))
+
+    def test_fifo_posts_in_queue_order(self):
+        selector = self.make_selector('fifo')
+        selector.rebuild([make_entry(f"{n}.jpg") for n in range(5)])
+        self.assertEqual(['0.jpg', '1.jpg'], [entry['path'] for entry in selector.select(2)])
+        selector.remove('0.jpg')
+        self.assertEqual('1.jpg', selector.select(1)[0]['path'])
+
+    def test_select_returns_distinct_entries(self):
+        selector = self.make_selector('uniform')
+        selector.rebuild([make_entry(f"{n}.jpg") for n in range(3)])
+        paths = [entry['path'] for entry in selector.select(5)]
+        self.assertEqual(3, len(set(paths)))
+        # Hidden choices are restored afterwards.
+        self.assertAlmostEqual(3.0, selector.sampler.total)
+
+    def test_age_favours_older_entries(self):
+        selector = self.make_selector('age')
+        now = selector.reference_time
+        selector.rebuild([make_entry('old.jpg', added=now - 3 * 3600), make_entry('new.jpg', added=now)])
+        self.assertAlmostEqual(8.0, selector.sampler.weight('old.jpg') / selector.sampler.weight('new.jpg'))
+
+    def test_creator_gets_one_share_regardless_of_file_count(self):
+        selector = self.make_selector('creator')
+        selector.rebuild([make_entry(f"bulk{n}.jpg", 'prolific') for n in range(100)] + [make_entry('solo.jpg', 'rare')])
+        counts = collections.Counter(selector.select(1)[0]['path'] == 'solo.jpg' for _ in range(2000))
+        self.assertAlmostEqual(0.5, counts[True] / 2000, delta=0.05)
+
+    def test_recent_creators_are_down_weighted(self):
+        selector = self.make_selector('creator')
+        selector.rebuild([make_entry('a1.jpg', 'a'), make_entry('a2.jpg', 'a'), make_entry('b1.jpg', 'b')])
+        selector.posted(make_entry('a0.jpg', 'a'))
+        self.assertEqual(0.25, selector.creators.weight('a'))
+        selector.posted(make_entry('b0.jpg', 'b'))
+        selector.posted(make_entry('b0.jpg', 'b'))
+        # 'a' fell out of the two-post window.
+        self.assertEqual(1.0, selector.creators.weight('a'))
+        self.assertEqual(0.0625, selector.creators.weight('b'))
+
+    def test_creator_removed_when_last_file_leaves(self):
+        selector = self.make_selector('creator')
+        selector.rebuild([make_entry('a1.jpg', 'a'), make_entry('b1.jpg', 'b'), make_entry('b2.jpg', 'b')])
+        selector.remove('a1.jpg')
+        self.assertNotIn('a', selector.creators)
+        selector.remove('b1.jpg')
+        self.assertEqual(['b2.jpg'], selector.members['b'])
+        self.assertEqual(['b2.jpg'], [entry['path'] for entry in selector.select(3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
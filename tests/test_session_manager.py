@@ -0,0 +1,152 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hydrus_api
+from modules.session_manager import SessionManager
+from modules.hydrus_manager import HydrusManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def insufficient_access():
+    return hydrus_api.InsufficientAccess(MagicMock(status_code=403))
+
+
+class TestSessionManager(unittest.TestCase):
+    """Tests for SessionManager"""
+
+    @patch('modules.session_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = MagicMock()
+        self.client.verify_access_key.return_value = {'basic_permissions': [0, 1, 2]}
+        self.client.get_services.return_value = {
+            'services': {
+                'abc': {'name': 'my tags', 'type': 5},
+                'def': {'name': 'downloader tags', 'type': 5},
+            }
+        }
+        self.session = SessionManager(self.client, (0, 1), 60.0, {'my_tags': 'default', 'other': 'fallback'},
+                                      clock=self.clock)
+
+    def test_permission_check_is_cached_until_ttl(self):
+        self.assertTrue(self.session.check())
+        self.assertTrue(self.session.check())
+        self.assertEqual(1, self.client.verify_access_key.call_count)
+        self.clock.now += 60
+        self.assertTrue(self.session.check())
+        self.assertEqual(2, self.client.verify_access_key.call_count)
+
+    def test_missing_permission_is_not_cached(self):
+        self.client.verify_access_key.return_value = {'basic_permissions': [0]}
+        self.assertFalse(self.session.check())
+        self.assertFalse(self.session.check())
+        self.assertEqual(2, self.client.verify_access_key.call_count)
+
+    def test_services_are_discovered_once(self):
+        self.assertEqual('abc', self.session.service_key('my_tags'))
+        self.assertEqual('def', self.session.service_key('downloader_tags'))
+        self.assertEqual('fallback', self.session.service_key('other'))
+        self.assertIsNone(self.session.service_key('unknown'))
+        self.client.get_services.assert_called_once()
+
+    def test_parses_older_service_lists(self):
+        response = {'local_tags': [{'name': 'my tags', 'service_key': 'abc'}], 'version': 17}
+        self.assertEqual({'my_tags': 'abc'}, SessionManager.parse_services(response))
+
+    def test_failed_discovery_uses_defaults_and_retries(self):
+        self.client.get_services.side_effect = [hydrus_api.ConnectionError('down'), self.client.get_services.return_value]
+        self.assertEqual('default', self.session.service_key('my_tags'))
+        self.assertEqual('abc', self.session.service_key('my_tags'))
+
+    def test_insufficient_access_invalidates(self):
+        self.session.check()
+        self.session.service_key('my_tags')
+        self.client.verify_access_key.side_effect = insufficient_access()
+        self.clock.now += 60
+        with self.assertRaises(hydrus_api.InsufficientAccess):
+            self.session.check()
+        self.assertEqual(0.0, self.session.verified_until)
+        self.assertIsNone(self.session.service_keys)
+
+
+@patch('modules.session_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.breaker_manager.LogManager.setup_logger', MagicMock())
+@patch('modules.hydrus_manager.LogManager.setup_logger', MagicMock())
+class TestHydrusRequests(unittest.TestCase):
+    """Counts the Hydrus API requests of HydrusManager.get_new_hydrus_files()"""
+
+    def make_manager(self, session):
+        config = SimpleNamespace(config_data=SimpleNamespace(
+            hydrus_api_key='key', hydrus_session_ttl=3600.0, queue_tag='queue', posted_tag='posted',
+            breaker_window=20, breaker_failure_rate=0.5, breaker_min_calls=5, breaker_cooldown=30.0,
+            breaker_max_cooldown=600.0))
+        client = hydrus_api.Client
+        with patch('modules.hydrus_manager.hydrus_api.Client', lambda key: client(key, session=session)):
+            return HydrusManager(config, MagicMock(queue_file='queue.json'))
+
+    def response(self, body, status_code=200):
+        response = MagicMock(status_code=status_code)
+        response.json.return_value = body
+        if status_code != 200:
+            response.raise_for_status.side_effect = hydrus_api.requests.HTTPError()
+        return response
+
+    def paths(self, session):
+        return [call.args[1].split('/', 3)[-1] for call in session.request.call_args_list]
+
+    def test_cycle_without_new_files_costs_one_search(self):
+        session = MagicMock()
+        permissions = [int(permission) for permission in HydrusManager.permissions]
+        session.request.side_effect = lambda method, url, **kwargs: self.response(
+            {'basic_permissions': permissions} if 'verify_access_key' in url else {'file_ids': []})
+        manager = self.make_manager(session)
+
+        manager.get_new_hydrus_files()
+        session.request.reset_mock()
+        manager.get_new_hydrus_files()
+        manager.get_new_hydrus_files()
+        self.assertEqual(['get_files/search_files', 'get_files/search_files'], self.paths(session))
+
+    def test_refused_key_checks_permissions_again(self):
+        session = MagicMock()
+        permissions = [int(permission) for permission in HydrusManager.permissions]
+        responses = {'verify_access_key': self.response({'basic_permissions': permissions}),
+                     'search_files': self.response({}, 403)}
+        session.request.side_effect = lambda method, url, **kwargs: responses[url.rsplit('/', 1)[-1].split('?')[0]]
+        manager = self.make_manager(session)
+
+        manager.get_new_hydrus_files()
+        self.assertEqual(0.0, manager.session.verified_until)
+        manager.get_new_hydrus_files()
+        self.assertEqual(2, self.paths(session).count('verify_access_key'))
+
+    def test_over_quota_ingest_leaves_files_tagged(self):
+        session = MagicMock()
+        permissions = [int(permission) for permission in HydrusManager.permissions]
+        session.request.side_effect = lambda method, url, **kwargs: self.response(
+            {'basic_permissions': permissions} if 'verify_access_key' in url else {'file_ids': [1, 2]})
+        manager = self.make_manager(session)
+        queue = MagicMock()
+        queue.quota_exceeded.return_value = 'the queue is full'
+
+        manager.get_new_hydrus_files(queue, 'to_post')
+        queue.save_image_to_queue.assert_not_called()
+        self.assertTrue(queue.ingest_paused)
+        self.assertNotIn('add_tags/add_tags', self.paths(session))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config_manager import TagRuleModel, default_tag_rules
+from modules.tag_manager import TagManager
+
+
+class TestRenderTags(unittest.TestCase):
+    """Tests for TagManager.render_tags()"""
+
+    @patch('modules.tag_manager.LogManager.setup_logger', MagicMock())
+    def make_manager(self, rules=None):
+        config = SimpleNamespace(config_data=SimpleNamespace(tag_rules=rules if rules is not None else default_tag_rules()))
+        return TagManager(config)
+
+    def test_default_creator_link(self):
+        result = self.make_manager().render_tags(["creator:some artist (artist)"])
+        self.assertEqual(
+            '<a href="https://e621.net/posts?tags=some_artist_%28artist%29">Some Artist</a>',
+            result['creator']
+        )
+
+    def test_default_title_is_ascii_only(self):
+        result = self.make_manager().render_tags(["title:café story (series)"])
+        self.assertEqual("Caf Story", result['title'])
+
+    def test_html_entities_are_replaced(self):
+        result = self.make_manager().render_tags(["character:cat & <dog>"])
+        self.assertIn("Cat + ≺dog≻", result['character'])
+        self.assertNotIn("&", result['character'].split('>', 1)[1])
+
+    def test_multiple_tags_are_joined_in_order(self):
+        result = self.make_manager().render_tags(["character:b", "meta:x", "character:a", "untagged"])
+        self.assertEqual(2, result['character'].count('<a '))
+        self.assertLess(result['character'].index('>B<'), result['character'].index('>A<'))
+        self.assertNotIn('creator', result)
+
+    def test_custom_rule(self):
+        rules = [TagRuleModel(namespace='artist', field='creator', template='#{query}')]
+        result = self.make_manager(rules).render_tags(["artist:foo bar", "creator:ignored"])
+        self.assertEqual({'creator': '#foo_bar'}, result)
+
+    def test_unknown_placeholder_is_rejected(self):
+        rules = [TagRuleModel(namespace='creator', field='creator', template='{nmae}')]
+        with self.assertRaises(ValueError):
+            self.make_manager(rules)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import MagicMock, patch
 import urllib.parse
+import time
 import sys
 import os
 
@@ -12,6 +13,7 @@ sys.modules['wand'] = MagicMock()
 sys.modules['wand.image'] = MagicMock()
 
 from modules.telegram_manager import TelegramManager
+from modules.breaker_manager import CircuitBreaker
 
 
 class TestGetMessageMarkup(unittest.TestCase):
@@ -95,6 +97,50 @@ class TestGetMessageMarkup(unittest.TestCase):
         self.assertTrue(caption_decoded.endswith("..."))
 
 
+class TestGetRendered(unittest.TestCase):
+    """Tests for TelegramManager.get_rendered()"""
+
+    @patch.object(TelegramManager, '__init__', lambda self, config: None)
+    def setUp(self):
+        self.manager = TelegramManager(None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock()
+
+    def test_renders_missing_entry_and_stores_it(self):
+        image = {"title": "Stored"}
+        rendered = self.manager.get_rendered(image)
+        self.assertIs(rendered, image["rendered"])
+        self.assertEqual(TelegramManager.render_version, rendered["version"])
+        self.assertIn("Stored", urllib.parse.unquote(rendered["markup"]))
+
+    def test_current_render_is_reused(self):
+        image = {"title": "New", "rendered": {"version": TelegramManager.render_version, "markup": "&caption=Old"}}
+        self.assertEqual("&caption=Old", self.manager.get_message_markup(image))
+
+    def test_stale_render_is_rebuilt(self):
+        image = {"title": "New", "rendered": {"version": 0, "markup": "&caption=Old"}}
+        markup = self.manager.get_message_markup(image)
+        self.assertIn("New", urllib.parse.unquote(markup))
+        self.assertEqual(TelegramManager.render_version, image["rendered"]["version"])
+
+    def test_render_with_old_link_check_is_rebuilt(self):
+        image = {"title": "New", "rendered": {"version": TelegramManager.render_version, "markup": "&caption=Old",
+                                              "checked": time.time() - 7200}}
+        self.assertEqual("&caption=Old", self.manager.get_rendered(image, max_age=86400)["markup"])
+        self.assertIn("New", urllib.parse.unquote(self.manager.get_rendered(image, max_age=3600)["markup"]))
+
+    def test_album_caption_includes_source_links(self):
+        image = {"sauce": "https://e621.net/posts/1"}
+        rendered = self.manager.render_message(image)
+        self.assertIn('<a href="https://e621.net/posts/1">e621</a>', rendered["album_caption"])
+        self.assertIn("&reply_markup=", rendered["markup"])
+
+    def test_album_caption_escapes_source_links(self):
+        image = {"sauce": 'https://example.com/a?b=1&c="2"'}
+        rendered = self.manager.render_message(image)
+        self.assertIn('<a href="https://example.com/a?b=1&amp;c=&quot;2&quot;">example.com</a>', rendered["album_caption"])
+
+
 class TestConcatenateSauce(unittest.TestCase):
     """Tests for TelegramManager.concatenate_sauce()"""
 
@@ -198,6 +244,13 @@ class TestBuildTelegramApiUrl(unittest.TestCase):
         url = self.manager.build_telegram_api_url("getMe", "")
         self.assertEqual("https://api.telegram.org/bot123:ABC/getMe", url)
 
+    def test_local_server_url(self):
+        self.manager.api_base = "http://localhost:8081"
+        url = self.manager.build_telegram_api_url("getMe", "")
+        self.assertEqual("http://localhost:8081/bot123:ABC/getMe", url)
+        url = self.manager.build_telegram_api_url("", "?file_path=a.jpg", is_file=True)
+        self.assertTrue(url.startswith("http://localhost:8081/file/bot123:ABC"))
+
 
 class TestRedactToken(unittest.TestCase):
     """Tests for TelegramManager._redact_token()"""
@@ -264,5 +317,57 @@ class TestBuildCaptionButtons(unittest.TestCase):
         self.assertEqual({'inline_keyboard': []}, result)
 
 
+class TestAdminCommands(unittest.TestCase):
+    """Tests for TelegramManager.register_command()"""
+
+    @patch.object(TelegramManager, '__init__', lambda self, config: None)
+    def setUp(self):
+        self.manager = TelegramManager(None)
+        self.manager.logger = MagicMock()
+        self.manager.config = MagicMock(admins=[1])
+
+    def test_admin_command_calls_handler_with_argument(self):
+        handler = MagicMock()
+        self.manager.register_command('/post', handler)
+        self.manager.process_incoming_message({'from': {'id': 1}, 'text': '/post art'})
+        handler.assert_called_once_with('art')
+
+    def test_commands_from_other_users_are_ignored(self):
+        handler = MagicMock()
+        self.manager.register_command('/post', handler)
+        self.manager.process_incoming_message({'from': {'id': 2}, 'text': '/post'})
+        handler.assert_not_called()
+
+
+class TestSendImageBreaker(unittest.TestCase):
+    """Tests for the Telegram circuit breaker in TelegramManager.send_image()"""
+
+    @patch('modules.breaker_manager.LogManager.setup_logger', MagicMock())
+    @patch.object(TelegramManager, '__init__', lambda self, config: None)
+    def setUp(self):
+        self.manager = TelegramManager(None)
+        self.manager.logger = MagicMock()
+        self.manager.breaker = CircuitBreaker('telegram', min_calls=1, cooldown=30.0)
+
+    @patch('modules.telegram_manager.time.sleep')
+    @patch('modules.telegram_manager.requests.post')
+    def test_stops_retrying_once_breaker_opens(self, post, sleep):
+        post.return_value = MagicMock(status_code=502, text='Bad Gateway')
+        self.assertIsNone(self.manager.send_image('url', {}, 'a.jpg', {}))
+        self.assertEqual(1, post.call_count)
+        self.assertEqual(CircuitBreaker.OPEN, self.manager.breaker.state)
+
+        # While open, nothing is sent.
+        self.assertIsNone(self.manager.send_image('url', {}, 'b.jpg', {}))
+        self.assertEqual(1, post.call_count)
+
+    @patch('modules.telegram_manager.requests.post')
+    def test_client_errors_do_not_open_breaker(self, post):
+        post.return_value = MagicMock(status_code=400, text='Bad Request')
+        self.manager.send_message = MagicMock()
+        self.assertIsNone(self.manager.send_image('url', {}, 'a.jpg', {}))
+        self.assertEqual(CircuitBreaker.CLOSED, self.manager.breaker.state)
+
+
 if __name__ == "__main__":
     unittest.main()
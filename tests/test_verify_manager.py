@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+import hashlib
+import tempfile
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.blob_manager import BlobManager
+from modules.verify_manager import VerifyManager
+
+
+def stored_name(content: bytes, ext: str = '.jpg') -> str:
+    return hashlib.sha256(content).hexdigest() + ext
+
+
+class TestVerifyManager(unittest.TestCase):
+    """Tests for VerifyManager"""
+
+    @patch('modules.verify_manager.LogManager.setup_logger', MagicMock())
+    @patch('modules.blob_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        os.mkdir('queue')
+        self.blobs = BlobManager()
+        self.hydrus = MagicMock()
+        self.config = SimpleNamespace(config_data=SimpleNamespace(verify_workers=2, verify_slice_size=10))
+        self.verifier = VerifyManager(self.config, self.blobs, self.hydrus)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.directory.cleanup()
+
+    def store(self, content: bytes) -> str:
+        filename = stored_name(content)
+        self.blobs.acquire(filename, lambda: content)
+        return filename
+
+    def test_hash_file(self):
+        filename = self.store(b'content')
+        self.assertEqual(hashlib.sha256(b'content').hexdigest(), VerifyManager.hash_file(self.blobs.path(filename)))
+        open('queue/empty', 'wb').close()
+        self.assertEqual(hashlib.sha256(b'').hexdigest(), VerifyManager.hash_file('queue/empty'))
+
+    def test_intact_files(self):
+        for content in (b'a', b'b', b'c'):
+            self.store(content)
+        report = self.verifier.run()
+        self.assertEqual(3, report['checked'])
+        self.assertEqual(3, report['intact'])
+        self.assertEqual([], report['failed'])
+        self.hydrus.get_file_content_by_hash.assert_not_called()
+
+    def test_verifies_in_slices(self):
+        names = sorted(self.store(content) for content in (b'a', b'b', b'c'))
+        self.config.config_data.verify_slice_size = 2
+        self.assertEqual(2, self.verifier.run()['checked'])
+        self.assertEqual(names[1], self.verifier.checkpoint['cursor'])
+        self.assertEqual(1, self.verifier.run()['checked'])
+        # The pass is complete: the next run starts over.
+        self.assertEqual({'cursor': '', 'passes': 1}, self.verifier.checkpoint)
+
+    @patch('modules.verify_manager.LogManager.setup_logger', MagicMock())
+    def test_checkpoint_survives_restart(self):
+        names = sorted(self.store(content) for content in (b'a', b'b', b'c'))
+        stops = iter([False, True])
+        report = self.verifier.run(lambda: next(stops))
+        self.assertEqual(1, report['checked'])
+        verifier = VerifyManager(self.config, self.blobs, self.hydrus)
+        self.assertEqual(names[0], verifier.checkpoint['cursor'])
+        self.assertEqual(2, verifier.run()['checked'])
+
+    def test_mismatch_is_quarantined_and_refetched(self):
+        filename = self.store(b'complete content')
+        with open(self.blobs.path(filename), 'wb') as file:
+            file.write(b'compl')
+        open(self.blobs.path(filename) + '.jpg', 'wb').close()
+        self.hydrus.get_file_content_by_hash.return_value = b'complete content'
+        report = self.verifier.run()
+        self.assertEqual(1, report['refetched'])
+        self.hydrus.get_file_content_by_hash.assert_called_once_with(VerifyManager.expected_hash(filename))
+        with open(self.blobs.path(filename), 'rb') as file:
+            self.assertEqual(b'complete content', file.read())
+        with open(os.path.join('queue', 'quarantine', filename), 'rb') as file:
+            self.assertEqual(b'compl', file.read())
+        # The thumbnail made from the broken file is gone.
+        self.assertFalse(os.path.exists(self.blobs.path(filename) + '.jpg'))
+        self.assertEqual(len(b'complete content'), self.blobs.bytes)
+        self.assertEqual(1, self.blobs.refs[filename])
+
+    def test_wrong_content_from_hydrus_stays_quarantined(self):
+        filename = self.store(b'complete content')
+        with open(self.blobs.path(filename), 'wb') as file:
+            file.write(b'compl')
+        self.hydrus.get_file_content_by_hash.return_value = b'other content'
+        report = self.verifier.run()
+        self.assertEqual([filename], report['failed'])
+        self.assertFalse(os.path.exists(self.blobs.path(filename)))
+        self.assertTrue(os.path.exists(os.path.join('queue', 'quarantine', filename)))
+        self.assertEqual(0, self.blobs.bytes)
+        self.assertIn('Not repaired', self.verifier.format_report())
+
+    def test_missing_file_is_refetched(self):
+        filename = self.store(b'content')
+        os.remove(self.blobs.path(filename))
+        self.hydrus.get_file_content_by_hash.return_value = b'content'
+        self.assertEqual(1, self.verifier.run()['refetched'])
+        self.assertTrue(os.path.exists(self.blobs.path(filename)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import urllib.error
+import urllib.request
+import json
+import sys
+import os
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.webhook_manager import WebhookManager
+
+
+class TestWebhookServer(unittest.TestCase):
+    """Tests for WebhookManager against a local client POSTing updates."""
+
+    @patch('modules.webhook_manager.LogManager.setup_logger', MagicMock())
+    def setUp(self):
+        config = MagicMock()
+        config.config_data.webhook_secret = 'test_secret'
+        config.config_data.webhook_host = '127.0.0.1'
+        config.config_data.webhook_port = 0
+        config.config_data.webhook_url = 'https://example.com/hook'
+        self.telegram = MagicMock()
+        self.webhook = WebhookManager(config, self.telegram)
+        self.webhook.start()
+
+    def tearDown(self):
+        self.webhook.stop()
+
+    def post(self, body, secret='test_secret'):
+        headers = {'Content-Type': 'application/json'}
+        if secret is not None:
+            headers[WebhookManager.secret_header] = secret
+        request = urllib.request.Request(f"http://127.0.0.1:{self.webhook.port}/", data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_update_is_dispatched(self):
+        update = {'update_id': 10, 'message': {'from': {'id': 1}, 'text': 'test'}}
+        status = self.post(json.dumps(update).encode())
+        self.assertEqual(200, status)
+        self.telegram.dispatch_update.assert_called_once_with(update)
+
+    def test_saturated_dispatcher_asks_for_redelivery(self):
+        self.telegram.dispatch_update.return_value = False
+        status = self.post(json.dumps({'update_id': 11, 'message': {}}).encode())
+        self.assertEqual(503, status)
+
+    def test_wrong_secret_is_rejected(self):
+        status = self.post(json.dumps({'update_id': 10, 'message': {}}).encode(), secret='nope')
+        self.assertEqual(403, status)
+        self.telegram.dispatch_update.assert_not_called()
+
+    def test_missing_secret_is_rejected(self):
+        self.assertEqual(403, self.post(b'{}', secret=None))
+
+    def test_invalid_json_is_rejected(self):
+        self.assertEqual(400, self.post(b'not json'))
+        self.telegram.dispatch_update.assert_not_called()
+
+    def test_register_sends_secret(self):
+        self.telegram.api_request.return_value = {'ok': True}
+        self.assertTrue(self.webhook.register())
+        method, payload = self.telegram.api_request.call_args.args
+        self.assertEqual('setWebhook', method)
+        self.assertEqual('test_secret', payload['secret_token'])
+        self.assertEqual('https://example.com/hook', payload['url'])
+
+    @patch('modules.webhook_manager.LogManager.setup_logger', MagicMock())
+    def test_port_in_use_raises(self):
+        config = MagicMock()
+        config.config_data.webhook_host = '127.0.0.1'
+        config.config_data.webhook_port = self.webhook.port
+        other = WebhookManager(config, self.telegram)
+        with self.assertRaises(OSError):
+            other.start()
+        self.assertIsNone(other.server)
+
+    def test_deregister(self):
+        self.telegram.api_request.return_value = {'ok': False}
+        self.assertFalse(self.webhook.deregister())
+        self.telegram.api_request.assert_called_once_with('deleteWebhook', {})
+
+
+if __name__ == "__main__":
+    unittest.main()